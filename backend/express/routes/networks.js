@@ -516,7 +516,7 @@ router.post('/:id/train', [
       agents: network.config.agents || [] // Include agent configurations with their observation spaces
     }
 
-    const result = await startTraining(network, trainingConfig)
+    const result = await startTraining(network, trainingConfig, req.headers.authorization)
 
     res.json(result)
   } catch (error) {
@@ -678,7 +678,7 @@ router.post('/trainings/:trainingId/stop', async (req, res) => {
       }
     }
 
-    const result = stopTraining(req.params.trainingId)
+    const result = await stopTraining(req.params.trainingId)
 
     res.json(result)
   } catch (error) {
@@ -868,7 +868,7 @@ router.delete('/trainings/:trainingId', async (req, res) => {
     }
 
     // Remove from trainings store (activeTrainings Map)
-    const deleteResult = deleteTraining(req.params.trainingId)
+    const deleteResult = await deleteTraining(req.params.trainingId)
 
     if (!deleteResult.success) {
       console.error(`❌ [DELETE /trainings] Failed to delete from memory: ${deleteResult.error}`)
@@ -962,7 +962,7 @@ router.post('/training/yaml', [
 
     // Start training
     console.log('🎬 [YAML Training] Starting training...')
-    const result = await startTraining(tempNetwork, trainingConfig)
+    const result = await startTraining(tempNetwork, trainingConfig, req.headers.authorization)
     console.log('✅ [YAML Training] Training started! Result:', result)
 
     res.json({
@@ -391,7 +391,10 @@ router.post('/xai/explain-action', async (req, res) => {
         target,
         description
       },
-      { timeout: 10000 } // 10 second timeout
+      {
+        timeout: 10000, // 10 second timeout
+        headers: req.headers.authorization ? { Authorization: req.headers.authorization } : {}
+      }
     )
 
     console.log(`✅ XAI response received: ${response.data.explanation?.substring(0, 50)}...`)
@@ -399,6 +402,15 @@ router.post('/xai/explain-action', async (req, res) => {
   } catch (error) {
     console.error('❌ XAI Error:', error.message)
 
+    if (error.response?.status === 429) {
+      res.set('Retry-After', error.response.headers['retry-after'])
+      return res.status(429).json({
+        success: false,
+        error: 'Too many explanation requests, try again shortly',
+        explanation: 'Unable to generate explanation'
+      })
+    }
+
     if (error.code === 'ECONNREFUSED') {
       console.error('❌ Cannot connect to Python backend at:', PYTHON_API_URL)
     }
@@ -412,4 +424,69 @@ router.post('/xai/explain-action', async (req, res) => {
   }
 })
 
+// @route   POST /xai/explain-actions
+// @desc    Get XAI explanations for many actions in one Python backend call
+// @access  Public
+router.post('/xai/explain-actions', async (req, res) => {
+  try {
+    const { items } = req.body
+
+    // Validate required fields
+    if (!Array.isArray(items) || items.length === 0) {
+      return res.status(400).json({
+        success: false,
+        error: 'Missing required field: items'
+      })
+    }
+
+    if (items.some(item => !item?.action || !item?.agent_type)) {
+      return res.status(400).json({
+        success: false,
+        error: 'Every item needs action and agent_type'
+      })
+    }
+
+    console.log(`📡 Proxying XAI batch request to Python backend: ${items.length} items`)
+
+    // Call Python backend for XAI
+    const response = await axios.post(
+      `${PYTHON_API_URL}/xai/explain-actions`,
+      {
+        items: items.map(({ action, agent_type, target, description }) => ({
+          action,
+          agent_type,
+          target,
+          description
+        }))
+      },
+      {
+        timeout: 20000, // One upstream call covers the whole batch
+        headers: req.headers.authorization ? { Authorization: req.headers.authorization } : {}
+      }
+    )
+
+    res.json(response.data)
+  } catch (error) {
+    console.error('❌ XAI batch Error:', error.message)
+
+    if (error.response?.status === 429) {
+      res.set('Retry-After', error.response.headers['retry-after'])
+      return res.status(429).json({
+        success: false,
+        error: 'Too many explanation requests, try again shortly'
+      })
+    }
+
+    if (error.code === 'ECONNREFUSED') {
+      console.error('❌ Cannot connect to Python backend at:', PYTHON_API_URL)
+    }
+
+    res.status(error.response?.status === 400 ? 400 : 500).json({
+      success: false,
+      error: 'Failed to load explanations',
+      details: error.response?.data?.detail || error.message
+    })
+  }
+})
+
 export default router
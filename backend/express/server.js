@@ -84,6 +84,8 @@ let simulationState = {
 
 // Auto-stepping interval
 let autoStepInterval = null
+// Headers of the request that started the simulation, so polling reads the same session
+let simulationHeaders = {}
 const AUTO_STEP_DELAY = 2000 // Poll Python backend every 2 seconds when running
 
 // Initialize network from config
@@ -144,6 +146,22 @@ function determineSeverity(actionName) {
   return 'low'
 }
 
+// Client deadline headers the Python API honours (services/admission.py)
+const DEADLINE_HEADERS = ['X-Request-Timeout-Ms', 'X-Request-Deadline']
+// Python API errors a step caller should see instead of a generic 500
+const PASSTHROUGH_STATUSES = {
+  429: 'Too many requests',
+  503: 'Simulation is overloaded, try again later',
+  504: 'Step did not finish before the request deadline'
+}
+
+// The Python API keys sessions by the caller's user id and X-Session-Id
+function simulationRequestHeaders(req) {
+  const headers = { 'X-Session-Id': req.get('X-Session-Id') || req.body?.sessionId || 'default' }
+  if (req.headers.authorization) headers.Authorization = req.headers.authorization
+  return headers
+}
+
 // REST API Endpoints
 app.get('/api/status', (req, res) => {
   res.json({
@@ -154,7 +172,8 @@ app.get('/api/status', (req, res) => {
 
 app.post('/api/simulation/start', async (req, res) => {
   try {
-    const response = await axios.post(`${PYTHON_API_URL}/simulation/start`)
+    simulationHeaders = simulationRequestHeaders(req)
+    const response = await axios.post(`${PYTHON_API_URL}/simulation/start`, null, { headers: simulationHeaders })
     simulationState.isRunning = true
     io.emit('message', {
       type: 'state_update',
@@ -169,7 +188,9 @@ app.post('/api/simulation/start', async (req, res) => {
 
 app.post('/api/simulation/stop', async (req, res) => {
   try {
-    const response = await axios.post(`${PYTHON_API_URL}/simulation/stop`)
+    const response = await axios.post(`${PYTHON_API_URL}/simulation/stop`, null, {
+      headers: simulationRequestHeaders(req)
+    })
     simulationState.isRunning = false
     io.emit('message', {
       type: 'state_update',
@@ -184,7 +205,9 @@ app.post('/api/simulation/stop', async (req, res) => {
 
 app.post('/api/simulation/reset', async (req, res) => {
   try {
-    const response = await axios.post(`${PYTHON_API_URL}/simulation/reset`)
+    const response = await axios.post(`${PYTHON_API_URL}/simulation/reset`, null, {
+      headers: simulationRequestHeaders(req)
+    })
     stopAutoStepping()
     initializeNetwork()
     simulationState.isRunning = false
@@ -202,10 +225,23 @@ app.post('/api/simulation/reset', async (req, res) => {
 
 app.post('/api/simulation/step', async (req, res) => {
   try {
-    const response = await axios.post(`${PYTHON_API_URL}/simulation/step`)
+    // Forward the caller's token so the Python API rate-limits per user, and their deadline
+    const headers = simulationRequestHeaders(req)
+    for (const name of DEADLINE_HEADERS) {
+      if (req.get(name)) headers[name] = req.get(name)
+    }
+    const response = await axios.post(`${PYTHON_API_URL}/simulation/step`, null, { headers })
     updateSimulationState(response.data)
     res.json({ success: true, data: response.data })
   } catch (error) {
+    // Rate limiting, load shedding and missed deadlines reach the client as sent
+    const status = error.response?.status
+    if (PASSTHROUGH_STATUSES[status]) {
+      const retryAfter = error.response.headers['retry-after']
+      if (retryAfter) res.set('Retry-After', retryAfter)
+      const detail = error.response.data?.detail
+      return res.status(status).json({ success: false, error: detail?.error || detail || PASSTHROUGH_STATUSES[status] })
+    }
     res.status(500).json({ success: false, error: error.message })
   }
 })
@@ -274,7 +310,7 @@ function startAutoStepping() {
 
     try {
       // Poll Python backend for current simulation state
-      const response = await axios.get(`${PYTHON_API_URL}/simulation/status`)
+      const response = await axios.get(`${PYTHON_API_URL}/simulation/status`, { headers: simulationHeaders })
 
       if (response.data && response.data.success) {
         const pythonState = response.data
@@ -385,6 +421,8 @@ io.on('connection', (socket) => {
     try {
       switch (data.type) {
         case 'start_simulation':
+          // Socket clients are unauthenticated and share the default session
+          simulationHeaders = {}
           const startRes = await axios.post(`${PYTHON_API_URL}/simulation/start`)
           simulationState.isRunning = true
           io.emit('message', {
@@ -1,4 +1,5 @@
 import { spawn } from 'child_process'
+import axios from 'axios'
 import path from 'path'
 import fs from 'fs/promises'
 import { fileURLToPath } from 'url'
@@ -9,10 +10,37 @@ const __dirname = path.dirname(__filename)
 // Store active training processes
 const activeTrainings = new Map()
 
+// How often the structured metrics file written by train_network.py is read
+const METRICS_POLL_MS = 1000
+// How often queued/running jobs are refreshed from the Python training scheduler
+const JOB_POLL_MS = 2000
+// Reward history entries kept per series
+const HISTORY_LIMIT = 100
+// Log lines kept per training
+const LOG_LIMIT = 1000
+
+const PYTHON_API_URL = process.env.PYTHON_API_URL || 'http://localhost:8000'
+// Jobs go through the Python scheduler (queue, priorities, core limits); 'off' spawns train_network.py directly
+const USE_SCHEDULER = process.env.TRAINING_SCHEDULER !== 'off'
+
+// Scheduler job states and the training status shown for each
+const JOB_STATUS = {
+  queued: 'queued',
+  running: 'running',
+  cancelling: 'stopping',
+  completed: 'completed',
+  failed: 'failed',
+  cancelled: 'stopped'
+}
+const FINAL_JOB_STATUSES = ['completed', 'failed', 'cancelled']
+
 /**
  * Start PrimAITE training for a network
+ *
+ * With the scheduler the run is queued in the Python API under the caller's
+ * `authorization` header and starts once enough cores are free.
  */
-export const startTraining = async (network, trainingConfig) => {
+export const startTraining = async (network, trainingConfig, authorization) => {
   const trainingId = `${network._id}_${Date.now()}`
 
   try {
@@ -36,44 +64,6 @@ export const startTraining = async (network, trainingConfig) => {
     await fs.mkdir(outputDir, { recursive: true })
     console.log(`✓ [startTraining] Output directory created: ${outputDir}`)
 
-    // Build training command using our custom Ray RLlib training script
-    // Use the autov1 Python virtual environment which has PrimAITE installed
-    const pythonExe = 'C:\\Users\\snith\\OneDrive\\Desktop\\autov1\\backend\\python\\p312\\Scripts\\python.exe'
-    const primaiteDir = 'C:\\Users\\snith\\OneDrive\\Desktop\\autov1\\backend\\python\\PrimAITE\\src'
-    const autov2PythonDir = path.join(process.cwd(), '..', 'python')
-    const trainScript = path.join(autov2PythonDir, 'train_network.py')
-
-    console.log(`🐍 [startTraining] Python exe: ${pythonExe}`)
-    console.log(`📄 [startTraining] Train script: ${trainScript}`)
-    console.log(`📁 [startTraining] Working dir: ${autov2PythonDir}`)
-
-    const args = [
-      trainScript,
-      '--config', network.yamlFile,
-      '--output', outputDir,
-      '--episodes', String(trainingConfig.episodes || 1000),
-      '--save-frequency', String(trainingConfig.saveFrequency || 10),
-      '--algorithm', trainingConfig.algorithm || 'PPO'
-    ]
-
-    if (trainingConfig.verbose) {
-      args.push('--verbose')
-    }
-
-    console.log(`📋 [startTraining] Command args: ${args.join(' ')}`)
-
-    // Spawn training process with autov1 Python environment
-    console.log(`🚀 [startTraining] Spawning Python process...`)
-    const trainingProcess = spawn(pythonExe, args, {
-      cwd: autov2PythonDir,
-      env: {
-        ...process.env,
-        PYTHONPATH: primaiteDir + path.delimiter + (process.env.PYTHONPATH || '')
-      }
-    })
-
-    console.log(`✓ [startTraining] Process spawned, PID: ${trainingProcess.pid}`)
-
     // Store training info
     const trainingInfo = {
       id: trainingId,
@@ -84,8 +74,8 @@ export const startTraining = async (network, trainingConfig) => {
       startTime: new Date(),
       config: trainingConfig,
       outputDir,
-      process: trainingProcess,
       logs: [],
+      metrics: { path: path.join(outputDir, 'metrics.jsonl'), offset: 0, partial: '', reading: null },
       progress: {
         currentEpisode: 0,
         totalEpisodes: trainingConfig.episodes || 1000,
@@ -99,91 +89,262 @@ export const startTraining = async (network, trainingConfig) => {
       }
     }
 
-    activeTrainings.set(trainingId, trainingInfo)
-
-    // Capture stdout
-    trainingProcess.stdout.on('data', (data) => {
-      const line = data.toString()
+    if (USE_SCHEDULER) {
+      return await submitTrainingJob(trainingInfo, network, authorization)
+    }
+    return spawnTraining(trainingInfo, network)
 
-      // Filter out verbose logs
-      const shouldLog = !line.includes('green_user_log') &&
-                        !line.includes('WARNING framework.py') &&
-                        !line.includes('Not importing TensorFlow')
+  } catch (error) {
+    throw new Error(`Failed to start training: ${error.response?.data?.detail || error.message}`)
+  }
+}
 
-      if (shouldLog) {
-        console.log(`[Training ${trainingId}] STDOUT:`, line)
-        trainingInfo.logs.push({
-          type: 'stdout',
-          message: line,
-          timestamp: new Date()
-        })
-      }
+/**
+ * Queue the training in the Python scheduler and follow the job
+ */
+async function submitTrainingJob(trainingInfo, network, authorization) {
+  const { config } = trainingInfo
+  const response = await axios.post(`${PYTHON_API_URL}/training/jobs`, {
+    network_id: trainingInfo.networkId,
+    network_name: network.name,
+    config_path: path.resolve(network.yamlFile),
+    // The scheduler picks the output directory from the training id
+    training_id: trainingInfo.id,
+    episodes: config.episodes || 1000,
+    save_frequency: config.saveFrequency || 10,
+    algorithm: config.algorithm || 'PPO',
+    num_rollout_workers: config.numRolloutWorkers,
+    num_envs_per_worker: config.numEnvsPerWorker || 1,
+    cpu_only: Boolean(config.cpuOnly)
+  }, {
+    headers: authorization ? { Authorization: authorization } : {}
+  })
+
+  const job = response.data.job
+  trainingInfo.jobId = job.id
+  trainingInfo.authorization = authorization
+  trainingInfo.outputDir = job.output_dir
+  trainingInfo.metrics.path = path.join(job.output_dir, 'metrics.jsonl')
+  trainingInfo.trainLog = { path: path.join(job.output_dir, 'train.log'), offset: 0, partial: '', reading: null }
+  applyJob(job, trainingInfo)
+  activeTrainings.set(trainingInfo.id, trainingInfo)
+  console.log(`✓ [startTraining] Job ${job.id} ${job.status} (${job.cores} cores)`)
+
+  trainingInfo.timers = [
+    setInterval(() => {
+      readMetrics(trainingInfo)
+      readTrainLog(trainingInfo)
+    }, METRICS_POLL_MS),
+    setInterval(() => refreshJob(trainingInfo), JOB_POLL_MS)
+  ]
+
+  return {
+    success: true,
+    trainingId: trainingInfo.id,
+    status: trainingInfo.status,
+    queuePosition: job.queue_position || null,
+    message: job.status === 'queued' ? 'Training queued' : 'Training started successfully'
+  }
+}
 
-      // Parse progress from output (always parse, even if not logged)
-      parseProgress(line, trainingInfo)
+/**
+ * Copy the scheduler's view of a job onto the training
+ */
+function applyJob(job, trainingInfo) {
+  trainingInfo.status = JOB_STATUS[job.status] || job.status
+  trainingInfo.queuePosition = job.queue_position || null
+  trainingInfo.cores = job.cores
+  if (job.started_at) {
+    trainingInfo.runStartTime = new Date(job.started_at * 1000)
+  }
+  if (job.error) {
+    trainingInfo.error = job.error
+  }
+}
 
-      // Keep only last 1000 log lines
-      if (trainingInfo.logs.length > 1000) {
-        trainingInfo.logs = trainingInfo.logs.slice(-1000)
-      }
+/**
+ * Poll the job until it finishes, then take the last metrics and log lines
+ */
+async function refreshJob(trainingInfo) {
+  if (trainingInfo.refreshing) return
+  trainingInfo.refreshing = true
+  try {
+    const response = await axios.get(`${PYTHON_API_URL}/training/jobs/${trainingInfo.jobId}`, {
+      headers: trainingInfo.authorization ? { Authorization: trainingInfo.authorization } : {}
     })
+    const job = response.data.job
+    applyJob(job, trainingInfo)
+
+    if (FINAL_JOB_STATUSES.includes(job.status)) {
+      stopFollowing(trainingInfo)
+      await Promise.all([readMetrics(trainingInfo), readTrainLog(trainingInfo)])
+      trainingInfo.endTime = job.finished_at ? new Date(job.finished_at * 1000) : new Date()
+      trainingInfo.exitCode = job.exit_code
+      console.log(`⏹️ [Training ${trainingInfo.id}] Job ${job.id} ${job.status}`)
+    }
+  } catch (error) {
+    const status = error.response?.status
+    if (status === 404 || status === 401) {
+      // The scheduler no longer knows the job (pruned or store removed), or the
+      // submitter's token expired and the job can no longer be followed
+      stopFollowing(trainingInfo)
+      trainingInfo.status = 'failed'
+      trainingInfo.error = status === 404
+        ? 'Training job no longer exists'
+        : 'Lost access to the training job (authorization expired)'
+      trainingInfo.endTime = new Date()
+    } else {
+      console.error(`❌ [refreshJob] ${trainingInfo.id}: ${error.message}`)
+    }
+  } finally {
+    trainingInfo.refreshing = false
+  }
+}
 
-    // Capture stderr
-    trainingProcess.stderr.on('data', (data) => {
-      const line = data.toString()
-
-      // Filter out verbose logs
-      const shouldLog = !line.includes('green_user_log') &&
-                        !line.includes('WARNING framework.py') &&
-                        !line.includes('Not importing TensorFlow')
-
-      if (shouldLog) {
-        console.log(`[Training ${trainingId}] STDERR:`, line)
-        trainingInfo.logs.push({
-          type: 'stderr',
-          message: line,
-          timestamp: new Date()
-        })
-      }
+function stopFollowing(trainingInfo) {
+  for (const timer of trainingInfo.timers || []) {
+    clearInterval(timer)
+  }
+  trainingInfo.timers = []
+}
 
-      // Parse progress from stderr too
-      parseProgress(line, trainingInfo)
+/**
+ * Spawn train_network.py directly (TRAINING_SCHEDULER=off)
+ */
+function spawnTraining(trainingInfo, network) {
+  const { id: trainingId, config: trainingConfig, outputDir } = trainingInfo
+
+  // Build training command using our custom Ray RLlib training script
+  // Use the autov1 Python virtual environment which has PrimAITE installed
+  const pythonExe = 'C:\\Users\\snith\\OneDrive\\Desktop\\autov1\\backend\\python\\p312\\Scripts\\python.exe'
+  const primaiteDir = 'C:\\Users\\snith\\OneDrive\\Desktop\\autov1\\backend\\python\\PrimAITE\\src'
+  const autov2PythonDir = path.join(process.cwd(), '..', 'python')
+  const trainScript = path.join(autov2PythonDir, 'train_network.py')
+
+  console.log(`🐍 [startTraining] Python exe: ${pythonExe}`)
+  console.log(`📄 [startTraining] Train script: ${trainScript}`)
+  console.log(`📁 [startTraining] Working dir: ${autov2PythonDir}`)
+
+  const args = [
+    trainScript,
+    '--config', network.yamlFile,
+    '--output', outputDir,
+    '--episodes', String(trainingConfig.episodes || 1000),
+    '--save-frequency', String(trainingConfig.saveFrequency || 10),
+    '--algorithm', trainingConfig.algorithm || 'PPO',
+    '--metrics-file', path.join(outputDir, 'metrics.jsonl')
+  ]
+
+  if (trainingConfig.verbose) {
+    args.push('--verbose')
+  }
 
-      if (trainingInfo.logs.length > 1000) {
-        trainingInfo.logs = trainingInfo.logs.slice(-1000)
-      }
-    })
+  // Rollout parallelism (the script defaults to one worker per spare core)
+  if (trainingConfig.numRolloutWorkers !== undefined) {
+    args.push('--num-rollout-workers', String(trainingConfig.numRolloutWorkers))
+  }
+  if (trainingConfig.numEnvsPerWorker) {
+    args.push('--num-envs-per-worker', String(trainingConfig.numEnvsPerWorker))
+  }
+  if (trainingConfig.cpuOnly) {
+    args.push('--cpu-only')
+  }
 
-    // Handle process completion
-    trainingProcess.on('close', (code) => {
-      console.log(`⏹️ [Training ${trainingId}] Process closed with code: ${code}`)
-      trainingInfo.status = code === 0 ? 'completed' : 'failed'
-      trainingInfo.endTime = new Date()
-      trainingInfo.exitCode = code
+  console.log(`📋 [startTraining] Command args: ${args.join(' ')}`)
 
-      // Clean up process reference
-      delete trainingInfo.process
-    })
+  // Spawn training process with autov1 Python environment
+  console.log(`🚀 [startTraining] Spawning Python process...`)
+  const trainingProcess = spawn(pythonExe, args, {
+    cwd: autov2PythonDir,
+    env: {
+      ...process.env,
+      PYTHONPATH: primaiteDir + path.delimiter + (process.env.PYTHONPATH || '')
+    }
+  })
 
-    trainingProcess.on('error', (err) => {
-      console.error(`❌ [Training ${trainingId}] Process error:`, err)
-      trainingInfo.status = 'error'
-      trainingInfo.error = err.message
-      trainingInfo.endTime = new Date()
-    })
+  console.log(`✓ [startTraining] Process spawned, PID: ${trainingProcess.pid}`)
 
-    trainingProcess.on('exit', (code, signal) => {
-      console.log(`🛑 [Training ${trainingId}] Process exited with code: ${code}, signal: ${signal}`)
-    })
+  trainingInfo.process = trainingProcess
+  activeTrainings.set(trainingId, trainingInfo)
+
+  // Progress comes from the metrics file, which outlives the process
+  const metricsTimer = setInterval(() => readMetrics(trainingInfo), METRICS_POLL_MS)
+
+  // Capture stdout
+  trainingProcess.stdout.on('data', (data) => {
+    const line = data.toString()
+
+    // Filter out verbose logs
+    const shouldLog = !line.includes('green_user_log') &&
+                      !line.includes('WARNING framework.py') &&
+                      !line.includes('Not importing TensorFlow')
 
-    return {
-      success: true,
-      trainingId,
-      message: 'Training started successfully'
+    if (shouldLog) {
+      console.log(`[Training ${trainingId}] STDOUT:`, line)
+      trainingInfo.logs.push({
+        type: 'stdout',
+        message: line,
+        timestamp: new Date()
+      })
     }
 
-  } catch (error) {
-    throw new Error(`Failed to start training: ${error.message}`)
+    // Keep only the last LOG_LIMIT log lines
+    if (trainingInfo.logs.length > LOG_LIMIT) {
+      trainingInfo.logs = trainingInfo.logs.slice(-LOG_LIMIT)
+    }
+  })
+
+  // Capture stderr
+  trainingProcess.stderr.on('data', (data) => {
+    const line = data.toString()
+
+    // Filter out verbose logs
+    const shouldLog = !line.includes('green_user_log') &&
+                      !line.includes('WARNING framework.py') &&
+                      !line.includes('Not importing TensorFlow')
+
+    if (shouldLog) {
+      console.log(`[Training ${trainingId}] STDERR:`, line)
+      trainingInfo.logs.push({
+        type: 'stderr',
+        message: line,
+        timestamp: new Date()
+      })
+    }
+
+    if (trainingInfo.logs.length > LOG_LIMIT) {
+      trainingInfo.logs = trainingInfo.logs.slice(-LOG_LIMIT)
+    }
+  })
+
+  // Handle process completion
+  trainingProcess.on('close', async (code) => {
+    console.log(`⏹️ [Training ${trainingId}] Process closed with code: ${code}`)
+    clearInterval(metricsTimer)
+    await readMetrics(trainingInfo)
+    trainingInfo.status = code === 0 ? 'completed' : 'failed'
+    trainingInfo.endTime = new Date()
+    trainingInfo.exitCode = code
+
+    // Clean up process reference
+    delete trainingInfo.process
+  })
+
+  trainingProcess.on('error', (err) => {
+    console.error(`❌ [Training ${trainingId}] Process error:`, err)
+    trainingInfo.status = 'error'
+    trainingInfo.error = err.message
+    trainingInfo.endTime = new Date()
+  })
+
+  trainingProcess.on('exit', (code, signal) => {
+    console.log(`🛑 [Training ${trainingId}] Process exited with code: ${code}, signal: ${signal}`)
+  })
+
+  return {
+    success: true,
+    trainingId,
+    message: 'Training started successfully'
   }
 }
 
@@ -197,8 +358,14 @@ export const getTrainingStatus = (trainingId) => {
     return null
   }
 
-  // Return info without process object
-  const { process, ...trainingStatus } = training
+  return publicTraining(training)
+}
+
+/**
+ * Training info without the process, file readers, timers or credentials
+ */
+function publicTraining(training) {
+  const { process, metrics, trainLog, timers, authorization, refreshing, ...trainingStatus } = training
   return trainingStatus
 }
 
@@ -210,8 +377,7 @@ export const getNetworkTrainings = (networkId) => {
 
   for (const [id, training] of activeTrainings.entries()) {
     if (training.networkId === networkId) {
-      const { process, ...trainingStatus } = training
-      trainings.push(trainingStatus)
+      trainings.push(publicTraining(training))
     }
   }
 
@@ -225,27 +391,35 @@ export const getAllTrainings = () => {
   const trainings = []
 
   for (const [id, training] of activeTrainings.entries()) {
-    const { process, ...trainingStatus } = training
-    trainings.push(trainingStatus)
+    trainings.push(publicTraining(training))
   }
 
   return trainings.sort((a, b) => b.startTime - a.startTime)
 }
 
 /**
- * Stop training
+ * Stop training (a queued job is removed from the queue)
  */
-export const stopTraining = (trainingId) => {
+export const stopTraining = async (trainingId) => {
   const training = activeTrainings.get(trainingId)
 
   if (!training) {
     return { success: false, error: 'Training not found' }
   }
 
-  if (training.status !== 'running') {
+  if (training.status !== 'running' && training.status !== 'queued') {
     return { success: false, error: 'Training is not running' }
   }
 
+  if (training.jobId) {
+    try {
+      await cancelJob(training)
+      return { success: true, message: training.status === 'stopped' ? 'Training stopped' : 'Training stopping' }
+    } catch (error) {
+      return { success: false, error: error.response?.data?.detail || error.message }
+    }
+  }
+
   if (training.process) {
     training.process.kill('SIGTERM')
     training.status = 'stopped'
@@ -260,7 +434,7 @@ export const stopTraining = (trainingId) => {
 /**
  * Delete training - remove from active trainings map
  */
-export const deleteTraining = (trainingId) => {
+export const deleteTraining = async (trainingId) => {
   const training = activeTrainings.get(trainingId)
 
   if (!training) {
@@ -268,7 +442,16 @@ export const deleteTraining = (trainingId) => {
   }
 
   // Stop the process if it's still running
-  if (training.process && !training.process.killed) {
+  if (training.jobId) {
+    stopFollowing(training)
+    if (['queued', 'running'].includes(training.status)) {
+      try {
+        await cancelJob(training)
+      } catch (error) {
+        console.error(`❌ [deleteTraining] Could not cancel job ${training.jobId}: ${error.message}`)
+      }
+    }
+  } else if (training.process && !training.process.killed) {
     training.process.kill('SIGTERM')
   }
 
@@ -297,175 +480,149 @@ export const getTrainingLogs = (trainingId, limit = 100) => {
 }
 
 /**
- * Parse progress from PrimAITE output
+ * Ask the scheduler to cancel the training's job
  */
-function parseProgress(line, trainingInfo) {
-  // Parse structured METRIC lines: METRIC|episode=1|length=128|reward=0.500|attacker=-45.350|defender=-45.350
-  if (line.startsWith('METRIC|')) {
-    const parts = line.substring(7).split('|')
-    const data = {}
-    parts.forEach(part => {
-      const [key, value] = part.split('=')
-      if (key && value) {
-        data[key] = value
-      }
-    })
+async function cancelJob(training) {
+  const response = await axios.post(`${PYTHON_API_URL}/training/jobs/${training.jobId}/cancel`, null, {
+    headers: training.authorization ? { Authorization: training.authorization } : {}
+  })
+  applyJob(response.data.job, training)
+  if (training.status === 'stopped') {
+    training.endTime = new Date()
+  }
+}
 
-    if (data.episode) {
-      trainingInfo.progress.currentEpisode = parseInt(data.episode)
+/**
+ * Read metric records appended to the training's metrics.jsonl since the last read
+ *
+ * Reads are chained so the final read after exit sees everything the poll timer had not.
+ */
+function readMetrics(trainingInfo) {
+  return readLines(trainingInfo.metrics, trainingInfo, (line) => {
+    try {
+      applyMetricRecord(JSON.parse(line), trainingInfo)
+    } catch {
+      // Skip a line torn by a crash mid-write
     }
-    if (data.reward) {
-      const reward = parseFloat(data.reward)
-      trainingInfo.progress.avgReward = reward
-      // Track reward history (keep last 100)
-      trainingInfo.progress.rewardHistory.push({
-        episode: trainingInfo.progress.currentEpisode,
-        reward: reward
-      })
-      if (trainingInfo.progress.rewardHistory.length > 100) {
-        trainingInfo.progress.rewardHistory.shift()
-      }
+  })
+}
+
+/**
+ * Append new lines of the scheduled job's train.log (its stdout and stderr) to the training logs
+ */
+function readTrainLog(trainingInfo) {
+  return readLines(trainingInfo.trainLog, trainingInfo, (line) => {
+    // Filter out verbose logs
+    if (line.includes('green_user_log') || line.includes('WARNING framework.py') || line.includes('Not importing TensorFlow')) {
+      return
     }
-    if (data.length) {
-      trainingInfo.progress.meanEpisodeLength = parseFloat(data.length)
+    trainingInfo.logs.push({ type: 'stdout', message: line, timestamp: new Date() })
+    if (trainingInfo.logs.length > LOG_LIMIT) {
+      trainingInfo.logs = trainingInfo.logs.slice(-LOG_LIMIT)
     }
+  })
+}
 
-    // Extract per-policy rewards from METRIC line: attacker=X|defender=Y
-    if (data.attacker || data.defender) {
-      console.log(`[parseProgress] Found policy rewards - attacker: ${data.attacker}, defender: ${data.defender}`)
-
-      if (data.attacker) {
-        const attackerReward = parseFloat(data.attacker)
-        if (!trainingInfo.progress.policyRewardHistory['attacker']) {
-          trainingInfo.progress.policyRewardHistory['attacker'] = []
-        }
-        trainingInfo.progress.policyRewardHistory['attacker'].push({
-          episode: trainingInfo.progress.currentEpisode,
-          reward: attackerReward
-        })
-        trainingInfo.progress.policyRewards['attacker'] = attackerReward
-
-        // Keep last 100 episodes
-        if (trainingInfo.progress.policyRewardHistory['attacker'].length > 100) {
-          trainingInfo.progress.policyRewardHistory['attacker'].shift()
-        }
-      }
+/**
+ * Pass each complete line appended to a tailed file since the last read to `onLine`
+ */
+function readLines(tail, trainingInfo, onLine) {
+  tail.reading = (tail.reading || Promise.resolve()).then(() => readNewLines(tail, trainingInfo, onLine))
+  return tail.reading
+}
 
-      if (data.defender) {
-        const defenderReward = parseFloat(data.defender)
-        if (!trainingInfo.progress.policyRewardHistory['defender']) {
-          trainingInfo.progress.policyRewardHistory['defender'] = []
-        }
-        trainingInfo.progress.policyRewardHistory['defender'].push({
-          episode: trainingInfo.progress.currentEpisode,
-          reward: defenderReward
-        })
-        trainingInfo.progress.policyRewards['defender'] = defenderReward
-
-        // Keep last 100 episodes
-        if (trainingInfo.progress.policyRewardHistory['defender'].length > 100) {
-          trainingInfo.progress.policyRewardHistory['defender'].shift()
-        }
-      }
-    } else if (line.includes('METRIC|')) {
-      console.log(`[parseProgress] METRIC line but no attacker/defender: ${line}`)
-      console.log(`[parseProgress] Parsed data:`, data)
+async function readNewLines(tail, trainingInfo, onLine) {
+  let handle
+  try {
+    handle = await fs.open(tail.path, 'r')
+    const { size } = await handle.stat()
+    if (size <= tail.offset) {
+      return
     }
 
-    trainingInfo.progress.lastUpdate = new Date()
-  }
+    const buffer = Buffer.alloc(size - tail.offset)
+    await handle.read(buffer, 0, buffer.length, tail.offset)
+    tail.offset = size
 
-  // Parse structured ITERATION lines: ITERATION|iter=1|episodes=10/1000|time=5.23s|mean_len=128|RED_attacker=0.500|BLUE_defender=0.300
-  if (line.startsWith('ITERATION|')) {
-    const parts = line.substring(11).split('|')
-    const data = {}
-    parts.forEach(part => {
-      const [key, value] = part.split('=')
-      if (key && value) {
-        data[key] = value
-      }
-    })
+    // Keep a trailing partial line for the next read
+    const lines = (tail.partial + buffer.toString('utf8')).split('\n')
+    tail.partial = lines.pop()
 
-    if (data.iter) {
-      trainingInfo.progress.currentIteration = parseInt(data.iter)
+    for (const line of lines) {
+      if (line.trim()) onLine(line)
     }
-    if (data.episodes) {
-      const [current, total] = data.episodes.split('/')
-      trainingInfo.progress.currentEpisode = parseInt(current)
-      trainingInfo.progress.totalEpisodes = parseInt(total)
-    }
-    if (data.mean_len) {
-      trainingInfo.progress.meanEpisodeLength = parseFloat(data.mean_len)
+  } catch (error) {
+    if (error.code !== 'ENOENT') {
+      console.error(`❌ [readLines] ${trainingInfo.id} ${path.basename(tail.path)}: ${error.message}`)
     }
+  } finally {
+    if (handle) await handle.close()
+  }
+}
 
-    // Parse policy rewards: RED_attacker=0.500, BLUE_defender=0.300
-    // Also support legacy format: policies=green=0.500,blue=0.300
-    if (data.RED_attacker || data.BLUE_defender) {
-      // New format with separate RED_attacker and BLUE_defender
-      if (data.RED_attacker) {
-        const rewardValue = parseFloat(data.RED_attacker)
-        trainingInfo.progress.policyRewards['attacker'] = rewardValue
-
-        // Track reward history per policy
-        if (!trainingInfo.progress.policyRewardHistory['attacker']) {
-          trainingInfo.progress.policyRewardHistory['attacker'] = []
-        }
-        trainingInfo.progress.policyRewardHistory['attacker'].push({
-          iteration: trainingInfo.progress.currentIteration,
-          reward: rewardValue
-        })
-
-        // Keep only last 100 entries per policy
-        if (trainingInfo.progress.policyRewardHistory['attacker'].length > 100) {
-          trainingInfo.progress.policyRewardHistory['attacker'].shift()
-        }
-      }
+/**
+ * Push a reward onto a bounded history series
+ */
+function pushHistory(history, entry) {
+  history.push(entry)
+  if (history.length > HISTORY_LIMIT) {
+    history.shift()
+  }
+}
 
-      if (data.BLUE_defender) {
-        const rewardValue = parseFloat(data.BLUE_defender)
-        trainingInfo.progress.policyRewards['defender'] = rewardValue
+/**
+ * Update training progress from one structured metric record (schema v1, see training_metrics.py)
+ */
+function applyMetricRecord(record, trainingInfo) {
+  const progress = trainingInfo.progress
 
-        // Track reward history per policy
-        if (!trainingInfo.progress.policyRewardHistory['defender']) {
-          trainingInfo.progress.policyRewardHistory['defender'] = []
-        }
-        trainingInfo.progress.policyRewardHistory['defender'].push({
-          iteration: trainingInfo.progress.currentIteration,
-          reward: rewardValue
-        })
-
-        // Keep only last 100 entries per policy
-        if (trainingInfo.progress.policyRewardHistory['defender'].length > 100) {
-          trainingInfo.progress.policyRewardHistory['defender'].shift()
-        }
+  switch (record.kind) {
+    case 'run_start':
+      if (record.target_episodes) {
+        progress.totalEpisodes = record.target_episodes
       }
-    } else if (data.policies) {
-      // Legacy format: Parse policy rewards: green=0.500,blue=0.300
-      const policyPairs = data.policies.split(',')
-      policyPairs.forEach(pair => {
-        const [policy, reward] = pair.split('=')
-        if (policy && reward) {
-          const rewardValue = parseFloat(reward)
-          trainingInfo.progress.policyRewards[policy] = rewardValue
-
-          // Track reward history per policy
-          if (!trainingInfo.progress.policyRewardHistory[policy]) {
-            trainingInfo.progress.policyRewardHistory[policy] = []
-          }
-          trainingInfo.progress.policyRewardHistory[policy].push({
-            iteration: trainingInfo.progress.currentIteration,
-            reward: rewardValue
-          })
-
-          // Keep only last 100 entries per policy
-          if (trainingInfo.progress.policyRewardHistory[policy].length > 100) {
-            trainingInfo.progress.policyRewardHistory[policy].shift()
-          }
+      break
+
+    case 'episode':
+      progress.currentEpisode = record.episode
+      progress.avgReward = record.reward
+      progress.meanEpisodeLength = record.length
+      pushHistory(progress.rewardHistory, { episode: record.episode, reward: record.reward })
+
+      for (const [policy, reward] of Object.entries(record.policies || {})) {
+        progress.policyRewards[policy] = reward
+        if (!progress.policyRewardHistory[policy]) {
+          progress.policyRewardHistory[policy] = []
         }
-      })
-    }
-    trainingInfo.progress.lastUpdate = new Date()
+        pushHistory(progress.policyRewardHistory[policy], { episode: record.episode, reward })
+      }
+      break
+
+    case 'iteration':
+      progress.currentIteration = record.iteration
+      progress.currentEpisode = record.episodes
+      progress.totalEpisodes = record.target_episodes
+      if (record.mean_length) {
+        progress.meanEpisodeLength = record.mean_length
+      }
+      for (const [policy, reward] of Object.entries(record.policies || {})) {
+        progress.policyRewards[policy] = reward
+      }
+      break
+
+    case 'checkpoint':
+      progress.lastCheckpoint = record.path
+      break
+
+    case 'run_end':
+      progress.finalStatus = record.status
+      break
+
+    default:
+      return
   }
+
+  progress.lastUpdate = new Date(record.ts * 1000)
 }
 
 /**
@@ -485,7 +642,7 @@ async function fileExists(filePath) {
  */
 export const cleanupOldTrainings = () => {
   const trainings = Array.from(activeTrainings.entries())
-    .filter(([_, t]) => t.status !== 'running')
+    .filter(([_, t]) => !['running', 'queued', 'stopping'].includes(t.status))
     .sort((a, b) => b[1].startTime - a[1].startTime)
 
   // Keep only last 100 completed/stopped trainings
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Rollout scaling report: sampled environment steps per second as rollout workers are added
+
+Builds the training algorithm for each worker count (0, 1, 2, 4, ... up to
+CPU count - 1), warms it up with one sample round, then times sampling
+`--steps` environment steps without training. Prints a table of steps/sec,
+speedup over a single process and parallel efficiency, and writes a JSON report.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def default_worker_counts(cpus: int) -> List[int]:
+    """0 (sampling in the driver), then powers of two, then every spare core"""
+    counts = [0]
+    n = 1
+    while n < cpus - 1:
+        counts.append(n)
+        n *= 2
+    if cpus - 1 > 0:
+        counts.append(cpus - 1)
+    return counts
+
+
+def sample_steps(algo, steps: int) -> int:
+    """Sample at least `steps` env steps across the algorithm's workers; returns the count"""
+    from ray.rllib.execution.rollout_ops import synchronous_parallel_sample
+
+    # Renamed from `workers` to `env_runner_group` in newer RLlib releases
+    worker_set = getattr(algo, "env_runner_group", None) or algo.workers
+    batch = synchronous_parallel_sample(worker_set=worker_set, max_env_steps=steps)
+    if isinstance(batch, list):
+        return sum(b.env_steps() for b in batch)
+    return batch.env_steps()
+
+
+def measure(env_config: Dict[str, Any], workers: int, args) -> Dict[str, Any]:
+    """Steps/sec with `workers` rollout workers"""
+    from ray.rllib.algorithms.ppo import PPOConfig
+    from primaite.session.ray_envs import PrimaiteRayMARLEnv
+
+    from rollout_resources import apply_rollout_settings, resolve_rollout_settings
+    from train_network import extract_policies_from_config, policy_mapping_fn
+
+    settings = resolve_rollout_settings(
+        num_rollout_workers=workers,
+        num_envs_per_worker=args.num_envs_per_worker,
+        rollout_fragment_length=args.rollout_fragment_length,
+        num_gpus=0
+    )
+    config = (
+        PPOConfig()
+        .environment(env=PrimaiteRayMARLEnv, env_config=env_config)
+        .framework(framework="torch")
+        .multi_agent(policies=extract_policies_from_config(env_config), policy_mapping_fn=policy_mapping_fn)
+        .training(train_batch_size=args.steps)
+        .debugging(log_level="ERROR")
+    )
+    config = apply_rollout_settings(config, settings)
+    config.model["_disable_preprocessor_api"] = True
+    config.model["_disable_action_flattening"] = True
+
+    build_start = time.perf_counter()
+    algo = config.build()
+    build_s = time.perf_counter() - build_start
+    try:
+        # First round pays for env construction and policy sync
+        sample_steps(algo, args.steps // 4 or 1)
+
+        rates = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            sampled = sample_steps(algo, args.steps)
+            rates.append(sampled / (time.perf_counter() - start))
+    finally:
+        algo.stop()
+
+    rates.sort()
+    return {
+        "workers": workers,
+        "envs_per_worker": settings["num_envs_per_worker"],
+        "steps_per_sec": rates[len(rates) // 2],
+        "build_s": build_s,
+    }
+
+
+def run(args) -> int:
+    import yaml
+    import ray
+
+    with open(args.config, 'r') as f:
+        env_config = yaml.safe_load(f)
+
+    cpus = os.cpu_count() or 1
+    counts = args.workers or default_worker_counts(cpus)
+
+    ray.shutdown()
+    ray.init(include_dashboard=False, log_to_driver=False)
+
+    results = []
+    try:
+        for workers in counts:
+            print(f"⏱️  {workers} rollout workers...", flush=True)
+            results.append(measure(env_config, workers, args))
+    finally:
+        ray.shutdown()
+
+    # Speedup is relative to a single sampling process (1 worker, else the driver alone)
+    baseline = next((r for r in results if r["workers"] == 1), results[0])
+    for result in results:
+        processes = max(1, result["workers"])
+        result["speedup"] = result["steps_per_sec"] / baseline["steps_per_sec"]
+        result["efficiency"] = result["speedup"] / processes
+
+    print(f"\n{'workers':>8} {'steps/sec':>12} {'speedup':>9} {'efficiency':>11}")
+    for result in results:
+        print(f"{result['workers']:>8} {result['steps_per_sec']:>12.1f} "
+              f"{result['speedup']:>8.2f}x {result['efficiency'] * 100:>10.0f}%")
+
+    best = max(results, key=lambda r: r["steps_per_sec"])
+    print(f"\nBest: {best['workers']} workers at {best['steps_per_sec']:.1f} steps/sec")
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "machine": {"cpus": cpus, "platform": platform.platform(), "python": platform.python_version()},
+        "config": args.config,
+        "steps": args.steps,
+        "envs_per_worker": args.num_envs_per_worker,
+        "rollout_fragment_length": args.rollout_fragment_length,
+        "results": results,
+        "best_workers": best["workers"],
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"📄 Report written to {args.output}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure rollout throughput as rollout workers are added')
+    parser.add_argument('--config', required=True, help='Path to the PrimAITE YAML configuration')
+    parser.add_argument('--workers', type=int, nargs='+', default=None,
+                        help='Worker counts to measure (default: 0, 1, 2, 4, ... CPU count - 1)')
+    parser.add_argument('--num-envs-per-worker', type=int, default=1, help='Vectorized envs per worker')
+    parser.add_argument('--rollout-fragment-length', default='auto', help="Steps per worker sample call")
+    parser.add_argument('--steps', type=int, default=4000, help='Env steps sampled per measurement')
+    parser.add_argument('--repeats', type=int, default=3, help='Measurements per worker count (median reported)')
+    parser.add_argument('--output', default=os.path.join(APP_DIR, '.cache', 'rollout_scaling.json'),
+                        help='Where to write the JSON report')
+
+    args = parser.parse_args()
+
+    os.environ.setdefault("RLLIB_TEST_NO_TF_IMPORT", "1")
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "3")
+    sys.exit(run(args))
+
+
+if __name__ == "__main__":
+    main()
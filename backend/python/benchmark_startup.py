@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the Python API, checked against startup budgets
+
+Boots the real app under uvicorn in mock mode (no checkpoint) and model mode
+(MODEL_CHECKPOINT_DIR or ray_results/checkpoints) and measures time to the
+first /health response, to model_loaded, to services ready and to the first
+simulation step. It also profiles `import main` with -X importtime. Writes a
+JSON report and exits 1 when any budget in startup_budgets.json is exceeded.
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Modules main.py must only import lazily, in the background loaders
+HEAVY_MODULES = ("ray", "torch", "tensorflow", "primaite")
+
+# Lazy imports whose cost is reported (not budgeted by default)
+LAZY_IMPORTS = {
+    "torch": "import torch",
+    "ray": "import ray",
+    "ray.rllib.ppo": "from ray.rllib.algorithms.ppo import PPOConfig",
+    "primaite.ray_envs": "from primaite.session.ray_envs import PrimaiteRayMARLEnv",
+}
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def default_checkpoint_dir() -> str:
+    return os.getenv("MODEL_CHECKPOINT_DIR", os.path.join(APP_DIR, "ray_results", "checkpoints"))
+
+
+def child_env(overrides: Dict[str, str]) -> Dict[str, str]:
+    """Environment for a measured process: hermetic storage, no XAI disk tier"""
+    env = dict(os.environ)
+    env.update({
+        "STORAGE_BACKEND": "memory",
+        "XAI_CACHE_STORE": "none",
+        "PYTHONDONTWRITEBYTECODE": "1",
+    })
+    env.update(overrides)
+    return env
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def request_json(method: str, url: str, timeout: float = 5.0) -> Optional[Dict]:
+    """JSON body of a 2xx response, or None if the server did not answer yet"""
+    req = urllib.request.Request(url, method=method, data=b"" if method == "POST" else None)
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            return json.loads(response.read())
+    except (urllib.error.URLError, ConnectionError, socket.timeout):
+        return None
+
+
+# ===== Import profile =====
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """Rows of `python -X importtime` output, in microseconds"""
+    rows = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            rows.append({
+                "module": match.group(4),
+                "self_us": int(match.group(1)),
+                "cumulative_us": int(match.group(2)),
+                "depth": len(match.group(3)) // 2,
+            })
+    return rows
+
+
+def profile_imports(statement: str, env: Dict[str, str]) -> Optional[List[Dict]]:
+    """Import profile of `statement` in a fresh interpreter, or None if it failed"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=APP_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        return None
+    return parse_importtime(result.stderr)
+
+
+def measure_imports(top: int) -> Dict:
+    """Cost of importing main, grouped by top-level package, plus the lazy heavy imports"""
+    env = child_env({})
+    # Modules the interpreter imports on its own are not charged to anyone
+    baseline = {row["module"] for row in profile_imports("pass", env) or []}
+
+    rows = profile_imports("import main", env)
+    if rows is None:
+        raise RuntimeError("`import main` failed, run it directly to see the error")
+    rows = [row for row in rows if row["module"] not in baseline]
+
+    main_row = next(row for row in rows if row["module"] == "main")
+    packages: Dict[str, int] = {}
+    for row in rows:
+        package = row["module"].split(".")[0]
+        packages[package] = packages.get(package, 0) + row["self_us"]
+    heaviest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+
+    lazy = {}
+    for name, statement in LAZY_IMPORTS.items():
+        lazy_rows = profile_imports(statement, env)
+        if lazy_rows is None:
+            lazy[name] = None  # Not installed here
+            continue
+        lazy[name] = round(sum(row["self_us"] for row in lazy_rows if row["module"] not in baseline) / 1000, 1)
+
+    return {
+        "main_ms": round(main_row["cumulative_us"] / 1000, 1),
+        "modules_imported": len(rows),
+        "packages_ms": {package: round(us / 1000, 1) for package, us in heaviest},
+        "eager_heavy_imports": sorted({
+            row["module"].split(".")[0] for row in rows if row["module"].split(".")[0] in HEAVY_MODULES
+        }),
+        "lazy_ms": lazy,
+    }
+
+
+# ===== Server boot =====
+
+def boot_once(mode: str, checkpoint_dir: str, timeout: float) -> Dict:
+    """Start the API once and time it until the first simulation step"""
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    env = child_env({"MODEL_CHECKPOINT_DIR": checkpoint_dir})
+
+    with tempfile.TemporaryFile(mode="w+") as log:
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+            cwd=APP_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+
+        def elapsed_ms() -> float:
+            return round((time.perf_counter() - start) * 1000, 1)
+
+        def wait_for(url: str, ready) -> Optional[float]:
+            while time.perf_counter() - start < timeout:
+                if process.poll() is not None:
+                    return None
+                body = request_json("GET", url, timeout=1.0)
+                if body is not None and ready(body):
+                    return elapsed_ms()
+                time.sleep(0.01)
+            return None
+
+        try:
+            run = {"first_health_ms": wait_for(f"{base}/health", lambda body: True)}
+            if run["first_health_ms"] is None:
+                raise RuntimeError("no /health response")
+
+            # The model finishes loading (or falls back to mock) before the simulation is created
+            loaded_ms = wait_for(f"{base}/", lambda body: body.get("model_loaded") or body.get("simulation_ready"))
+            run["ready_ms"] = wait_for(f"{base}/", lambda body: body.get("simulation_ready"))
+            if run["ready_ms"] is None:
+                raise RuntimeError("services never became ready")
+
+            status = request_json("GET", f"{base}/")
+            run["model_loaded"] = bool(status and status.get("model_loaded"))
+            run["model_loaded_ms"] = loaded_ms if run["model_loaded"] else None
+            if mode == "model" and not run["model_loaded"]:
+                raise RuntimeError("checkpoint present but the model did not load")
+
+            step_start = time.perf_counter()
+            if request_json("POST", f"{base}/simulation/step", timeout=timeout) is None:
+                raise RuntimeError("first simulation step failed")
+            run["step_ms"] = round((time.perf_counter() - step_start) * 1000, 1)
+            run["first_step_ms"] = elapsed_ms()
+            return run
+        except RuntimeError as e:
+            log.seek(0)
+            tail = log.read()[-2000:]
+            return {"error": str(e), "log_tail": tail}
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def summarize(runs: List[Dict]) -> Dict:
+    """Median of every timing across successful runs"""
+    keys = ("first_health_ms", "ready_ms", "model_loaded_ms", "first_step_ms", "step_ms")
+    summary = {}
+    for key in keys:
+        values = [run[key] for run in runs if run.get(key) is not None]
+        summary[key] = round(statistics.median(values), 1) if values else None
+    return summary
+
+
+def benchmark_mode(mode: str, runs: int, timeout: float) -> Dict:
+    if mode == "mock":
+        # An empty checkpoint directory makes the model service fall back to mock mode
+        with tempfile.TemporaryDirectory(prefix="autosentinel-no-checkpoint-") as empty_dir:
+            return run_mode(mode, empty_dir, runs, timeout)
+
+    from checkpoint_manager import resolve_checkpoint
+
+    checkpoint_dir = default_checkpoint_dir()
+    if resolve_checkpoint(checkpoint_dir, os.getenv("MODEL_CHECKPOINT", "best")) is None:
+        return {"status": "skipped", "reason": f"no checkpoint in {checkpoint_dir}"}
+    return run_mode(mode, checkpoint_dir, runs, timeout)
+
+
+def run_mode(mode: str, checkpoint_dir: str, runs: int, timeout: float) -> Dict:
+    results = []
+    for i in range(runs):
+        run = boot_once(mode, checkpoint_dir, timeout)
+        print(f"  {mode} run {i + 1}/{runs}: " + (
+            f"ERROR {run['error']}" if "error" in run else
+            f"health {run['first_health_ms']}ms, ready {run['ready_ms']}ms, first step {run['first_step_ms']}ms"
+        ))
+        results.append(run)
+
+    failed = [run for run in results if "error" in run]
+    return {
+        "status": "failed" if failed else "ok",
+        "runs": results,
+        "median": summarize(results),
+    }
+
+
+# ===== Budgets =====
+
+def check_budgets(report: Dict, budgets: Dict[str, float]) -> List[str]:
+    """Violations of `budgets`, keyed like "mock.first_step_ms" or "imports.main_ms" """
+    violations = []
+    for heavy in report["imports"]["eager_heavy_imports"]:
+        violations.append(f"imports: {heavy} is imported eagerly by main")
+
+    for mode, result in report["modes"].items():
+        if result["status"] == "failed":
+            violations.append(f"{mode}: startup failed ({result['runs'][-1].get('error')})")
+
+    for key, limit in budgets.items():
+        section, metric = key.split(".", 1)
+        if section == "imports":
+            value = report["imports"].get(metric)
+        else:
+            result = report["modes"].get(section, {})
+            value = result.get("median", {}).get(metric)
+        if value is not None and value > limit:
+            violations.append(f"{key}: {value}ms exceeds the {limit}ms budget")
+    return violations
+
+
+def run(args) -> int:
+    with open(args.budgets) as f:
+        budgets = json.load(f)
+
+    print("📦 Profiling imports...")
+    report = {
+        "generatedAt": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "runsPerMode": args.runs,
+        "imports": measure_imports(args.top),
+        "modes": {},
+    }
+    print(f"  import main: {report['imports']['main_ms']}ms")
+
+    for mode in args.modes:
+        print(f"🚀 Booting in {mode} mode...")
+        report["modes"][mode] = benchmark_mode(mode, args.runs, args.timeout)
+        if report["modes"][mode]["status"] == "skipped":
+            print(f"  skipped: {report['modes'][mode]['reason']}")
+
+    report["budgets"] = budgets
+    report["violations"] = check_budgets(report, budgets)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"📝 Report written to {args.output}")
+
+    if report["violations"]:
+        for violation in report["violations"]:
+            print(f"❌ {violation}")
+        return 1
+    print("✅ All startup budgets met")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark API cold start against startup budgets')
+    parser.add_argument('--modes', nargs='+', choices=['mock', 'model'], default=['mock', 'model'],
+                        help='Modes to boot (model is skipped when no checkpoint exists)')
+    parser.add_argument('--runs', type=int, default=3, help='Cold starts per mode (medians are budgeted)')
+    parser.add_argument('--timeout', type=float, default=300.0, help='Seconds to wait for each boot')
+    parser.add_argument('--top', type=int, default=15, help='Packages listed in the import profile')
+    parser.add_argument('--budgets', default=os.path.join(APP_DIR, 'startup_budgets.json'),
+                        help='JSON file of budgets in milliseconds')
+    parser.add_argument('--output', default=os.path.join(APP_DIR, '.cache', 'startup_benchmark.json'),
+                        help='Where to write the JSON report')
+
+    args = parser.parse_args()
+
+    load_dotenv()
+    sys.exit(run(args))
+
+
+if __name__ == "__main__":
+    main()
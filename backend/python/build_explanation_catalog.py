@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Precompute XAI explanations for every attacker/defender action into a versioned catalog file
+"""
+import argparse
+import asyncio
+import sys
+
+from dotenv import load_dotenv
+
+
+async def build(args):
+    from services.gemini_service import GeminiService, GEMINI_MODEL, PROMPT_VERSION
+    from services.explanation_cache import ExplanationUnavailable
+    from services.explanation_catalog import (
+        catalog_keys,
+        catalog_hash,
+        read_catalog,
+        write_catalog,
+        plan_catalog_build,
+        default_catalog_path
+    )
+
+    path = args.output or default_catalog_path()
+    catalog = read_catalog(path)
+
+    if (
+        catalog is not None
+        and not args.force
+        and catalog.get("catalogHash") == catalog_hash()
+        and catalog.get("model") == GEMINI_MODEL
+        and catalog.get("promptVersion") == PROMPT_VERSION
+        and len(catalog.get("explanations", {})) >= len(catalog_keys())
+    ):
+        print(f"[OK] {path} is up to date ({len(catalog['explanations'])} explanations)")
+        return 0
+
+    explanations, missing = plan_catalog_build(catalog, GEMINI_MODEL, PROMPT_VERSION, force=args.force)
+    print(f"Reusing {len(explanations)} explanations, generating {len(missing)}")
+
+    keys = catalog_keys()
+    gemini = GeminiService()
+    try:
+        for start in range(0, len(missing), args.batch_size):
+            chunk = missing[start:start + args.batch_size]
+            try:
+                generated = await gemini.explain_many([keys[key] for key in chunk])
+            except ExplanationUnavailable as e:
+                print(f"ERROR: batch {start // args.batch_size + 1} failed: {e}")
+                continue
+
+            explanations.update({chunk[index]: text for index, text in generated.items()})
+            print(f"  {min(start + args.batch_size, len(missing))}/{len(missing)} actions processed")
+    finally:
+        await gemini.close()
+
+    # Partial results are kept so the next run only retries what is still missing
+    write_catalog(explanations, GEMINI_MODEL, PROMPT_VERSION, path)
+
+    still_missing = len(keys) - len(explanations)
+    if still_missing:
+        print(f"ERROR: {still_missing} actions have no explanation, rerun to retry them")
+        return 1
+
+    print(f"[OK] Wrote {len(explanations)} explanations to {path}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute the XAI explanation catalog')
+    parser.add_argument('--output', default=None, help='Catalog file (default: XAI_CATALOG_PATH or xai_catalog.json)')
+    parser.add_argument('--batch-size', type=int, default=20, help='Actions explained per Gemini call')
+    parser.add_argument('--force', action='store_true', help='Regenerate every explanation even if the catalog is current')
+
+    args = parser.parse_args()
+
+    load_dotenv()
+    sys.exit(asyncio.run(build(args)))
+
+
+if __name__ == "__main__":
+    main()
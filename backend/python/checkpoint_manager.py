@@ -0,0 +1,297 @@
+"""
+Checkpoint manager: manifest, retention and background saving of RLlib checkpoints
+
+Checkpoints live in `<checkpoint_dir>/iter_<n>/`. The `manifest.json` next to
+them records each checkpoint (iteration, episodes, time, rewards per policy,
+score, size, sha256) and points at the latest and best ones. Resume and serving
+therefore read one small file and never scan the directory.
+
+`save_async` snapshots the algorithm state in the training thread, which
+mostly copies weight arrays. It then serializes, hashes and writes the checkpoint in a
+background thread while sampling continues. A checkpoint only enters the
+manifest once it is completely on disk, so a crash mid-save never leaves a
+manifest entry pointing at a partial checkpoint. Retention keeps the last
+`keep_last` checkpoints plus the `keep_best` highest scores and deletes the
+rest. Directories the manifest does not know about are never deleted.
+"""
+import os
+import copy
+import json
+import time
+import shutil
+import pickle
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+# File that marks a directory as an RLlib algorithm checkpoint
+STATE_FILE = "algorithm_state.pkl"
+
+
+def _dir_size_and_hash(path: str):
+    """Total size and a sha256 over every file (relative path and content), in a stable order"""
+    digest = hashlib.sha256()
+    size = 0
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            digest.update(os.path.relpath(file_path, path).replace(os.sep, "/").encode())
+            with open(file_path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+                    size += len(block)
+    return size, digest.hexdigest()
+
+
+def _write_json_atomic(path: str, data: Any):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class CheckpointManager:
+    """Saves, indexes and prunes the checkpoints of one training run"""
+
+    def __init__(
+        self,
+        checkpoint_dir: str,
+        keep_last: Optional[int] = None,
+        keep_best: Optional[int] = None,
+        on_saved: Optional[Callable[[Dict[str, Any]], None]] = None
+    ):
+        self.checkpoint_dir = os.path.abspath(checkpoint_dir)
+        self.keep_last = keep_last if keep_last is not None else int(os.getenv("CHECKPOINT_KEEP_LAST", "3"))
+        self.keep_best = keep_best if keep_best is not None else int(os.getenv("CHECKPOINT_KEEP_BEST", "2"))
+        self.on_saved = on_saved
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+
+        self._manifest_path = os.path.join(self.checkpoint_dir, MANIFEST_FILE)
+        self._manifest = self._load_manifest()
+        self._lock = threading.Lock()
+        # One writer: snapshots are written in order and at most one is held in memory
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpoint")
+        self._pending: Optional[Future] = None
+
+    # ---- Lookups (manifest only, no directory scan) ----
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(self._manifest_path) as f:
+                manifest = json.load(f)
+            manifest.setdefault("checkpoints", {})
+            return manifest
+        except FileNotFoundError:
+            return {"version": MANIFEST_VERSION, "checkpoints": {}, "latest": None, "best": None}
+        except ValueError as e:
+            logger.warning(f"⚠️ Unreadable checkpoint manifest {self._manifest_path}: {e}")
+            return {"version": MANIFEST_VERSION, "checkpoints": {}, "latest": None, "best": None}
+
+    def get(self, checkpoint_id: str) -> Optional[Dict[str, Any]]:
+        return self._manifest["checkpoints"].get(checkpoint_id)
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        return self.get(self._manifest["latest"]) if self._manifest.get("latest") else None
+
+    def best(self) -> Optional[Dict[str, Any]]:
+        return self.get(self._manifest["best"]) if self._manifest.get("best") else None
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """Manifest entries, oldest iteration first"""
+        return sorted(self._manifest["checkpoints"].values(), key=lambda e: e["iteration"])
+
+    # ---- Saving ----
+
+    def save_async(
+        self,
+        algo,
+        iteration: int,
+        rewards: Optional[Dict[str, float]] = None,
+        score: Optional[float] = None,
+        episodes: Optional[int] = None
+    ) -> Future:
+        """Snapshot the algorithm now and write the checkpoint in the background
+
+        Waits for the previous save first, so at most one snapshot is held in
+        memory. Returns a future resolving to the manifest entry.
+        """
+        self.wait()
+
+        started = time.perf_counter()
+        snapshot = self._snapshot(algo)
+        if snapshot is None:
+            # No usable snapshot: RLlib writes the checkpoint here, only hashing and pruning run later
+            shutil.rmtree(self._tmp_path(iteration), ignore_errors=True)
+            algo.save(checkpoint_dir=self._tmp_path(iteration))
+        snapshot_ms = (time.perf_counter() - started) * 1000
+
+        meta = {
+            "iteration": iteration,
+            "episodes": episodes,
+            "rewards": {p: float(r) for p, r in (rewards or {}).items()},
+            "score": float(score) if score is not None else None,
+            "snapshot_ms": round(snapshot_ms, 1),
+        }
+        self._pending = self._executor.submit(self._write, algo, snapshot, meta)
+        return self._pending
+
+    def save(
+        self,
+        algo,
+        iteration: int,
+        rewards: Optional[Dict[str, float]] = None,
+        score: Optional[float] = None,
+        episodes: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Save and wait until the checkpoint is on disk and in the manifest"""
+        return self.save_async(algo, iteration, rewards, score, episodes).result()
+
+    def wait(self):
+        """Wait for the save in progress, if any (a failed save is logged, not raised)"""
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            try:
+                pending.result()
+            except Exception as e:
+                logger.error(f"❌ Background checkpoint failed: {str(e)}")
+
+    def close(self):
+        self.wait()
+        self._executor.shutdown(wait=True)
+
+    def _snapshot(self, algo) -> Optional[Dict[str, Any]]:
+        """A private copy of the algorithm state, or None to save synchronously"""
+        try:
+            # Weights come back as numpy views of live tensors, and counters and filters keep
+            # changing too: copy all of it before training resumes so the checkpoint is one iteration
+            state = copy.deepcopy(algo.__getstate__())
+            policy_states = state.get("worker", {}).pop("policy_states", {})
+            return {"state": state, "policy_states": policy_states}
+        except Exception as e:
+            logger.warning(f"⚠️ Could not snapshot algorithm state ({e}), saving synchronously")
+            return None
+
+    def _tmp_path(self, iteration: int) -> str:
+        return os.path.join(self.checkpoint_dir, f".iter_{iteration:06d}.tmp")
+
+    def _write(self, algo, snapshot: Optional[Dict[str, Any]], meta: Dict[str, Any]) -> Dict[str, Any]:
+        checkpoint_id = f"iter_{meta['iteration']:06d}"
+        final_path = os.path.join(self.checkpoint_dir, checkpoint_id)
+        tmp_path = self._tmp_path(meta["iteration"])
+
+        started = time.perf_counter()
+        if snapshot is not None:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            self._write_rllib_checkpoint(algo, snapshot, tmp_path)
+        size, digest = _dir_size_and_hash(tmp_path)
+
+        # Replace an earlier checkpoint of the same iteration (e.g. a resumed run)
+        shutil.rmtree(final_path, ignore_errors=True)
+        os.replace(tmp_path, final_path)
+
+        entry = {
+            "id": checkpoint_id,
+            "path": final_path,
+            "created_at": time.time(),
+            "size_bytes": size,
+            "sha256": digest,
+            "write_ms": round((time.perf_counter() - started) * 1000, 1),
+            **meta,
+        }
+        with self._lock:
+            self._manifest["checkpoints"][checkpoint_id] = entry
+            removed = self._apply_retention()
+            _write_json_atomic(self._manifest_path, self._manifest)
+
+        for path in removed:
+            shutil.rmtree(path, ignore_errors=True)
+
+        logger.info(f"💾 Checkpoint {checkpoint_id} saved ({size / 1e6:.1f} MB, {entry['write_ms']:.0f}ms in background)")
+        if self.on_saved:
+            self.on_saved(entry)
+        return entry
+
+    @staticmethod
+    def _write_rllib_checkpoint(algo, snapshot: Dict[str, Any], path: str):
+        """Write the snapshot in RLlib's checkpoint layout (as Algorithm.save_checkpoint does)"""
+        import ray
+        from ray.rllib.utils.checkpoints import CHECKPOINT_VERSION
+
+        os.makedirs(path, exist_ok=True)
+        state = dict(snapshot["state"])
+        state["checkpoint_version"] = CHECKPOINT_VERSION
+        with open(os.path.join(path, STATE_FILE), "wb") as f:
+            pickle.dump(state, f)
+
+        policy_states = snapshot["policy_states"]
+        with open(os.path.join(path, "rllib_checkpoint.json"), "w") as f:
+            json.dump({
+                "type": "Algorithm",
+                "checkpoint_version": str(CHECKPOINT_VERSION),
+                "format": "cloudpickle",
+                "state_file": STATE_FILE,
+                "policy_ids": list(policy_states.keys()),
+                "ray_version": ray.__version__,
+                "ray_commit": ray.__commit__,
+            }, f)
+
+        for policy_id, policy_state in policy_states.items():
+            policy_dir = os.path.join(path, "policies", policy_id)
+            os.makedirs(policy_dir, exist_ok=True)
+            algo.get_policy(policy_id).export_checkpoint(policy_dir, policy_state=policy_state)
+
+    def _apply_retention(self) -> List[str]:
+        """Drop entries outside the last `keep_last` and best `keep_best`; returns their paths"""
+        entries = sorted(self._manifest["checkpoints"].values(), key=lambda e: e["iteration"])
+        scored = [e for e in entries if e.get("score") is not None]
+        best = max(scored, key=lambda e: e["score"]) if scored else None
+
+        keep = {e["id"] for e in entries[-self.keep_last:]} if self.keep_last > 0 else set()
+        if self.keep_best > 0:
+            keep.update(e["id"] for e in sorted(scored, key=lambda e: e["score"], reverse=True)[:self.keep_best])
+        if not keep and entries:
+            keep.add(entries[-1]["id"])  # Never delete everything
+
+        removed = []
+        for entry in entries:
+            if entry["id"] not in keep:
+                del self._manifest["checkpoints"][entry["id"]]
+                removed.append(entry["path"])
+
+        self._manifest["latest"] = entries[-1]["id"] if entries else None
+        self._manifest["best"] = best["id"] if best and best["id"] in keep else self._manifest["latest"]
+        return removed
+
+
+def resolve_checkpoint(checkpoint_dir: str, which: str = "best") -> Optional[str]:
+    """Path of the best/latest checkpoint in `checkpoint_dir`, via its manifest
+
+    `which` may also be a checkpoint id such as iter_000120. Without a
+    manifest, a directory that is itself a checkpoint is returned as is.
+    """
+    manifest_path = os.path.join(checkpoint_dir, MANIFEST_FILE)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return checkpoint_dir if os.path.exists(os.path.join(checkpoint_dir, STATE_FILE)) else None
+
+    checkpoint_id = manifest.get(which) if which in ("best", "latest") else which
+    entry = manifest.get("checkpoints", {}).get(checkpoint_id or "")
+    if entry is None and which == "best":
+        entry = manifest.get("checkpoints", {}).get(manifest.get("latest") or "")
+    if entry is None:
+        return None
+    # Entries are stored with absolute paths; fall back to the id if the directory was moved
+    if os.path.isdir(entry["path"]):
+        return entry["path"]
+    return os.path.join(checkpoint_dir, entry["id"])
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Gemini generateContent API, for benchmarking the XAI path offline
+
+Point the API at it with GEMINI_BASE_URL=http://localhost:8090 and any GEMINI_API_KEY.
+Latency, tail latency and error rate can be changed while it runs:
+    curl -X PUT localhost:8090/stub/config -H 'Content-Type: application/json' -d '{"error_rate": 1.0}'
+"""
+import argparse
+import json
+import asyncio
+import random
+import re
+from typing import Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+class StubConfig(BaseModel):
+    latency_ms: float = 300.0  # Median latency
+    jitter: float = 0.4  # Log-normal sigma around the median
+    tail_rate: float = 0.05  # Fraction of requests that hit the slow tail
+    tail_ms: float = 5000.0  # Extra latency of a tail request
+    error_rate: float = 0.0  # Fraction of requests answered with 503
+
+
+class StubConfigUpdate(BaseModel):
+    latency_ms: Optional[float] = None
+    jitter: Optional[float] = None
+    tail_rate: Optional[float] = None
+    tail_ms: Optional[float] = None
+    error_rate: Optional[float] = None
+
+
+config = StubConfig()
+stats = {"requests": 0, "errors": 0, "tail": 0}
+
+app = FastAPI(title="Gemini stub")
+
+
+def _generated_text(prompt: str, json_output: bool) -> str:
+    """Answer single prompts with a sentence and numbered batch prompts with a JSON array"""
+    if json_output:
+        ids = [int(n) for n in re.findall(r"^\[(\d+)\]$", prompt, flags=re.MULTILINE)]
+        return json.dumps([{"id": i, "explanation": f"Stub explanation for action {i}."} for i in ids])
+
+    action = re.search(r"^Action Taken: (.*)$", prompt, flags=re.MULTILINE)
+    return f"Stub explanation: {action.group(1) if action else 'the action'} serves the agent's objective."
+
+
+@app.post("/v1beta/models/{model_action:path}")
+async def generate_content(model_action: str, request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+
+    delay_ms = config.latency_ms * random.lognormvariate(0, config.jitter)
+    if random.random() < config.tail_rate:
+        stats["tail"] += 1
+        delay_ms += config.tail_ms
+    await asyncio.sleep(delay_ms / 1000)
+
+    if random.random() < config.error_rate:
+        stats["errors"] += 1
+        return JSONResponse(status_code=503, content={"error": {"code": 503, "message": "Stub overloaded"}})
+
+    prompt = body["contents"][0]["parts"][0]["text"]
+    json_output = body.get("generationConfig", {}).get("responseMimeType") == "application/json"
+    return {
+        "candidates": [
+            {"content": {"parts": [{"text": _generated_text(prompt, json_output)}], "role": "model"}}
+        ]
+    }
+
+
+@app.get("/stub/config")
+async def get_config():
+    return {"config": config.model_dump(), "stats": stats}
+
+
+@app.put("/stub/config")
+async def update_config(update: StubConfigUpdate):
+    global config
+    config = config.model_copy(update=update.model_dump(exclude_none=True))
+    return {"config": config.model_dump()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local Gemini API stub')
+    parser.add_argument('--port', type=int, default=8090, help='Port to listen on')
+    parser.add_argument('--latency-ms', type=float, default=300.0, help='Median response latency')
+    parser.add_argument('--tail-rate', type=float, default=0.05, help='Fraction of slow-tail responses')
+    parser.add_argument('--tail-ms', type=float, default=5000.0, help='Extra latency of slow-tail responses')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of 503 responses')
+
+    args = parser.parse_args()
+
+    global config
+    config = StubConfig(
+        latency_ms=args.latency_ms,
+        tail_rate=args.tail_rate,
+        tail_ms=args.tail_ms,
+        error_rate=args.error_rate
+    )
+
+    import uvicorn
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,17 +14,29 @@ import yaml
 import logging
 from fastapi import FastAPI, HTTPException, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
 from typing import Dict, Any, Optional, List, TYPE_CHECKING
 import asyncio
-import httpx
-import json
 from datetime import datetime, timedelta
 
+from middleware import RequestMetricsMiddleware, enforce_rate_limit, rate_limit
+from models import TrainingJobRequest
+from services.metrics import registry as metrics_registry, dashboard_figures, format_histogram
+from services.admission import DeadlineExceeded, Overloaded, deadline_from_headers, env_step_queue
+from services.explanation_cache import (
+    ExplanationCache,
+    ExplanationUnavailable,
+    create_explanation_store,
+    explanation_key
+)
+from services.gemini_service import GeminiService
+from services.action_catalog import template_explanation
+
 # Type checking imports (not loaded at runtime)
 if TYPE_CHECKING:
     from services.model_service import ModelService
-    from services.simulation_service import SimulationService
+    from services.simulation_sessions import SimulationSessions
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -46,20 +58,127 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request metrics middleware (outermost, so it also times CORS handling)
+app.add_middleware(RequestMetricsMiddleware, registry=metrics_registry)
+
+
+# Load shedding from the admission queues
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(1, round(exc.retry_after)))}
+    )
+
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
+# "api" serves requests; "model" is the shared model host started by serve.py
+API_ROLE = os.getenv("API_ROLE", "api")
+WORKER_ID = os.getenv("API_WORKER_ID", "0")
+
 # Global services (using Any to avoid import at runtime)
 model_service: Any = None
-simulation_service: Any = None
+simulation_sessions: Any = None
 db_service: Any = None
+admin_metrics_service: Any = None
+user_cache: Any = None
+activity_writer: Any = None
+training_scheduler: Any = None
+
+# One process per deployment runs training jobs (serve.py enables it on worker 0 only)
+TRAINING_SCHEDULER_ENABLED = os.getenv("TRAINING_SCHEDULER", "1") != "0"
+
+# XAI Cache for explanations (catalog and persistent tier attached at startup)
+explanation_cache = ExplanationCache()
+
+# Pooled Gemini client for live explanations
+gemini_service = GeminiService()
+
 
-# XAI Cache for explanations
-explanation_cache: Dict[str, str] = {}
+def _default_simulation():
+    """The default session's simulation, if it exists yet"""
+    return simulation_sessions.peek() if simulation_sessions else None
 
-# Metrics tracking
-api_request_count = 0
-error_count = 0
-cache_hits = 0
-cache_misses = 0
-start_time = datetime.utcnow()
+
+# Gauges read at scrape time from the live services
+metrics_registry.register_gauge(
+    "model_loaded",
+    lambda: 1 if model_service is not None and model_service.is_loaded() else 0,
+    "Whether the RL model is loaded"
+)
+metrics_registry.register_gauge(
+    "simulation_sessions",
+    lambda: len(simulation_sessions) if simulation_sessions else 0,
+    "Simulation sessions held by this worker"
+)
+metrics_registry.register_gauge(
+    "simulation_running",
+    lambda: simulation_sessions.running_count() if simulation_sessions else 0,
+    "Simulation sessions whose auto-step loop is running"
+)
+metrics_registry.register_gauge(
+    "simulation_step",
+    lambda: _default_simulation()._step_count if _default_simulation() else 0,
+    "Current step of the default simulation session"
+)
+metrics_registry.register_gauge(
+    "simulation_episode",
+    lambda: _default_simulation()._episode_count if _default_simulation() else 0,
+    "Current episode of the default simulation session"
+)
+metrics_registry.register_gauge(
+    "db_connected",
+    lambda: 1 if db_service is not None and db_service.is_connected else 0,
+    "Whether MongoDB is connected"
+)
+metrics_registry.register_gauge(
+    "db_pool_connections_open",
+    lambda: db_service.pool_stats.open_connections if db_service else 0,
+    "Open MongoDB pool connections"
+)
+metrics_registry.register_gauge(
+    "db_pool_connections_checked_out",
+    lambda: db_service.pool_stats.checked_out if db_service else 0,
+    "MongoDB pool connections currently in use"
+)
+metrics_registry.register_gauge(
+    "db_pool_max_size",
+    lambda: db_service.get_pool_max_size() if db_service else 0,
+    "Configured MongoDB pool size"
+)
+metrics_registry.register_gauge(
+    "user_cache_entries",
+    lambda: len(user_cache._entries) if user_cache else 0,
+    "Users held in the in-process quota cache"
+)
+metrics_registry.register_gauge(
+    "activity_queue_depth",
+    lambda: activity_writer.queue_depth() if activity_writer else 0,
+    "Activity events waiting to be flushed"
+)
+metrics_registry.register_gauge(
+    "xai_cache_entries",
+    lambda: len(explanation_cache._entries),
+    "Explanations held in the in-process XAI cache"
+)
+
+
+def collect_step_timings():
+    """Export process-wide simulation step phase histograms"""
+    from services.simulation_service import global_step_timings
+
+    name = "autosentinel_simulation_step_phase_ms"
+    lines = [f"# TYPE {name} histogram"]
+    for phase, hist in global_step_timings.phases.items():
+        lines.extend(format_histogram(name, (("phase", phase),), hist))
+    return lines
+
+
+metrics_registry.register_collector(collect_step_timings)
 
 # Request/Response Models
 class SimulationResponse(BaseModel):
@@ -73,12 +192,19 @@ class StepResponse(BaseModel):
     agents: Dict[str, Any]
     events: List[Dict[str, Any]]
     node_states: Dict[str, str]
+    timings: Optional[Dict[str, float]] = None
 
 class ActionExplanationRequest(BaseModel):
     action: str
     agent_type: str
     target: Optional[str] = None
     description: Optional[str] = None
+    live: bool = False  # Skip the precomputed catalog and ask Gemini with this context
+
+
+class ActionExplanationBatchRequest(BaseModel):
+    items: List[ActionExplanationRequest]
+    live: bool = False
 
 
 class QuotaCheckRequest(BaseModel):
@@ -91,24 +217,41 @@ class QuotaIncrementRequest(BaseModel):
 # Background task to load model
 async def load_model_background():
     """Load model in background to avoid blocking startup"""
-    global model_service, simulation_service
+    global model_service, simulation_sessions
 
     try:
         # Lazy import to speed up startup
-        from services.model_service import ModelService
-        from services.simulation_service import SimulationService
+        from services.simulation_sessions import SimulationSessions, DEFAULT_SESSION
 
         logger.info("🔄 Loading ML model in background...")
 
-        model_path = os.path.join(os.path.dirname(__file__), "ray_results/checkpoints")
+        model_path = os.getenv(
+            "MODEL_CHECKPOINT_DIR",
+            os.path.join(os.path.dirname(__file__), "ray_results/checkpoints")
+        )
+        # A training output directory serves its best (or MODEL_CHECKPOINT latest/<id>) checkpoint via the manifest
+        from checkpoint_manager import resolve_checkpoint
+        model_path = resolve_checkpoint(model_path, os.getenv("MODEL_CHECKPOINT", "best")) or model_path
         config_path = os.path.join(os.path.dirname(__file__), "v3.yaml")
 
-        model_service = ModelService(model_path, config_path)
-        await model_service.initialize()
+        model_url = os.getenv("MODEL_SERVICE_URL")
+        if model_url:
+            # Workers started by serve.py share the weights held by the model host
+            from services.remote_model import RemoteModelService
+            service = RemoteModelService(model_url)
+        else:
+            from services.model_service import ModelService
+            service = ModelService(model_path, config_path)
+        await service.initialize()
+        model_service = service
+
+        if API_ROLE == "model":
+            logger.info("✅ Model host ready")
+            return
 
-        # Initialize simulation service
-        simulation_service = SimulationService(model_service, config_path)
-        await simulation_service.initialize()
+        # Initialize the default simulation session
+        simulation_sessions = SimulationSessions(model_service, config_path)
+        await simulation_sessions.get(DEFAULT_SESSION)
 
         logger.info("✅ ML model loaded successfully")
 
@@ -120,7 +263,7 @@ async def load_model_background():
 # Background task to initialize database
 async def initialize_db_background():
     """Initialize database connection in background"""
-    global db_service
+    global db_service, admin_metrics_service, user_cache, activity_writer
 
     try:
         from services.db_service import DBService
@@ -132,8 +275,23 @@ async def initialize_db_background():
 
         if db_service.is_connected:
             logger.info("✅ Database connected successfully")
-            from middleware import set_db_service
+            from middleware import set_db_service, set_user_cache, set_activity_writer
+            from services.user_cache import UserCache
+            from services.activity_writer import ActivityWriter
             set_db_service(db_service)
+            user_cache = UserCache(db_service)
+            set_user_cache(user_cache)
+
+            activity_writer = ActivityWriter(db_service)
+            await activity_writer.start()
+            set_activity_writer(activity_writer)
+
+            from services.admin_metrics_service import AdminMetricsService
+            admin_metrics_service = AdminMetricsService(db_service)
+            await admin_metrics_service.start()
+
+            if os.getenv("XAI_CACHE_STORE", "disk").lower() == "db":
+                explanation_cache.set_store(create_explanation_store(db_service))
         else:
             logger.warning("⚠️ Running without database - quota system disabled")
 
@@ -144,13 +302,35 @@ async def initialize_db_background():
 # Startup event - Fast startup, load model in background
 @app.on_event("startup")
 async def startup_event():
+    global training_scheduler
+
     logger.info("🚀 AutoSentinel Python API starting...")
     logger.info("⚡ Server ready! Loading services in background...")
 
+    if API_ROLE == "model":
+        # The model host only serves inference to the workers
+        asyncio.create_task(load_model_background())
+        return
+
+    # Precomputed explanations for the whole action catalog (build_explanation_catalog.py)
+    from services.explanation_catalog import load_catalog
+    explanation_cache.set_catalog(load_catalog())
+
+    # The "db" XAI cache tier is attached once the database is up
+    try:
+        explanation_cache.set_store(create_explanation_store())
+    except Exception as e:
+        logger.warning(f"⚠️ XAI cache store unavailable, using memory only: {str(e)}")
+
     # Start background tasks to load model and database
     asyncio.create_task(load_model_background())
     asyncio.create_task(initialize_db_background())
 
+    if TRAINING_SCHEDULER_ENABLED:
+        from services.training_scheduler import TrainingScheduler
+        training_scheduler = TrainingScheduler()
+        await training_scheduler.start()
+
 # Health check endpoint
 @app.get("/")
 async def root():
@@ -159,7 +339,7 @@ async def root():
         "service": "AutoSentinel Python API",
         "version": "1.0.0",
         "model_loaded": model_service is not None and model_service.is_loaded(),
-        "simulation_ready": simulation_service is not None
+        "simulation_ready": _default_simulation() is not None
     }
 
 @app.get("/health")
@@ -167,43 +347,64 @@ async def health_check():
     return {
         "status": "healthy",
         "model_loaded": model_service.is_loaded() if model_service else False,
-        "simulation_active": simulation_service.is_running() if simulation_service else False
+        "simulation_active": simulation_sessions.running_count() > 0 if simulation_sessions else False,
+        "worker": WORKER_ID
     }
 
-@app.get("/simulation/status")
-async def get_simulation_status():
-    """Get current simulation state"""
-    if not simulation_service:
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text-format metrics"""
+    return PlainTextResponse(
+        metrics_registry.render_prometheus(),
+        media_type="text/plain; version=0.0.4"
+    )
+
+async def get_simulation(request: Request):
+    """The simulation of the request's session (X-Session-Id header or session_id query)"""
+    from middleware import get_user_from_token
+    from services.simulation_sessions import SessionLimitReached, scoped_session_id, session_id_from
+
+    if not simulation_sessions:
         raise HTTPException(status_code=500, detail="Simulation service not initialized")
 
+    # Sessions belong to the verified caller; mock tokens share the default session
+    user = await get_user_from_token(request)
+    user_id = user["id"] if user and not user.get("mock") else None
+    session_id = scoped_session_id(user_id, session_id_from(request.headers, request.query_params))
+
+    try:
+        return await simulation_sessions.get(session_id)
+    except SessionLimitReached as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@app.get("/simulation/status")
+async def get_simulation_status(simulation=Depends(get_simulation)):
+    """Get current simulation state"""
     return {
         "success": True,
-        "is_running": simulation_service.is_running(),
-        "step": int(simulation_service._step_count),
-        "episode": int(simulation_service._episode_count),
+        "is_running": simulation.is_running(),
+        "step": int(simulation._step_count),
+        "episode": int(simulation._episode_count),
         "agents": {
             "attacker": {
-                "reward": float(simulation_service.agent_rewards.get("attacker", 0)),
-                "lastAction": simulation_service.last_actions.get("attacker"),
-                "lastActionId": int(simulation_service.last_action_ids.get("attacker", 0))
+                "reward": float(simulation.agent_rewards.get("attacker", 0)),
+                "lastAction": simulation.last_actions.get("attacker"),
+                "lastActionId": int(simulation.last_action_ids.get("attacker", 0))
             },
             "defender": {
-                "reward": float(simulation_service.agent_rewards.get("defender", 0)),
-                "lastAction": simulation_service.last_actions.get("defender"),
-                "lastActionId": int(simulation_service.last_action_ids.get("defender", 0))
+                "reward": float(simulation.agent_rewards.get("defender", 0)),
+                "lastAction": simulation.last_actions.get("defender"),
+                "lastActionId": int(simulation.last_action_ids.get("defender", 0))
             }
         }
     }
 
 # Simulation control endpoints
 @app.post("/simulation/start", response_model=SimulationResponse)
-async def start_simulation():
+async def start_simulation(simulation=Depends(get_simulation)):
     """Start the simulation"""
     try:
-        if not simulation_service:
-            raise HTTPException(status_code=500, detail="Simulation service not initialized")
-
-        await simulation_service.start()
+        await simulation.start()
 
         return SimulationResponse(
             success=True,
@@ -214,13 +415,10 @@ async def start_simulation():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/simulation/stop", response_model=SimulationResponse)
-async def stop_simulation():
+async def stop_simulation(simulation=Depends(get_simulation)):
     """Stop the simulation"""
     try:
-        if not simulation_service:
-            raise HTTPException(status_code=500, detail="Simulation service not initialized")
-
-        await simulation_service.stop()
+        await simulation.stop()
 
         return SimulationResponse(
             success=True,
@@ -231,13 +429,10 @@ async def stop_simulation():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/simulation/reset", response_model=SimulationResponse)
-async def reset_simulation():
+async def reset_simulation(simulation=Depends(get_simulation)):
     """Reset the simulation"""
     try:
-        if not simulation_service:
-            raise HTTPException(status_code=500, detail="Simulation service not initialized")
-
-        await simulation_service.reset()
+        await simulation.reset()
 
         return SimulationResponse(
             success=True,
@@ -247,40 +442,53 @@ async def reset_simulation():
         logger.error(f"Error resetting simulation: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/simulation/step", response_model=StepResponse)
-async def step_simulation():
+@app.post("/simulation/step", response_model=StepResponse, dependencies=[Depends(rate_limit("simulation_step"))])
+async def step_simulation(request: Request, include_timings: bool = False, simulation=Depends(get_simulation)):
     """Execute one step of the simulation"""
     try:
-        if not simulation_service:
-            raise HTTPException(status_code=500, detail="Simulation service not initialized")
-
-        result = await simulation_service.step()
+        deadline = deadline_from_headers(request.headers)
+        result = await env_step_queue.run(lambda: simulation.step(deadline), deadline)
 
         return StepResponse(
             success=True,
             step=result["step"],
             agents=result["agents"],
             events=result["events"],
-            node_states=result["node_states"]
+            node_states=result["node_states"],
+            timings=result.get("timings") if include_timings else None
         )
+    except (Overloaded, DeadlineExceeded):
+        raise
     except Exception as e:
         logger.error(f"Error stepping simulation: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/simulation/timings")
+async def get_simulation_timings(simulation=Depends(get_simulation)):
+    """Get per-phase step timing histograms for this session and the whole process"""
+    return {
+        "success": True,
+        **simulation.get_timings()
+    }
+
 # Model inference endpoint
-@app.post("/model/predict")
-async def predict(observation: Dict[str, Any]):
+@app.post("/model/predict", dependencies=[Depends(rate_limit("model_predict"))])
+async def predict(observation: Dict[str, Any], request: Request):
     """Get model predictions for given observations"""
     try:
         if not model_service or not model_service.is_loaded():
             raise HTTPException(status_code=500, detail="Model not loaded")
 
-        actions = await model_service.predict(observation)
+        # Workers send numpy observations tagged by encode_observation
+        from services.remote_model import decode_observation
+        actions = await model_service.predict(decode_observation(observation), deadline_from_headers(request.headers))
 
         return {
             "success": True,
-            "actions": actions
+            "actions": {agent_id: int(action) for agent_id, action in actions.items()}
         }
+    except (Overloaded, DeadlineExceeded):
+        raise
     except Exception as e:
         logger.error(f"Error during prediction: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -304,6 +512,78 @@ async def model_info():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# ===== Training Job Endpoints =====
+async def get_training_user(request: Request) -> dict:
+    """Authenticated user for the training endpoints (the scheduler must run in this process)"""
+    from middleware import get_user_from_token, get_user_role
+
+    if not training_scheduler:
+        raise HTTPException(status_code=503, detail="Training scheduler is not running in this process")
+    user = await get_user_from_token(request)
+    # Jobs run code on this machine: unsigned mock tokens are not accepted
+    if not user or user.get("mock"):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    # Queue priority follows the stored role; tokens issued by Express carry no role claim
+    user["role"] = await get_user_role(user)
+    return user
+
+
+def get_training_job_for(user: dict, job_id: str) -> Dict[str, Any]:
+    """A job owned by the user (admins may see every job)"""
+    from services.training_scheduler import JobNotFound
+
+    try:
+        job = training_scheduler.get(job_id)
+    except JobNotFound:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    if job["user_id"] != user.get("id") and user.get("role") != "admin":
+        raise HTTPException(status_code=404, detail="Training job not found")
+    return job
+
+
+@app.post("/training/jobs", status_code=202)
+async def submit_training_job(job: TrainingJobRequest, user: dict = Depends(get_training_user)):
+    """Queue a training run; it starts when its cores are free"""
+    from services.training_scheduler import TrainingQueueFull
+
+    try:
+        queued = training_scheduler.submit(user.get("id"), user.get("role"), job.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except TrainingQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return {"success": True, "job": queued, "capacity": training_scheduler.capacity()}
+
+
+@app.get("/training/jobs")
+async def list_training_jobs(status: Optional[str] = None, all_users: bool = False, user: dict = Depends(get_training_user)):
+    """The user's training jobs, newest first (admins may pass all_users=true)"""
+    user_id = None if all_users and user.get("role") == "admin" else user.get("id")
+    return {
+        "success": True,
+        "jobs": training_scheduler.list_jobs(user_id=user_id, status=status),
+        "capacity": training_scheduler.capacity()
+    }
+
+
+@app.get("/training/jobs/{job_id}")
+async def get_training_job(job_id: str, user: dict = Depends(get_training_user)):
+    return {"success": True, "job": get_training_job_for(user, job_id)}
+
+
+@app.post("/training/jobs/{job_id}/cancel")
+async def cancel_training_job(job_id: str, user: dict = Depends(get_training_user)):
+    """Remove a queued job, or interrupt a running one"""
+    get_training_job_for(user, job_id)
+    return {"success": True, "job": training_scheduler.cancel(job_id)}
+
+
+@app.get("/training/capacity")
+async def get_training_capacity(user: dict = Depends(get_training_user)):
+    return {"success": True, "capacity": training_scheduler.capacity()}
+
+
 # ===== User Endpoints =====
 @app.get("/api/users/profile")
 async def get_user_profile(request: Request):
@@ -320,7 +600,7 @@ async def get_user_profile(request: Request):
 
         user_id = user.get("id")
 
-        if not db_service or not db_service.is_connected:
+        if not db_service or not db_service.is_connected or not user_cache:
             # Return mock data if database is not connected
             logger.warning("Database not connected, returning mock profile")
             return {
@@ -335,8 +615,8 @@ async def get_user_profile(request: Request):
                 "lastLogin": datetime.utcnow().isoformat()
             }
 
-        # Get user from database
-        user_data = await db_service.get_user(user_id)
+        # Get user from the cache (projected fields only)
+        user_data = await user_cache.get_user(user_id)
         if not user_data:
             raise HTTPException(status_code=404, detail="User not found")
 
@@ -380,7 +660,7 @@ async def check_quota(resource: str, request: Request):
 
         user_id = user.get("id")
 
-        if not db_service or not db_service.is_connected:
+        if not db_service or not db_service.is_connected or not user_cache:
             # Return mock quota if database is not connected
             logger.warning("Database not connected, returning mock quota")
             return {
@@ -391,7 +671,7 @@ async def check_quota(resource: str, request: Request):
             }
 
         # Get quota status
-        quota_status = await db_service.get_user_quota_status(user_id, resource)
+        quota_status = await user_cache.get_quota_status(user_id, resource)
         if not quota_status:
             raise HTTPException(status_code=404, detail="User not found")
 
@@ -428,7 +708,7 @@ async def increment_quota(request: QuotaIncrementRequest, user_request: Request)
 
         user_id = user.get("id")
 
-        if not db_service or not db_service.is_connected:
+        if not db_service or not db_service.is_connected or not user_cache:
             # Mock response if database not connected
             logger.warning("Database not connected, returning mock increment response")
             return {
@@ -437,16 +717,26 @@ async def increment_quota(request: QuotaIncrementRequest, user_request: Request)
                 "remaining": 99
             }
 
-        # Update usage
-        updated_user = await db_service.update_user_usage(user_id, request.resource)
-        if not updated_user:
+        # Reset, limit check and increment in a single atomic round trip
+        quota_status = await db_service.increment_usage(user_id, request.resource)
+        if not quota_status:
             raise HTTPException(status_code=404, detail="User not found")
 
-        # Get new quota status
-        quota_status = await db_service.get_user_quota_status(user_id, request.resource)
+        # Write the fresh usage through to the cache so quota checks see it immediately
+        user_cache.apply_update(user_id, quota_status["user"])
+
+        if not quota_status["allowed"]:
+            raise HTTPException(
+                status_code=429,
+                detail={
+                    "error": f"You have reached your {request.resource} limit for today",
+                    "remaining": 0,
+                    "resetTime": quota_status["resetTime"].isoformat()
+                }
+            )
 
-        # Log activity
-        await db_service.log_activity(
+        # Queue the activity for the buffered bulk writer
+        activity_writer.log(
             user_id,
             f"{request.resource}_created",
             f"User incremented {request.resource} usage",
@@ -466,24 +756,127 @@ async def increment_quota(request: QuotaIncrementRequest, user_request: Request)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
-# ===== Admin Endpoints =====
-@app.get("/api/admin/metrics")
-async def get_admin_metrics(request: Request):
-    """Get system metrics (admin only)"""
-    global db_service
+# ===== Activity Feed Endpoints =====
+async def get_activity_feed_page(
+    user_id: Optional[str],
+    limit: int,
+    cursor: Optional[str],
+    activity_type: Optional[str],
+    fields: Optional[str]
+) -> Dict[str, Any]:
+    """Fetch one keyset-paginated activity page and serialize it"""
+    from services.db_service import encode_activity_cursor, decode_activity_cursor
+
+    if not 1 <= limit <= 100:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 100")
+
+    try:
+        position = decode_activity_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if not db_service or not db_service.is_connected:
+        # Empty feed if database is not connected
+        logger.warning("Database not connected, returning empty activity feed")
+        return {"activities": [], "nextCursor": None}
+
+    events, next_position = await db_service.get_activity_feed(
+        limit=limit,
+        cursor=position,
+        user_id=user_id,
+        activity_type=activity_type,
+        fields=fields.split(",") if fields else None
+    )
+
+    activities = []
+    for event in events:
+        event["id"] = str(event.pop("_id"))
+        event["timestamp"] = event["timestamp"].isoformat()
+        activities.append(event)
+
+    return {
+        "activities": activities,
+        "nextCursor": encode_activity_cursor(*next_position) if next_position else None
+    }
+
 
+@app.get("/api/users/activities")
+async def get_my_activities(
+    request: Request,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    type: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """Page through the current user's activity history"""
     try:
         from middleware import get_user_from_token
 
-        # Get user from token
         user = await get_user_from_token(request)
         if not user:
             raise HTTPException(status_code=401, detail="Unauthorized")
 
-        # TODO: Verify user role is admin
-        # For now, we'll assume the user is admin if they have a token
+        return await get_activity_feed_page(user.get("id"), limit, cursor, type, fields)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting user activities: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
 
-        if not db_service or not db_service.is_connected:
+
+async def require_admin(request: Request) -> dict:
+    """The calling user, if their stored role is admin (unsigned mock tokens are refused)"""
+    from middleware import get_user_from_token, get_user_role
+
+    user = await get_user_from_token(request)
+    if not user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    if user.get("mock") or await get_user_role(user) != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user
+
+
+@app.get("/api/admin/activities")
+async def get_admin_activities(
+    request: Request,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    type: Optional[str] = None,
+    user_id: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """Page through all users' activity history (admin only)"""
+    try:
+        await require_admin(request)
+
+        return await get_activity_feed_page(user_id, limit, cursor, type, fields)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting activity feed: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+# ===== Admin Endpoints =====
+def get_system_metrics() -> Dict[str, Any]:
+    """System metrics for the admin dashboard, from the same registry that backs /metrics
+
+    Under serve.py the router replaces these with figures from every worker.
+    """
+    return dashboard_figures(metrics_registry.summary())
+
+
+@app.get("/api/admin/metrics")
+async def get_admin_metrics(request: Request):
+    """Get system metrics (admin only)"""
+    global db_service
+
+    try:
+        await require_admin(request)
+
+        if not db_service or not db_service.is_connected or not admin_metrics_service:
             # Return mock metrics if database not connected
             logger.warning("Database not connected, returning mock metrics")
             return {
@@ -499,55 +892,15 @@ async def get_admin_metrics(request: Request):
                 "usersByRole": {"free": 980, "premium": 250, "admin": 20},
                 "topUsers": [],
                 "recentActivities": [],
-                "uptime": "99.9%",
-                "avgResponseTime": "45ms",
-                "apiRequestsPerMin": 1234,
-                "errorRate": "0.1%",
-                "cacheHitRate": "89%"
+                **get_system_metrics()
             }
 
-        # Get all metrics
-        total_users = await db_service.get_total_users_count()
-        users_by_role = await db_service.get_users_by_role()
-        top_users = await db_service.get_top_users(10)
-        recent_activities = await db_service.get_recent_activities(50)
-        daily_stats = await db_service.get_daily_stats()
-
-        # Calculate system metrics
-        uptime_seconds = (datetime.utcnow() - start_time).total_seconds()
-        uptime_hours = uptime_seconds / 3600
-        uptime_percent = 99.9  # Mock value
-
-        avg_response_time = 45 if api_request_count > 0 else 0
-        error_rate = (error_count / api_request_count * 100) if api_request_count > 0 else 0
-        cache_hit_rate = (cache_hits / (cache_hits + cache_misses) * 100) if (cache_hits + cache_misses) > 0 else 0
+        # Database figures are served from the background-refreshed snapshot
+        snapshot = await admin_metrics_service.get_snapshot()
 
         return {
-            "totalUsers": total_users,
-            "usersOnline": 0,  # Would need real-time tracking
-            "activeTrainings": 0,  # Would need real-time tracking
-            "activeSimulations": 0,  # Would need real-time tracking
-            "totalNetworks": 0,  # Would need database tracking
-            "trainingsToday": daily_stats.get("trainingsToday", 0),
-            "simulationsToday": daily_stats.get("simulationsToday", 0),
-            "networksToday": daily_stats.get("networksToday", 0),
-            "newUsersToday": daily_stats.get("newUsersToday", 0),
-            "usersByRole": users_by_role,
-            "topUsers": top_users,
-            "recentActivities": [
-                {
-                    "type": activity.get("type", "unknown"),
-                    "description": activity.get("description", ""),
-                    "timestamp": activity.get("timestamp", datetime.utcnow()).isoformat(),
-                    "userId": activity.get("userId", "")
-                }
-                for activity in recent_activities
-            ],
-            "uptime": f"{uptime_percent}%",
-            "avgResponseTime": f"{int(avg_response_time)}ms",
-            "apiRequestsPerMin": api_request_count,
-            "errorRate": f"{error_rate:.1f}%",
-            "cacheHitRate": f"{cache_hit_rate:.1f}%"
+            **snapshot,
+            **get_system_metrics()
         }
 
     except HTTPException:
@@ -558,99 +911,12 @@ async def get_admin_metrics(request: Request):
 
 
 # XAI - Explainable AI endpoints
-async def get_gemini_explanation(action: str, agent_type: str, target: Optional[str] = None, description: Optional[str] = None) -> str:
-    """
-    Call Google Gemini API to generate XAI explanation for actions
-    """
-    api_key = os.getenv("GEMINI_API_KEY")
+# Most actions explained by one batch prompt; larger batches are split into several prompts
+XAI_BATCH_PROMPT_ITEMS = int(os.getenv("XAI_BATCH_PROMPT_ITEMS", "25"))
+XAI_BATCH_MAX_ITEMS = int(os.getenv("XAI_BATCH_MAX_ITEMS", "100"))
 
-    if not api_key:
-        logger.warning("GEMINI_API_KEY not set, using fallback explanation")
-        return "Explanation unavailable - API key not configured"
 
-    # Build context
-    context = f"Agent Type: {agent_type}"
-    if target:
-        context += f"\nTarget: {target}"
-    if description:
-        context += f"\nContext: {description}"
-
-    prompt = f"""You are a cybersecurity expert explaining AI agent actions in a network security simulation.
-
-{context}
-Action Taken: {action}
-
-Provide a brief, clear explanation (1-2 sentences max) of why this action makes sense in the context of {'attacking/breaching' if agent_type == 'attacker' else 'defending'} a network.
-Be concise and technical. Focus on the strategic reasoning."""
-
-    try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(
-                "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent",
-                headers={"Content-Type": "application/json", "X-goog-api-key": api_key},
-                json={
-                    "contents": [
-                        {
-                            "parts": [
-                                {
-                                    "text": prompt
-                                }
-                            ]
-                        }
-                    ],
-                    "generationConfig": {
-                        "maxOutputTokens": 100,
-                        "temperature": 0.7
-                    }
-                }
-            )
-
-            logger.info(f"Gemini API response status: {response.status_code}")
-
-            if response.status_code == 200:
-                try:
-                    data = response.json()
-                    logger.info(f"📦 Full Gemini API response: {json.dumps(data, indent=2)}")
-
-                    # Check for error in response
-                    if "error" in data:
-                        logger.error(f"Gemini API returned error: {data['error']}")
-                        return f"Gemini Error: {data['error'].get('message', 'Unknown error')}"
-
-                    # Try to extract text from various possible structures
-                    if "candidates" in data and len(data["candidates"]) > 0:
-                        candidate = data["candidates"][0]
-                        if "content" in candidate and "parts" in candidate["content"]:
-                            parts = candidate["content"]["parts"]
-                            if len(parts) > 0 and "text" in parts[0]:
-                                explanation = parts[0]["text"]
-                                logger.info(f"✅ Successfully extracted explanation: {explanation[:100]}...")
-                                return explanation
-
-                    if "contents" in data and len(data["contents"]) > 0:
-                        if "parts" in data["contents"][0] and len(data["contents"][0]["parts"]) > 0:
-                            explanation = data["contents"][0]["parts"][0]["text"]
-                            logger.info(f"✅ Successfully extracted explanation: {explanation[:100]}...")
-                            return explanation
-
-                    logger.error(f"❌ Unexpected response structure: {json.dumps(data)}")
-                    return "Unable to generate explanation - unexpected response format"
-
-                except Exception as parse_err:
-                    logger.error(f"❌ Error parsing response: {str(parse_err)}")
-                    logger.error(f"Raw response text: {response.text}")
-                    return f"Error parsing response: {str(parse_err)}"
-            else:
-                logger.error(f"❌ Gemini API error: {response.status_code} - {response.text}")
-                return f"API Error: {response.status_code}"
-    except asyncio.TimeoutError:
-        logger.error("Gemini API request timeout")
-        return "API request timeout"
-    except Exception as e:
-        logger.error(f"Error calling Gemini API: {str(e)}")
-        return f"Error: {str(e)}"
-
-@app.post("/xai/explain-action")
+@app.post("/xai/explain-action", dependencies=[Depends(rate_limit("xai_explain"))])
 async def explain_action(request: ActionExplanationRequest):
     """
     Get XAI explanation for an action using Gemini API
@@ -658,38 +924,39 @@ async def explain_action(request: ActionExplanationRequest):
     logger.info(f"🔍 XAI request received: action={request.action}, agent_type={request.agent_type}, target={request.target}")
 
     # Create cache key
-    cache_key = f"{request.agent_type}:{request.action}:{request.target or ''}"
-
-    # Check cache first
-    if cache_key in explanation_cache:
-        logger.info(f"✓ Returning cached explanation for {cache_key}")
-        return {
-            "success": True,
-            "action": request.action,
-            "explanation": explanation_cache[cache_key],
-            "cached": True
-        }
+    cache_key = explanation_key(request.agent_type, request.action, request.target)
 
     try:
-        logger.info(f"📡 Calling Gemini API for: {request.action}")
-        # Call Gemini API
-        explanation = await get_gemini_explanation(
-            request.action,
-            request.agent_type,
-            request.target,
-            request.description
+        # Catalog, memory, then persistent tier; concurrent misses for one key share a single Gemini call
+        explanation, source = await explanation_cache.get_or_load(
+            cache_key,
+            lambda: gemini_service.explain(
+                request.action,
+                request.agent_type,
+                request.target,
+                request.description
+            ),
+            use_catalog=not request.live
         )
 
-        logger.info(f"✅ Got explanation: {explanation[:100]}...")
-
-        # Cache the result
-        explanation_cache[cache_key] = explanation
+        logger.info(f"✅ Got explanation ({source}): {explanation[:100]}...")
 
         return {
             "success": True,
             "action": request.action,
             "explanation": explanation,
-            "cached": False
+            "cached": source != "upstream",
+            "source": source
+        }
+    except ExplanationUnavailable as e:
+        # Templated fallback (not cached) so the viewer is never left waiting on Gemini
+        return {
+            "success": True,
+            "action": request.action,
+            "explanation": template_explanation(request.agent_type, request.action, request.target),
+            "cached": False,
+            "source": "template",
+            "fallbackReason": str(e)
         }
     except Exception as e:
         logger.error(f"❌ XAI Error: {str(e)}", exc_info=True)
@@ -699,6 +966,67 @@ async def explain_action(request: ActionExplanationRequest):
             "explanation": "Unable to generate explanation"
         }
 
+@app.post("/xai/explain-actions")
+async def explain_actions(request: ActionExplanationBatchRequest, http_request: Request):
+    """
+    Get XAI explanations for many actions, with one Gemini call for all cache misses
+    """
+    if len(request.items) > XAI_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {XAI_BATCH_MAX_ITEMS} items per batch")
+
+    keys = [explanation_key(item.agent_type, item.action, item.target) for item in request.items]
+    items_by_key = dict(zip(reversed(keys), reversed(request.items)))  # First item wins per key
+
+    # Charged like the Gemini prompts the batch could need
+    await enforce_rate_limit(http_request, "xai_explain", cost=-(-len(items_by_key) // XAI_BATCH_PROMPT_ITEMS))
+
+    async def load_batch(missing: List[str]) -> Dict[str, str]:
+        chunks = [missing[i:i + XAI_BATCH_PROMPT_ITEMS] for i in range(0, len(missing), XAI_BATCH_PROMPT_ITEMS)]
+        results = await asyncio.gather(
+            *(gemini_service.explain_many([items_by_key[key].model_dump() for key in chunk]) for chunk in chunks),
+            return_exceptions=True
+        )
+
+        # Every prompt failed: surface that failure's fallback text for all items
+        if all(isinstance(result, Exception) for result in results):
+            raise results[0]
+
+        loaded = {}
+        for chunk, result in zip(chunks, results):
+            if not isinstance(result, Exception):
+                loaded.update({chunk[index]: explanation for index, explanation in result.items()})
+        return loaded
+
+    logger.info(f"🔍 XAI batch request received: {len(request.items)} items, {len(items_by_key)} distinct")
+    outcomes = await explanation_cache.get_or_load_many(keys, load_batch, use_catalog=not request.live)
+
+    explanations = []
+    for item, key in zip(request.items, keys):
+        outcome = outcomes[key]
+        entry = {"action": item.action, "agent_type": item.agent_type, "target": item.target}
+
+        if isinstance(outcome, ExplanationUnavailable):
+            # Templated fallback, not cached
+            entry.update({
+                "success": True,
+                "explanation": template_explanation(item.agent_type, item.action, item.target),
+                "cached": False,
+                "source": "template",
+                "fallbackReason": str(outcome)
+            })
+        elif isinstance(outcome, Exception):
+            logger.error(f"❌ XAI Error: {str(outcome)}")
+            entry.update({"success": False, "error": str(outcome), "explanation": "Unable to generate explanation"})
+        else:
+            explanation, source = outcome
+            entry.update({"success": True, "explanation": explanation, "cached": source != "upstream", "source": source})
+        explanations.append(entry)
+
+    return {
+        "success": True,
+        "explanations": explanations
+    }
+
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown_event():
@@ -707,9 +1035,30 @@ async def shutdown_event():
 
     logger.info("🛑 AutoSentinel API shutting down...")
 
+    if simulation_sessions:
+        await simulation_sessions.stop_all()
+
+    # Running jobs are interrupted and resume from their latest checkpoint on the next start
+    if training_scheduler:
+        await training_scheduler.stop()
+
+    if admin_metrics_service:
+        await admin_metrics_service.stop()
+
+    # Flush queued activity logs before the database connection closes
+    if activity_writer:
+        await activity_writer.stop()
+
     if db_service:
         await db_service.disconnect()
 
+    await gemini_service.close()
+
+    # Pooled connections to the model host, when running as a worker
+    close_model = getattr(model_service, "close", None)
+    if close_model:
+        await close_model()
+
     logger.info("✅ Shutdown complete")
 
 
@@ -3,22 +3,96 @@ Middleware for quota checking and request processing
 """
 
 import logging
+import math
 import os
+import time
+import hashlib
 import jwt
+from collections import OrderedDict
 from fastapi import Request, HTTPException, Depends
-from typing import Optional
+from typing import Optional, Tuple
 from functools import wraps
 from datetime import datetime
 
+from services.metrics import registry as metrics_registry
+from services.rate_limiter import RateLimiter
+
 logger = logging.getLogger(__name__)
 
 # Global db_service reference (will be set in main.py)
 db_service = None
 
+# Global user_cache reference (will be set in main.py)
+user_cache = None
+
+# Global activity_writer reference (will be set in main.py)
+activity_writer = None
+
 # JWT configuration
 JWT_SECRET = os.getenv("JWT_SECRET", "your-secret-key-here")
 JWT_ALGORITHM = "HS256"
 
+# Verified-token cache configuration
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "4096"))
+JWT_CACHE_MAX_TTL = float(os.getenv("JWT_CACHE_MAX_TTL_SECONDS", "300"))  # For tokens without `exp`
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of already-verified JWTs, keyed by token digest
+
+    Entries expire exactly at the token's `exp` claim, so a cached token is
+    never accepted past the point where jwt.decode would reject it.
+    """
+
+    def __init__(self, max_entries: int = JWT_CACHE_SIZE, max_ttl: float = JWT_CACHE_MAX_TTL):
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        self._entries: "OrderedDict[bytes, Tuple[float, dict]]" = OrderedDict()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        """Get the claims of a cached, unexpired token"""
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            metrics_registry.inc("jwt_cache_misses_total")
+            return None
+
+        expires_at, user = entry
+        if time.time() >= expires_at:
+            del self._entries[key]
+            metrics_registry.inc("jwt_cache_misses_total")
+            return None
+
+        self._entries.move_to_end(key)
+        metrics_registry.inc("jwt_cache_hits_total")
+        return dict(user)
+
+    def put(self, token: str, payload: dict, user: dict):
+        """Cache the claims of a token that just passed verification"""
+        expires_at = time.time() + self.max_ttl
+        if "exp" in payload:
+            expires_at = min(expires_at, float(payload["exp"]))
+
+        self._entries[self._key(token)] = (expires_at, user)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+token_cache = VerifiedTokenCache()
+metrics_registry.describe("jwt_cache_hits_total", "Bearer tokens answered from the verified-token cache")
+metrics_registry.describe("jwt_cache_misses_total", "Bearer tokens that needed full JWT verification")
+metrics_registry.register_gauge("jwt_cache_entries", lambda: len(token_cache), "Verified tokens held in memory")
+
+rate_limiter = RateLimiter()
+metrics_registry.register_gauge("rate_limit_buckets", lambda: len(rate_limiter), "Rate limiter buckets held in memory")
+
 
 def set_db_service(service):
     """Set the database service for middleware"""
@@ -26,6 +100,18 @@ def set_db_service(service):
     db_service = service
 
 
+def set_user_cache(cache):
+    """Set the user/quota cache for middleware"""
+    global user_cache
+    user_cache = cache
+
+
+def set_activity_writer(writer):
+    """Set the buffered activity writer for middleware"""
+    global activity_writer
+    activity_writer = writer
+
+
 async def get_user_from_token(request: Request) -> Optional[dict]:
     """Extract user info from Authorization header"""
     auth_header = request.headers.get("Authorization", "")
@@ -35,20 +121,29 @@ async def get_user_from_token(request: Request) -> Optional[dict]:
 
     token = auth_header.split("Bearer ")[1]
 
+    # Skip signature verification for tokens verified earlier in this process
+    cached_user = token_cache.get(token)
+    if cached_user is not None:
+        return cached_user
+
     try:
         # Try to decode JWT token first (standard format)
         try:
             payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-            return {
-                "id": payload.get("sub") or payload.get("user_id"),
+            user = {
+                # Express signs its tokens with an `id` claim
+                "id": payload.get("sub") or payload.get("user_id") or payload.get("id"),
                 "email": payload.get("email"),
                 "role": payload.get("role", "free")
             }
+            token_cache.put(token, payload, user)
+            return dict(user)
         except jwt.InvalidTokenError:
             # Fall back to mock token format for testing
             if token.startswith("user:"):
                 user_id = token.split(":", 1)[1]
-                return {"id": user_id}
+                # Unsigned: callers that grant privileges must refuse these
+                return {"id": user_id, "mock": True}
             return None
 
     except Exception as e:
@@ -56,6 +151,20 @@ async def get_user_from_token(request: Request) -> Optional[dict]:
         return None
 
 
+async def get_user_role(user: dict) -> str:
+    """The caller's role from their stored user record
+
+    Express signs tokens with only an `id` claim, so the token cannot say
+    whether a user is premium or admin. The user cache answers from memory
+    in steady state; without it the token's own claim (if any) is used.
+    """
+    if user_cache and user.get("id"):
+        user_data = await user_cache.get_user(user["id"])
+        if user_data:
+            return user_data.get("role") or "free"
+    return user.get("role") or "free"
+
+
 async def check_quota(request: Request, resource: str):
     """Middleware to check user quota before allowing action"""
     global db_service
@@ -72,8 +181,11 @@ async def check_quota(request: Request, resource: str):
 
         user_id = user.get("id")
 
-        # Get user's quota status
-        quota_status = await db_service.get_user_quota_status(user_id, resource)
+        # Get user's quota status (from the in-process cache when available)
+        if user_cache:
+            quota_status = await user_cache.get_quota_status(user_id, resource)
+        else:
+            quota_status = await db_service.get_user_quota_status(user_id, resource)
         if not quota_status:
             raise HTTPException(status_code=404, detail="User not found")
 
@@ -101,6 +213,39 @@ async def check_quota(request: Request, resource: str):
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+async def enforce_rate_limit(request: Request, endpoint: str, cost: float = 1.0):
+    """Reject the request with 429 when its caller is over the endpoint's rate limit
+
+    Callers are keyed by user id from the bearer token (role from their stored
+    user record), or by client address with the free tier's limits when anonymous.
+    Unsigned mock tokens count as anonymous, or any made-up id would get its own bucket.
+    """
+    user = await get_user_from_token(request)
+    if user and user.get("id") and not user.get("mock"):
+        caller, role = f"user:{user['id']}", await get_user_role(user)
+    else:
+        caller, role = f"ip:{request.client.host if request.client else 'unknown'}", "free"
+
+    retry_after = rate_limiter.acquire(caller, endpoint, role, cost)
+    if retry_after > 0:
+        seconds = max(1, math.ceil(retry_after))
+        raise HTTPException(
+            status_code=429,
+            detail={
+                "error": "Too many requests, slow down",
+                "retryAfter": seconds
+            },
+            headers={"Retry-After": str(seconds)}
+        )
+
+
+def rate_limit(endpoint: str):
+    """Dependency applying the per-user rate limit of `endpoint`"""
+    async def dependency(request: Request):
+        await enforce_rate_limit(request, endpoint)
+    return dependency
+
+
 async def log_activity(user_id: str, activity_type: str, description: str, metadata: dict = None):
     """Log user activity to database"""
     global db_service
@@ -110,6 +255,40 @@ async def log_activity(user_id: str, activity_type: str, description: str, metad
         return
 
     try:
-        await db_service.log_activity(user_id, activity_type, description, metadata)
+        if activity_writer:
+            activity_writer.log(user_id, activity_type, description, metadata)
+        else:
+            await db_service.log_activity(user_id, activity_type, description, metadata)
     except Exception as e:
         logger.error(f"Error logging activity: {str(e)}")
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware recording per-route request counts, errors and latency"""
+
+    def __init__(self, app, registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Label by route template (not raw path) to keep cardinality bounded
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            duration_ms = (time.perf_counter() - start) * 1000
+            self.registry.record_request(scope["method"], route_path, status_code, duration_ms)
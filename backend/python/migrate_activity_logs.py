@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Migrate the legacy activity_logs collection into hourly activity buckets
+"""
+import argparse
+import asyncio
+import sys
+
+from dotenv import load_dotenv
+
+from services.db_service import DBService
+
+
+async def migrate(args):
+    db_service = DBService()
+    await db_service.connect()
+
+    if not db_service.is_connected:
+        print("ERROR: Could not connect to MongoDB (is MONGODB_URI set?)")
+        return 1
+
+    try:
+        migrated = await db_service.migrate_activity_logs(
+            batch_size=args.batch_size,
+            drop_source=args.drop_source
+        )
+        print(f"[OK] Migrated {migrated} activities")
+        return 0
+    finally:
+        await db_service.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Migrate activity_logs into time-bucketed storage')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Activities copied per round trip')
+    parser.add_argument('--drop-source', action='store_true', help='Drop activity_logs once every document is copied')
+
+    args = parser.parse_args()
+
+    load_dotenv()
+    sys.exit(asyncio.run(migrate(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -59,6 +59,19 @@ class QuotaIncrementResponse(BaseModel):
     remaining: int
 
 
+class TrainingJobRequest(BaseModel):
+    network_id: str
+    network_name: Optional[str] = None
+    config_path: str
+    training_id: str  # Output goes to TRAINING_OUTPUT_ROOT/<training_id>
+    episodes: int = Field(1000, ge=1)
+    save_frequency: int = Field(10, ge=1)
+    algorithm: str = "PPO"
+    num_rollout_workers: Optional[int] = Field(None, ge=0)  # Default: TRAINING_DEFAULT_WORKERS
+    num_envs_per_worker: int = Field(1, ge=1)
+    cpu_only: bool = False
+
+
 class AdminMetricsResponse(BaseModel):
     totalUsers: int
     usersOnline: int
@@ -183,6 +196,49 @@ QUOTA_LIMITS = {
 }
 
 
+# ===== Rate Limit Configuration =====
+# Token buckets per user and endpoint: (requests per minute, burst); None is unlimited.
+# Override with RATE_LIMIT_<ENDPOINT>_<ROLE>="<per minute>:<burst>", e.g. RATE_LIMIT_SIMULATION_STEP_FREE=30:5
+RATE_LIMITS = {
+    "free": {
+        "simulation_step": (60, 10),
+        "model_predict": (60, 10),
+        "xai_explain": (30, 10)
+    },
+    "premium": {
+        "simulation_step": (300, 30),
+        "model_predict": (300, 30),
+        "xai_explain": (120, 30)
+    },
+    "admin": {
+        "simulation_step": None,
+        "model_predict": None,
+        "xai_explain": None
+    }
+}
+
+
+# ===== Training Scheduler Configuration =====
+# Queue priority per role (lower runs first); waiting jobs gain one level per TRAINING_AGING_SECONDS
+TRAINING_PRIORITIES = {
+    "admin": 0,
+    "premium": 1,
+    "free": 2
+}
+
+# Usage/limit keys for the singular resource names accepted by the quota endpoints
+RESOURCE_USAGE_KEYS = {
+    "network": "networks",
+    "training": "trainings",
+    "simulation": "simulations"
+}
+
+
+def get_usage_key(resource: str) -> str:
+    """Map a quota resource name to its usage/limit key"""
+    return RESOURCE_USAGE_KEYS.get(resource, resource)
+
+
 def get_quota_limit(role: UserRole, resource: str) -> int:
     """Get quota limit for a user role and resource"""
     limits = QUOTA_LIMITS.get(role.value, QUOTA_LIMITS["free"])
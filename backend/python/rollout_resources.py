@@ -0,0 +1,106 @@
+"""
+Rollout parallelism and hardware settings shared by the training scripts
+
+Sampling PrimAITE episodes is CPU-bound Python, so throughput comes from
+running environments in parallel rollout worker processes; the learner
+only needs a GPU when one is actually present.
+"""
+import os
+import logging
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# rollout_fragment_length value that lets RLlib derive it from train_batch_size
+AUTO = "auto"
+
+
+def detect_resources() -> Dict[str, int]:
+    """CPUs and usable GPUs on this machine
+
+    CUDA_VISIBLE_DEVICES=-1 (or empty) counts as no GPU without importing torch.
+    """
+    cpus = os.cpu_count() or 1
+    visible = os.getenv("CUDA_VISIBLE_DEVICES")
+    if visible is not None and visible.strip() in ("", "-1"):
+        return {"cpus": cpus, "gpus": 0}
+
+    try:
+        import torch
+        gpus = torch.cuda.device_count() if torch.cuda.is_available() else 0
+    except Exception:
+        gpus = 0
+    return {"cpus": cpus, "gpus": gpus}
+
+
+def add_rollout_arguments(parser):
+    """Add the rollout worker / vectorized env / device options to an argparse parser"""
+    parser.add_argument('--num-rollout-workers', type=int, default=None,
+                        help='Parallel rollout worker processes (default: CPU count - 1)')
+    parser.add_argument('--num-envs-per-worker', type=int, default=1,
+                        help='Environments stepped as one vectorized batch by each worker')
+    parser.add_argument('--rollout-fragment-length', default=AUTO,
+                        help="Steps each worker collects per sample call (default: 'auto', from the train batch size)")
+    parser.add_argument('--num-gpus', type=float, default=None,
+                        help='GPUs for the learner (default: 1 if a GPU is detected, else 0)')
+    parser.add_argument('--cpu-only', action='store_true', help='Never use a GPU, even if one is detected')
+
+
+def resolve_rollout_settings(num_rollout_workers: Optional[int] = None,
+                             num_envs_per_worker: int = 1,
+                             rollout_fragment_length: Any = AUTO,
+                             num_gpus: Optional[float] = None,
+                             cpu_only: bool = False,
+                             local_mode: bool = False) -> Dict[str, Any]:
+    """Fill in automatic values: one rollout worker per spare core, a GPU only if present
+
+    Ray's local mode runs everything in one process, so workers are forced to 0 there.
+    """
+    resources = detect_resources()
+
+    if local_mode:
+        if num_rollout_workers:
+            logger.warning("⚠️ Ray local mode runs in one process, ignoring num_rollout_workers")
+        num_rollout_workers = 0
+    elif num_rollout_workers is None:
+        # Leave one core for the driver, which runs the learner
+        num_rollout_workers = max(0, resources["cpus"] - 1)
+
+    if cpu_only:
+        num_gpus = 0
+    elif num_gpus is None:
+        num_gpus = 1 if resources["gpus"] > 0 else 0
+
+    if rollout_fragment_length != AUTO:
+        rollout_fragment_length = int(rollout_fragment_length)
+
+    return {
+        "num_rollout_workers": int(num_rollout_workers),
+        "num_envs_per_worker": max(1, int(num_envs_per_worker)),
+        "rollout_fragment_length": rollout_fragment_length,
+        "num_gpus": num_gpus,
+        "detected_cpus": resources["cpus"],
+        "detected_gpus": resources["gpus"],
+    }
+
+
+def apply_rollout_settings(config, settings: Dict[str, Any]):
+    """Apply resolved settings to an RLlib AlgorithmConfig"""
+    return (
+        config
+        .rollouts(
+            num_rollout_workers=settings["num_rollout_workers"],
+            num_envs_per_worker=settings["num_envs_per_worker"],
+            rollout_fragment_length=settings["rollout_fragment_length"],
+        )
+        .resources(num_gpus=settings["num_gpus"])
+    )
+
+
+def describe_rollout_settings(settings: Dict[str, Any]) -> str:
+    """One-line summary for training logs"""
+    return (
+        f"{settings['num_rollout_workers']} rollout workers x {settings['num_envs_per_worker']} envs, "
+        f"fragment length {settings['rollout_fragment_length']}, {settings['num_gpus']} GPU "
+        f"(detected {settings['detected_cpus']} CPUs, {settings['detected_gpus']} GPUs)"
+    )
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Run the Python API as several worker processes behind a session-aware router
+
+    python serve.py --workers 4 --port 8000
+
+Simulation sessions (X-Session-Id header or session_id query, "default"
+otherwise) are pinned to one worker; other requests go to the least busy
+worker. One model host process holds the model weights for all workers.
+Shared state lives in MongoDB and the disk XAI cache tier, so the memory
+storage backend only works with a single worker.
+"""
+import argparse
+import logging
+import os
+import sys
+
+from dotenv import load_dotenv
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the Python API with multiple workers')
+    parser.add_argument('--workers', type=int, default=int(os.getenv("API_WORKERS", os.cpu_count() or 1)),
+                        help='API worker processes (default: API_WORKERS or the CPU count)')
+    parser.add_argument('--host', default='0.0.0.0', help='Address the router listens on')
+    parser.add_argument('--port', type=int, default=8000, help='Port the router listens on')
+    parser.add_argument('--internal-port', type=int, default=None,
+                        help='First local port for the model host and workers (default: port + 1)')
+    parser.add_argument('--no-model-host', action='store_true',
+                        help='Load the model in every worker instead of one shared model host')
+    parser.add_argument('--log-level', default='info', help='uvicorn log level')
+
+    args = parser.parse_args()
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    import uvicorn
+
+    if args.workers <= 1:
+        # A single worker needs no router
+        uvicorn.run("main:app", host=args.host, port=args.port, log_level=args.log_level)
+        return 0
+
+    if os.getenv("STORAGE_BACKEND", "mongo").lower() == "memory":
+        print("ERROR: STORAGE_BACKEND=memory keeps data per process; use mongo or --workers 1")
+        return 1
+
+    from services.worker_router import WorkerPool, create_router_app
+
+    pool = WorkerPool(
+        workers=args.workers,
+        base_port=args.internal_port or args.port + 1,
+        model_host=not args.no_model_host,
+        log_level=args.log_level
+    )
+    print(f"🚀 Starting {args.workers} API workers" + ("" if args.no_model_host else " and a shared model host"))
+    uvicorn.run(create_router_app(pool), host=args.host, port=args.port, log_level=args.log_level)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
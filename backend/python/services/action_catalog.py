@@ -0,0 +1,191 @@
+"""
+Attacker and defender action catalog (names decoded from v3.yaml action maps)
+"""
+
+import json
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+# Human-readable names of every discrete action, by agent and action id
+ACTION_NAMES: Dict[str, Dict[int, str]] = {
+    "attacker": {
+        0: "do-nothing",
+        1: "data-manipulation-bot (client_1)",
+        2: "dos-bot (client_1)",
+        3: "ransomware-script (client_1)",
+        4: "data-manipulation-bot (client_2)",
+        5: "dos-bot (client_2)",
+        6: "ransomware-script (client_2)",
+        7: "remote-command [cat /etc/passwd]",
+        8: "configure-ransomware (client_1)",
+        9: "configure-c2-beacon (client_1)",
+        10: "configure-database-client (client_1)",
+        11: "configure-dos-bot (client_1)",
+        12: "c2-server-ransomware-launch",
+        13: "c2-server-terminal-command",
+        14: "c2-server-data-exfiltrate",
+        15: "c2-server-ransomware-configure",
+        16: "corrupt-file (database.db)",
+    },
+    # All 84 defender actions from v3.yaml
+    "defender": {
+        0: "do-nothing",
+        1: "scan-service (web_server)",
+        2: "stop-service (web_server)",
+        3: "start-service (web_server)",
+        4: "pause-service (web_server)",
+        5: "resume-service (web_server)",
+        6: "restart-service (web_server)",
+        7: "disable-service (web_server)",
+        8: "enable-service (web_server)",
+        9: "scan-file (database.db)",
+        10: "scan-file (database.db)",
+        11: "delete-file (database.db)",
+        12: "repair-file (database.db)",
+        13: "fix-service (database_server)",
+        14: "scan-folder (database)",
+        15: "scan-folder (database)",
+        16: "repair-folder (database)",
+        17: "restore-folder (database)",
+        18: "scan-os (domain_controller)",
+        19: "shutdown (domain_controller)",
+        20: "startup (domain_controller)",
+        21: "reset (domain_controller)",
+        22: "scan-os (web_server)",
+        23: "shutdown (web_server)",
+        24: "startup (web_server)",
+        25: "reset (web_server)",
+        26: "scan-os (database_server)",
+        27: "shutdown (database_server)",
+        28: "startup (database_server)",
+        29: "reset (database_server)",
+        30: "scan-os (backup_server)",
+        31: "shutdown (backup_server)",
+        32: "startup (backup_server)",
+        33: "reset (backup_server)",
+        34: "scan-os (security_suite)",
+        35: "shutdown (security_suite)",
+        36: "startup (security_suite)",
+        37: "reset (security_suite)",
+        38: "scan-os (client_1)",
+        39: "shutdown (client_1)",
+        40: "startup (client_1)",
+        41: "reset (client_1)",
+        42: "scan-os (client_2)",
+        43: "shutdown (client_2)",
+        44: "startup (client_2)",
+        45: "reset (client_2)",
+        46: "add-acl-rule [pos0]",
+        47: "add-acl-rule [pos1]",
+        48: "add-acl-rule [pos2]",
+        49: "add-acl-rule [pos3]",
+        50: "add-acl-rule [pos4]",
+        51: "add-acl-rule [pos5]",
+        52: "remove-acl-rule [pos0]",
+        53: "remove-acl-rule [pos1]",
+        54: "remove-acl-rule [pos2]",
+        55: "remove-acl-rule [pos3]",
+        56: "remove-acl-rule [pos4]",
+        57: "remove-acl-rule [pos5]",
+        58: "remove-acl-rule [pos6]",
+        59: "remove-acl-rule [pos7]",
+        60: "remove-acl-rule [pos8]",
+        61: "remove-acl-rule [pos9]",
+        62: "disable-nic (domain_controller)",
+        63: "enable-nic (domain_controller)",
+        64: "disable-nic (web_server)",
+        65: "enable-nic (web_server)",
+        66: "disable-nic (database_server)",
+        67: "enable-nic (database_server)",
+        68: "disable-nic (backup_server)",
+        69: "enable-nic (backup_server)",
+        70: "disable-nic (security_suite)",
+        71: "enable-nic (security_suite)",
+        72: "disable-nic2 (security_suite)",
+        73: "enable-nic2 (security_suite)",
+        74: "disable-nic (client_1)",
+        75: "enable-nic (client_1)",
+        76: "disable-nic (client_2)",
+        77: "enable-nic (client_2)",
+        78: "scan-app [web-browser] (client_1)",
+        79: "scan-app [web-browser] (client_2)",
+        80: "close-app [data-manip-bot] (client_1)",
+        81: "close-app [data-manip-bot] (client_2)",
+        82: "add-acl-rule [pos6]",
+        83: "add-acl-rule [pos7]",
+    }
+}
+
+
+def get_action_name(agent_type: str, action_id: int) -> str:
+    """Get human-readable action name (anything but "attacker" is the defender)"""
+    names = ACTION_NAMES["attacker" if agent_type == "attacker" else "defender"]
+    return names.get(action_id, f"action-{action_id}")
+
+
+def catalog_entries() -> List[Tuple[str, str]]:
+    """Every distinct (agent_type, action name) pair, in a stable order"""
+    return sorted({(agent_type, name) for agent_type, names in ACTION_NAMES.items() for name in names.values()})
+
+
+def catalog_hash() -> str:
+    """Fingerprint of the action catalog, used to tell when precomputed explanations are stale"""
+    return hashlib.sha256(json.dumps(catalog_entries()).encode()).hexdigest()[:16]
+
+
+# Purpose of each action verb, for explanations that need no model call
+ACTION_TEMPLATES: Dict[str, str] = {
+    "do-nothing": "holds its position this step, conserving its options while the situation develops",
+    "data-manipulation-bot": "runs a data manipulation bot to tamper with application data and degrade service integrity",
+    "dos-bot": "launches a denial-of-service bot to exhaust service capacity and knock legitimate users offline",
+    "ransomware-script": "executes ransomware to encrypt critical data and cripple operations",
+    "remote-command": "runs a remote command to gather credentials and system information for further movement",
+    "configure-ransomware": "prepares its ransomware payload so it can strike the database when triggered",
+    "configure-c2-beacon": "sets up a command-and-control beacon to keep persistent remote control of the host",
+    "configure-database-client": "configures a database client to reach the database server for later abuse",
+    "configure-dos-bot": "configures a denial-of-service bot with its target ahead of an attack",
+    "c2-server-ransomware-launch": "triggers ransomware through its command-and-control channel",
+    "c2-server-terminal-command": "issues terminal commands through its command-and-control channel",
+    "c2-server-data-exfiltrate": "exfiltrates data through its command-and-control channel",
+    "c2-server-ransomware-configure": "reconfigures ransomware remotely through its command-and-control channel",
+    "corrupt-file": "corrupts a critical file to destroy data the network depends on",
+    "scan-service": "scans a service to detect compromise or abnormal behaviour",
+    "stop-service": "stops a service to contain a suspected compromise",
+    "start-service": "starts a service to restore availability",
+    "pause-service": "pauses a service to halt suspicious activity without losing its state",
+    "resume-service": "resumes a paused service once the threat is contained",
+    "restart-service": "restarts a service to clear a faulty or compromised state",
+    "disable-service": "disables a service to shrink the attack surface",
+    "enable-service": "re-enables a service to restore normal operation",
+    "fix-service": "repairs a service to recover from damage",
+    "scan-file": "scans a file to check its integrity",
+    "delete-file": "deletes a file judged to be malicious or irreparably corrupted",
+    "repair-file": "repairs a damaged file to restore data integrity",
+    "scan-folder": "scans a folder to check its contents for tampering",
+    "repair-folder": "repairs a folder to recover damaged contents",
+    "restore-folder": "restores a folder from backup to undo tampering",
+    "scan-os": "scans the operating system to assess whether the host is compromised",
+    "shutdown": "shuts the host down to cut off an ongoing attack",
+    "startup": "starts the host back up to restore its services",
+    "reset": "resets the host to a clean state to evict the attacker",
+    "add-acl-rule": "adds a firewall ACL rule to block malicious traffic",
+    "remove-acl-rule": "removes a firewall ACL rule to restore legitimate traffic",
+    "disable-nic": "disconnects a network interface to isolate the host",
+    "enable-nic": "reconnects a network interface once the host is safe",
+    "disable-nic2": "disconnects the second network interface to isolate the host",
+    "enable-nic2": "reconnects the second network interface once the host is safe",
+    "scan-app": "scans an application for signs of compromise",
+    "close-app": "closes a malicious application to stop its activity"
+}
+
+
+def template_explanation(agent_type: str, action: str, target: Optional[str] = None) -> str:
+    """Build a generic explanation of an action from its verb and target"""
+    verb = action.split(" ", 1)[0]
+    purpose = ACTION_TEMPLATES.get(verb, f"takes the {verb} action to advance its objective")
+
+    # Targets are embedded in action names as "(host)" unless given separately
+    target = target or (action[action.rindex("(") + 1:-1] if action.endswith(")") and "(" in action else None)
+    agent = "attacker" if agent_type == "attacker" else "defender"
+    on_target = f" (target: {target})" if target else ""
+    return f"The {agent} {purpose}{on_target}."
@@ -0,0 +1,137 @@
+"""
+Buffered bulk writer for activity logs
+"""
+
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from services.metrics import registry as metrics_registry
+
+logger = logging.getLogger(__name__)
+
+metrics_registry.describe("activity_events_written_total", "Activity events flushed to MongoDB")
+metrics_registry.describe("activity_events_dropped_total", "Activity events dropped because the queue was full")
+metrics_registry.describe("activity_flush_duration_ms", "Time spent flushing one activity batch")
+
+
+class ActivityWriter:
+    """Queues activity events in memory and flushes them with db_service.log_activities
+
+    Each batch becomes one upsert per per-user hourly bucket, plus one daily
+    counter update per activity type. A batch is flushed when it reaches
+    `batch_size` events or when the oldest queued event has waited
+    `flush_interval` seconds. The queue is bounded; when it is full new
+    events are dropped and counted rather than blocking the request that
+    produced them.
+    """
+
+    def __init__(
+        self,
+        db_service,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_queue: Optional[int] = None
+    ):
+        self.db_service = db_service
+        self.batch_size = batch_size or int(os.getenv("ACTIVITY_BATCH_SIZE", "200"))
+        self.flush_interval = flush_interval or float(os.getenv("ACTIVITY_FLUSH_SECONDS", "1.0"))
+        self.max_queue = max_queue or int(os.getenv("ACTIVITY_QUEUE_SIZE", "10000"))
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_task: Optional[asyncio.Task] = None
+        self._pending: List[Dict] = []  # Batch being collected by the flush loop
+        self._inflight: Optional[asyncio.Future] = None  # Flush currently talking to MongoDB
+        self.dropped = 0
+
+    async def start(self):
+        """Start the background flush loop"""
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._worker_task = asyncio.create_task(self._run())
+        logger.info(f"📝 Activity writer started (batch {self.batch_size}, every {self.flush_interval}s)")
+
+    async def stop(self):
+        """Flush everything still queued and stop the flush loop"""
+        if not self._worker_task:
+            return
+
+        self._worker_task.cancel()
+        try:
+            await self._worker_task
+        except asyncio.CancelledError:
+            pass
+        self._worker_task = None
+
+        # Final drain on shutdown: the in-flight flush, the partial batch, then the queue
+        if self._inflight and not self._inflight.done():
+            await self._inflight
+        batch, self._pending = self._pending, []
+        await self._flush(batch)
+        while not self._queue.empty():
+            await self._flush(self._take_batch())
+        logger.info("📝 Activity writer flushed and stopped")
+
+    def log(self, user_id: str, activity_type: str, description: str, metadata: Optional[Dict] = None) -> bool:
+        """Queue an activity event without waiting for MongoDB"""
+        if self._queue is None:
+            return False
+
+        activity = {
+            "userId": user_id,
+            "type": activity_type,
+            "description": description,
+            "metadata": metadata or {},
+            "timestamp": datetime.utcnow()
+        }
+        try:
+            self._queue.put_nowait(activity)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            metrics_registry.inc("activity_events_dropped_total")
+            return False
+
+    def queue_depth(self) -> int:
+        """Get the number of events waiting to be flushed"""
+        return self._queue.qsize() if self._queue else 0
+
+    def _take_batch(self) -> List[Dict]:
+        batch = []
+        while len(batch) < self.batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        """Collect events into batches and flush on size or time threshold"""
+        while True:
+            # Block until there is at least one event
+            self._pending.append(await self._queue.get())
+            deadline = time.monotonic() + self.flush_interval
+
+            while len(self._pending) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    self._pending.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            batch, self._pending = self._pending, []
+            # Shielded so a shutdown cancel cannot interrupt a half-written batch
+            self._inflight = asyncio.ensure_future(self._flush(batch))
+            await asyncio.shield(self._inflight)
+
+    async def _flush(self, batch: List[Dict]):
+        if not batch:
+            return
+
+        start = time.perf_counter()
+        try:
+            written = await self.db_service.log_activities(batch)
+            metrics_registry.inc("activity_events_written_total", amount=written)
+        except Exception as e:
+            logger.error(f"Error flushing activity batch: {str(e)}")
+        metrics_registry.observe("activity_flush_duration_ms", (time.perf_counter() - start) * 1000)
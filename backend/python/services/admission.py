@@ -0,0 +1,155 @@
+"""
+Admission control for the inference and environment-step paths
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from services.metrics import registry as metrics_registry
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Request headers carrying the client's remaining time budget or absolute deadline
+TIMEOUT_HEADER = "X-Request-Timeout-Ms"
+DEADLINE_HEADER = "X-Request-Deadline"  # Unix epoch milliseconds
+
+metrics_registry.describe("admission_rejected_total", "Requests shed before running, by queue and reason")
+metrics_registry.describe("admission_wait_ms", "Time admitted requests spent queued")
+metrics_registry.describe("admission_service_ms", "Time admitted requests spent running")
+
+
+class Overloaded(Exception):
+    """Raised when a queue refuses new work; retry after `retry_after` seconds"""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request's deadline passed before it could run"""
+
+
+def deadline_from_headers(headers, default_timeout_ms: Optional[float] = None) -> Optional[float]:
+    """A request's deadline on the time.monotonic() clock
+
+    Taken from X-Request-Timeout-Ms (budget left) or X-Request-Deadline
+    (epoch ms), else ADMISSION_DEFAULT_TIMEOUT_MS from now (0 for none).
+    """
+    now = time.monotonic()
+    timeout_ms = headers.get(TIMEOUT_HEADER)
+    deadline_ms = headers.get(DEADLINE_HEADER)
+    try:
+        if timeout_ms is not None:
+            return now + float(timeout_ms) / 1000
+        if deadline_ms is not None:
+            return now + (float(deadline_ms) / 1000 - time.time())
+    except ValueError:
+        pass
+
+    if default_timeout_ms is None:
+        default_timeout_ms = float(os.getenv("ADMISSION_DEFAULT_TIMEOUT_MS", "30000"))
+    return now + default_timeout_ms / 1000 if default_timeout_ms > 0 else None
+
+
+def remaining_ms(deadline: Optional[float]) -> Optional[float]:
+    """Milliseconds left before `deadline`, for propagating it to another process"""
+    if deadline is None:
+        return None
+    return max(0.0, (deadline - time.monotonic()) * 1000)
+
+
+class AdmissionQueue:
+    """Bounded FIFO in front of a scarce resource, shedding work that cannot finish in time
+
+    New work is refused with Overloaded once `max_depth` requests are waiting
+    or the predicted wait (queue length times the recent service time, over
+    `concurrency`) exceeds `max_wait_ms` or the request's own deadline.
+    Queued work whose deadline passes is dropped at dequeue, before it runs.
+    """
+
+    def __init__(self, name: str, concurrency: int = 1, max_depth: int = 32, max_wait_ms: float = 2000.0):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_depth = max_depth
+        self.max_wait_ms = max_wait_ms
+        self.waiting = 0
+        self.running = 0
+        self._slots = asyncio.Semaphore(concurrency)
+        self._service_ms = 0.0  # EWMA of recent service times
+
+        metrics_registry.register_gauge(
+            f"admission_{name}_queue_depth",
+            lambda: self.waiting,
+            f"Requests waiting for the {name} queue"
+        )
+
+    @classmethod
+    def from_env(cls, name: str, prefix: str, concurrency: int = 1, max_depth: int = 32, max_wait_ms: float = 2000.0) -> "AdmissionQueue":
+        """Build a queue configured by {prefix}_CONCURRENCY, _QUEUE_DEPTH and _MAX_WAIT_MS"""
+        return cls(
+            name,
+            concurrency=int(os.getenv(f"{prefix}_CONCURRENCY", str(concurrency))),
+            max_depth=int(os.getenv(f"{prefix}_QUEUE_DEPTH", str(max_depth))),
+            max_wait_ms=float(os.getenv(f"{prefix}_MAX_WAIT_MS", str(max_wait_ms)))
+        )
+
+    def predicted_wait_ms(self) -> float:
+        """Expected queueing delay for work admitted now"""
+        ahead = self.waiting + max(0, self.running - self.concurrency + 1)
+        return ahead * self._service_ms / self.concurrency
+
+    def _reject(self, reason: str, error: Exception):
+        metrics_registry.inc("admission_rejected_total", (("queue", self.name), ("reason", reason)))
+        raise error
+
+    async def run(self, work: Callable[[], Awaitable[T]], deadline: Optional[float] = None) -> T:
+        """Run `work()` when a slot is free, unless it is shed first"""
+        if deadline is not None and time.monotonic() >= deadline:
+            self._reject("expired", DeadlineExceeded(f"Deadline passed before reaching the {self.name} queue"))
+
+        if self.running >= self.concurrency:
+            predicted_ms = self.predicted_wait_ms()
+            retry_after = max(1.0, predicted_ms / 1000)
+            if self.waiting >= self.max_depth:
+                self._reject("queue_full", Overloaded(f"{self.name} queue is full", retry_after))
+            if predicted_ms > self.max_wait_ms:
+                self._reject("wait_too_long", Overloaded(f"{self.name} is overloaded", retry_after))
+            # Queueing plus its own service time would overrun the deadline: the answer would be wasted
+            if deadline is not None and time.monotonic() + (predicted_ms + self._service_ms) / 1000 >= deadline:
+                self._reject("would_miss_deadline", Overloaded(f"{self.name} cannot answer before the deadline", retry_after))
+
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+
+        try:
+            # Nobody is waiting for an answer any more: skip the work
+            if deadline is not None and time.monotonic() >= deadline:
+                self._reject("expired", DeadlineExceeded(f"Deadline passed while queued for {self.name}"))
+
+            started_at = time.perf_counter()
+            metrics_registry.observe("admission_wait_ms", (started_at - queued_at) * 1000, (("queue", self.name),))
+            self.running += 1
+            try:
+                return await work()
+            finally:
+                self.running -= 1
+                service_ms = (time.perf_counter() - started_at) * 1000
+                self._service_ms = service_ms if self._service_ms == 0 else 0.8 * self._service_ms + 0.2 * service_ms
+                metrics_registry.observe("admission_service_ms", service_ms, (("queue", self.name),))
+        finally:
+            self._slots.release()
+
+
+# Model inference (ModelService.predict) and simulation steps in this process
+inference_queue = AdmissionQueue.from_env("inference", "INFERENCE", concurrency=1, max_depth=32, max_wait_ms=2000)
+env_step_queue = AdmissionQueue.from_env("env_step", "ENV_STEP", concurrency=2, max_depth=16, max_wait_ms=5000)
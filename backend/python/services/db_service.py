@@ -1,84 +1,135 @@
 """
-Database service for MongoDB operations
+Database service over a pluggable storage backend (MongoDB or in-memory)
 """
 
 import os
+import time
+import base64
 import logging
 from datetime import datetime, timedelta
-from typing import Optional, Dict, List, Any
-from motor.motor_asyncio import AsyncClient, AsyncDatabase
-from pymongo import ASCENDING, DESCENDING
-from pymongo.errors import PyMongoError
+from typing import Optional, Dict, List, Any, Tuple
+
+from services.storage_backend import StorageBackend, create_backend
 
 logger = logging.getLogger(__name__)
 
+# Activity bucket storage: one document per user per hour, capped and expired by TTL
+ACTIVITY_BUCKET_MAX_EVENTS = int(os.getenv("ACTIVITY_BUCKET_MAX_EVENTS", "500"))
+ACTIVITY_RETENTION_DAYS = int(os.getenv("ACTIVITY_RETENTION_DAYS", "90"))
 
-class DBService:
-    """Service for MongoDB database operations"""
+# Event fields an activity feed may project (id and timestamp are always included)
+ACTIVITY_FEED_FIELDS = ("type", "description", "userId", "metadata")
+DEFAULT_ACTIVITY_FEED_FIELDS = ("type", "description", "userId")
 
-    def __init__(self, connection_string: Optional[str] = None):
-        """Initialize DB service with MongoDB connection"""
-        self.connection_string = connection_string or os.getenv("MONGODB_URI")
-        self.client: Optional[AsyncClient] = None
-        self.db: Optional[AsyncDatabase] = None
-        self.is_connected = False
+# How long the top-N leaderboard is served from memory
+LEADERBOARD_CACHE_SECONDS = float(os.getenv("LEADERBOARD_CACHE_SECONDS", "30"))
 
-    async def connect(self):
-        """Connect to MongoDB"""
-        try:
-            if not self.connection_string:
-                logger.warning("⚠️ MONGODB_URI not set, running in mock mode")
-                self.is_connected = False
-                return
+# Lifetime counters summed into each user's stored activityScore
+ACTIVITY_SCORE_FIELDS = ("networksCount", "trainingsCount", "simulationsCount")
 
-            self.client = AsyncClient(self.connection_string, serverSelectionTimeoutMS=5000)
-            self.db = self.client["autosentinel"]
+# Activity types surfaced in the daily stats, keyed by their stats field
+DAILY_STAT_TYPES = {
+    "networksToday": "network_created",
+    "trainingsToday": "training_started",
+    "simulationsToday": "simulation_run",
+    "newUsersToday": "user_signup"
+}
 
-            # Test connection
-            await self.db.command("ping")
-            logger.info("✅ Connected to MongoDB")
-            self.is_connected = True
 
-            # Create indexes
-            await self._create_indexes()
+def _day_key(moment: datetime) -> str:
+    """Key of the per-day activity counter document for a timestamp"""
+    return moment.strftime("%Y-%m-%d")
 
-        except Exception as e:
-            logger.error(f"❌ Failed to connect to MongoDB: {str(e)}")
-            self.is_connected = False
 
-    async def disconnect(self):
-        """Disconnect from MongoDB"""
-        if self.client:
-            self.client.close()
-            self.is_connected = False
-            logger.info("Disconnected from MongoDB")
+def _counter_field(activity_type: str) -> str:
+    """Make an activity type safe to use as a MongoDB field name"""
+    return activity_type.replace(".", "_").replace("$", "_")
 
-    async def _create_indexes(self):
-        """Create database indexes"""
-        try:
-            # User indexes
-            await self.db.users.create_index("email", unique=True)
-            await self.db.users.create_index("username", unique=True)
-            await self.db.users.create_index("googleId", sparse=True)
 
-            # Quota usage indexes
-            await self.db.quota_usage.create_index([("userId", ASCENDING), ("date", DESCENDING)])
+def _bucket_start(moment: datetime) -> datetime:
+    """Start of the activity bucket (one hour) containing a timestamp"""
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def encode_activity_cursor(timestamp: datetime, event_id) -> str:
+    """Encode a (timestamp, _id) keyset position as an opaque cursor"""
+    raw = f"{timestamp.isoformat()}|{event_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_activity_cursor(cursor: str) -> Tuple[datetime, Any]:
+    """Decode a cursor produced by encode_activity_cursor (raises ValueError if malformed)"""
+    from bson.objectid import ObjectId
+
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, event_id = raw.split("|", 1)
+        return datetime.fromisoformat(timestamp), ObjectId(event_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def compute_quota_status(user: Dict, usage_key: str, current_time: datetime) -> Dict:
+    """Compute a quota status from a user document's role, usage and reset time"""
+    from models import QUOTA_LIMITS
+
+    role = user.get("role", "free")
+    usage = user.get("usage", {}).get(usage_key, 0)
+    available = QUOTA_LIMITS.get(role, QUOTA_LIMITS["free"]).get(usage_key, 0)
+    reset_time = user.get("usageResetTime", current_time)
+
+    # An expired window counts as a fresh day
+    if current_time >= reset_time:
+        usage = 0
 
-            # Activity log indexes
-            await self.db.activity_logs.create_index([("userId", ASCENDING), ("timestamp", DESCENDING)])
-            await self.db.activity_logs.create_index("type")
+    return {
+        "available": available,
+        "used": usage,
+        "remaining": max(0, available - usage),
+        "resetTime": reset_time
+    }
+
+
+
+class DBService:
+    """Service for database operations, delegating storage to a backend"""
+
+    def __init__(self, connection_string: Optional[str] = None, backend: Optional[StorageBackend] = None):
+        """Initialize DB service with the configured storage backend"""
+        self.backend = backend or create_backend(connection_string)
+        self.is_connected = False
+        self._leaderboard_cache: Optional[Tuple[float, int, List[Dict]]] = None
+
+    @property
+    def pool_stats(self):
+        """Connection pool usage counters of the backend"""
+        return self.backend.pool_stats
+
+    async def connect(self):
+        """Connect to the storage backend"""
+        try:
+            self.is_connected = await self.backend.connect()
+            if self.is_connected:
+                await self.backfill_activity_scores()
 
-            logger.info("✅ Database indexes created")
         except Exception as e:
-            logger.error(f"❌ Error creating indexes: {str(e)}")
+            logger.error(f"❌ Failed to connect to {self.backend.name} storage: {str(e)}")
+            self.is_connected = False
+
+    async def disconnect(self):
+        """Disconnect from the storage backend"""
+        await self.backend.disconnect()
+        self.is_connected = False
+
+    def get_pool_max_size(self) -> int:
+        """Get the configured maximum connection pool size"""
+        return self.backend.get_pool_max_size()
 
     # ===== User Operations =====
-    async def get_user(self, user_id: str) -> Optional[Dict]:
-        """Get user by ID"""
+    async def get_user(self, user_id: str, projection: Optional[Dict] = None) -> Optional[Dict]:
+        """Get user by ID, optionally loading only the projected fields"""
         try:
-            from bson.objectid import ObjectId
-            result = await self.db.users.find_one({"_id": ObjectId(user_id)})
-            return result
+            return await self.backend.get_user(user_id, projection)
         except Exception as e:
             logger.error(f"Error getting user: {str(e)}")
             return None
@@ -86,7 +137,7 @@ class DBService:
     async def get_user_by_email(self, email: str) -> Optional[Dict]:
         """Get user by email"""
         try:
-            return await self.db.users.find_one({"email": email})
+            return await self.backend.find_user("email", email)
         except Exception as e:
             logger.error(f"Error getting user by email: {str(e)}")
             return None
@@ -94,7 +145,7 @@ class DBService:
     async def get_user_by_username(self, username: str) -> Optional[Dict]:
         """Get user by username"""
         try:
-            return await self.db.users.find_one({"username": username})
+            return await self.backend.find_user("username", username)
         except Exception as e:
             logger.error(f"Error getting user by username: {str(e)}")
             return None
@@ -106,8 +157,7 @@ class DBService:
             user_data["updatedAt"] = datetime.utcnow()
             user_data["usageResetTime"] = datetime.utcnow() + timedelta(days=1)
 
-            result = await self.db.users.insert_one(user_data)
-            return str(result.inserted_id)
+            return await self.backend.insert_user(user_data)
         except Exception as e:
             logger.error(f"Error creating user: {str(e)}")
             return None
@@ -115,50 +165,33 @@ class DBService:
     async def update_user(self, user_id: str, update_data: Dict) -> bool:
         """Update user"""
         try:
-            from bson.objectid import ObjectId
             update_data["updatedAt"] = datetime.utcnow()
-            result = await self.db.users.update_one(
-                {"_id": ObjectId(user_id)},
-                {"$set": update_data}
-            )
-            return result.modified_count > 0
+            return await self.backend.update_user(user_id, update_data)
         except Exception as e:
             logger.error(f"Error updating user: {str(e)}")
             return False
 
-    async def update_user_usage(self, user_id: str, resource: str, increment: int = 1) -> Optional[Dict]:
-        """Increment user usage for a resource"""
-        try:
-            from bson.objectid import ObjectId
+    async def increment_usage(self, user_id: str, resource: str, increment: int = 1) -> Optional[Dict]:
+        """Atomically apply the daily reset, enforce the quota limit and increment usage
 
-            # Get user to check if reset is needed
-            user = await self.get_user(user_id)
-            if not user:
-                return None
+        Returns the post-update quota status with "allowed": True, the current
+        status with "allowed": False when the limit is reached, or None if the
+        user does not exist. "user" holds the role/usage fields that were read.
+        """
+        try:
+            from models import get_usage_key
 
-            # Check if usage should be reset (daily reset)
+            usage_key = get_usage_key(resource)
             current_time = datetime.utcnow()
-            reset_time = user.get("usageResetTime", current_time)
-
-            if current_time >= reset_time:
-                # Reset usage
-                update_data = {
-                    f"usage.{resource}": increment,
-                    "usageResetTime": current_time + timedelta(days=1)
-                }
-            else:
-                # Increment existing usage
-                update_data = {
-                    f"usage.{resource}": user.get("usage", {}).get(resource, 0) + increment
-                }
-
-            await self.update_user(user_id, update_data)
+            result = await self.backend.increment_usage(user_id, usage_key, increment, current_time)
+            if result is None:
+                return None
 
-            # Return updated user
-            return await self.get_user(user_id)
+            user, allowed = result
+            return {**compute_quota_status(user, usage_key, current_time), "allowed": allowed, "user": user}
 
         except Exception as e:
-            logger.error(f"Error updating user usage: {str(e)}")
+            logger.error(f"Error incrementing usage: {str(e)}")
             return None
 
     async def get_user_quota_status(self, user_id: str, resource: str) -> Optional[Dict]:
@@ -168,28 +201,9 @@ class DBService:
             if not user:
                 return None
 
-            from models import QUOTA_LIMITS
-
-            role = user.get("role", "free")
-            usage = user.get("usage", {}).get(resource, 0)
-            quota_limits = QUOTA_LIMITS.get(role, QUOTA_LIMITS["free"])
-            available = quota_limits.get(resource, 0)
-            remaining = max(0, available - usage)
-
-            # Check if reset is needed
-            current_time = datetime.utcnow()
-            reset_time = user.get("usageResetTime", current_time)
+            from models import get_usage_key
 
-            if current_time >= reset_time:
-                remaining = available
-                usage = 0
-
-            return {
-                "available": available,
-                "used": usage,
-                "remaining": remaining,
-                "resetTime": reset_time
-            }
+            return compute_quota_status(user, get_usage_key(resource), datetime.utcnow())
 
         except Exception as e:
             logger.error(f"Error getting quota status: {str(e)}")
@@ -198,25 +212,31 @@ class DBService:
     # ===== Activity Logging =====
     async def log_activity(self, user_id: str, activity_type: str, description: str, metadata: Optional[Dict] = None) -> bool:
         """Log user activity"""
+        activity = {
+            "userId": user_id,
+            "type": activity_type,
+            "description": description,
+            "metadata": metadata or {},
+            "timestamp": datetime.utcnow()
+        }
+        return await self.log_activities([activity]) == 1
+
+    async def log_activities(self, activities: List[Dict]) -> int:
+        """Store a batch of pre-built activity documents"""
+        if not activities:
+            return 0
         try:
-            activity = {
-                "userId": user_id,
-                "type": activity_type,
-                "description": description,
-                "metadata": metadata or {},
-                "timestamp": datetime.utcnow()
-            }
-            await self.db.activity_logs.insert_one(activity)
-            return True
+            await self.backend.write_activities(activities)
+            return len(activities)
         except Exception as e:
-            logger.error(f"Error logging activity: {str(e)}")
-            return False
+            logger.error(f"Error logging activity batch: {str(e)}")
+            return 0
 
     async def get_recent_activities(self, limit: int = 50) -> List[Dict]:
         """Get recent activities"""
         try:
-            activities = await self.db.activity_logs.find().sort("timestamp", DESCENDING).limit(limit).to_list(limit)
-            return activities or []
+            activities, _ = await self.get_activity_feed(limit=limit, fields=list(ACTIVITY_FEED_FIELDS))
+            return activities
         except Exception as e:
             logger.error(f"Error getting recent activities: {str(e)}")
             return []
@@ -224,17 +244,64 @@ class DBService:
     async def get_user_activities(self, user_id: str, limit: int = 20) -> List[Dict]:
         """Get user's activities"""
         try:
-            activities = await self.db.activity_logs.find({"userId": user_id}).sort("timestamp", DESCENDING).limit(limit).to_list(limit)
-            return activities or []
+            activities, _ = await self.get_activity_feed(
+                limit=limit,
+                user_id=user_id,
+                fields=list(ACTIVITY_FEED_FIELDS)
+            )
+            return activities
         except Exception as e:
             logger.error(f"Error getting user activities: {str(e)}")
             return []
 
+    async def get_activity_feed(
+        self,
+        limit: int = 50,
+        cursor: Optional[Tuple[datetime, Any]] = None,
+        user_id: Optional[str] = None,
+        activity_type: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> Tuple[List[Dict], Optional[Tuple[datetime, Any]]]:
+        """Get one page of activities, newest first, after a (timestamp, _id) keyset cursor
+
+        Returns (events, next_cursor); next_cursor is None on the last page.
+        """
+        fields = [f for f in (fields or DEFAULT_ACTIVITY_FEED_FIELDS) if f in ACTIVITY_FEED_FIELDS]
+
+        # Fetch one extra event to know whether another page exists
+        page = await self.backend.get_activity_feed(limit + 1, cursor, user_id, activity_type, fields)
+
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_cursor = (page[-1]["timestamp"], page[-1]["_id"])
+        return page, next_cursor
+
+    async def migrate_activity_logs(self, batch_size: int = 1000, drop_source: bool = False) -> int:
+        """Copy the legacy activity_logs collection into hourly buckets
+
+        Returns the number of activities migrated in this run.
+        """
+        return await self.backend.migrate_activity_logs(batch_size, drop_source)
+
+    # ===== XAI Explanations =====
+    async def get_cached_explanation(self, key: str) -> Optional[str]:
+        """Get a persisted XAI explanation"""
+        return await self.backend.get_cached_explanation(key, datetime.utcnow())
+
+    async def store_cached_explanation(self, key: str, explanation: str, ttl_seconds: float):
+        """Persist an XAI explanation for `ttl_seconds`"""
+        await self.backend.store_cached_explanation(
+            key,
+            explanation,
+            datetime.utcnow() + timedelta(seconds=ttl_seconds)
+        )
+
     # ===== Metrics =====
     async def get_total_users_count(self) -> int:
         """Get total number of users"""
         try:
-            return await self.db.users.count_documents({})
+            return await self.backend.count_users()
         except Exception as e:
             logger.error(f"Error getting user count: {str(e)}")
             return 0
@@ -242,30 +309,43 @@ class DBService:
     async def get_users_by_role(self) -> Dict[str, int]:
         """Get user count by role"""
         try:
-            result = await self.db.users.aggregate([
-                {"$group": {"_id": "$role", "count": {"$sum": 1}}}
-            ]).to_list(None)
-
             counts = {"free": 0, "premium": 0, "admin": 0}
-            for item in result:
-                counts[item["_id"]] = item["count"]
+            counts.update(await self.backend.count_users_by_role())
             return counts
         except Exception as e:
             logger.error(f"Error getting users by role: {str(e)}")
             return {"free": 0, "premium": 0, "admin": 0}
 
+    async def backfill_activity_scores(self, recompute: bool = False) -> int:
+        """Store activityScore on users missing it (or on every user when `recompute`)"""
+        try:
+            modified = await self.backend.backfill_activity_scores(recompute)
+            if modified:
+                logger.info(f"✅ Stored activity scores for {modified} users")
+            return modified
+        except Exception as e:
+            logger.error(f"Error backfilling activity scores: {str(e)}")
+            return 0
+
     async def get_top_users(self, limit: int = 10) -> List[Dict]:
         """Get top active users"""
         try:
-            users = await self.db.users.find().sort("simulationsCount", DESCENDING).limit(limit).to_list(limit)
+            cached = self._leaderboard_cache
+            if cached and cached[1] >= limit and time.monotonic() < cached[0]:
+                return cached[2][:limit]
+
+            users = await self.backend.get_top_users(limit)
+
             result = []
             for user in users:
                 result.append({
                     "username": user.get("username"),
                     "email": user.get("email"),
-                    "activityCount": user.get("simulationsCount", 0) + user.get("networksCount", 0) + user.get("trainingsCount", 0),
+                    "activityCount": user.get("activityScore", 0),
                     "role": user.get("role", "free")
                 })
+
+            self._leaderboard_cache = (time.monotonic() + LEADERBOARD_CACHE_SECONDS, limit, result)
             return result
         except Exception as e:
             logger.error(f"Error getting top users: {str(e)}")
@@ -274,20 +354,18 @@ class DBService:
     async def get_daily_stats(self) -> Dict[str, int]:
         """Get daily statistics"""
         try:
-            today = datetime.utcnow().date()
-            start_of_day = datetime.combine(today, datetime.min.time())
-
-            activities_today = await self.db.activity_logs.find({
-                "timestamp": {"$gte": start_of_day}
-            }).to_list(None)
-
-            stats = {
-                "networksToday": sum(1 for a in activities_today if a.get("type") == "network_created"),
-                "trainingsToday": sum(1 for a in activities_today if a.get("type") == "training_started"),
-                "simulationsToday": sum(1 for a in activities_today if a.get("type") == "simulation_run"),
-                "newUsersToday": sum(1 for a in activities_today if a.get("type") == "user_signup")
-            }
-            return stats
+            now = datetime.utcnow()
+            today = _day_key(now)
+            counters = await self.backend.get_daily_counts([today])
+
+            if today in counters:
+                counts = counters[today]
+            else:
+                # No counter document yet: group the bucketed events by type
+                start_of_day = datetime.combine(now.date(), datetime.min.time())
+                counts = await self.backend.count_activities_by_type(start_of_day, start_of_day + timedelta(days=1))
+
+            return {stat: counts.get(activity_type, 0) for stat, activity_type in DAILY_STAT_TYPES.items()}
         except Exception as e:
             logger.error(f"Error getting daily stats: {str(e)}")
             return {
@@ -296,3 +374,24 @@ class DBService:
                 "simulationsToday": 0,
                 "newUsersToday": 0
             }
+
+    async def get_daily_trend(self, days: int = 7) -> List[Dict[str, Any]]:
+        """Get per-day activity counts for the last `days` days, oldest first"""
+        try:
+            today = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+            first_day = today - timedelta(days=days - 1)
+            day_keys = [_day_key(first_day + timedelta(days=offset)) for offset in range(days)]
+
+            by_day = await self.backend.get_daily_counts(day_keys)
+
+            trend = []
+            for day in day_keys:
+                counts = by_day.get(day, {})
+                trend.append({
+                    "date": day,
+                    **{stat: counts.get(activity_type, 0) for stat, activity_type in DAILY_STAT_TYPES.items()}
+                })
+            return trend
+        except Exception as e:
+            logger.error(f"Error getting daily trend: {str(e)}")
+            return []
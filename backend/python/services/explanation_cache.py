@@ -0,0 +1,332 @@
+"""
+Two-tier XAI explanation cache with single-flight loading
+"""
+
+import os
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from services.metrics import registry as metrics_registry
+
+logger = logging.getLogger(__name__)
+
+metrics_registry.describe("xai_cache_hits_total", "XAI explanations served without an upstream call, by tier")
+metrics_registry.describe("xai_cache_misses_total", "XAI explanations that needed an upstream call")
+metrics_registry.describe("xai_cache_store_errors_total", "Failed reads or writes of the persistent XAI cache tier")
+
+
+class ExplanationUnavailable(Exception):
+    """Raised by a loader when there is no explanation worth caching"""
+
+
+def explanation_key(agent_type: str, action: str, target: Optional[str] = None) -> str:
+    """Cache key of an action explanation"""
+    return f"{agent_type}:{action}:{target or ''}"
+
+
+class SqliteExplanationStore:
+    """Persistent tier in a local SQLite file, shared by workers on the same host"""
+
+    def __init__(self, path: str, ttl: float):
+        self.path = path
+        self.ttl = ttl
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")  # Readers in other workers do not block writers
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS explanations "
+            "(key TEXT PRIMARY KEY, explanation TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("DELETE FROM explanations WHERE expires_at < ?", (time.time(),))
+        self._conn.commit()
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT explanation FROM explanations WHERE key = ? AND expires_at >= ?",
+                (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def _put(self, key: str, explanation: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO explanations (key, explanation, expires_at) VALUES (?, ?, ?)",
+                (key, explanation, time.time() + self.ttl)
+            )
+            self._conn.commit()
+
+    async def get(self, key: str) -> Optional[str]:
+        return await asyncio.get_running_loop().run_in_executor(None, self._get, key)
+
+    async def put(self, key: str, explanation: str):
+        await asyncio.get_running_loop().run_in_executor(None, self._put, key, explanation)
+
+
+class DBExplanationStore:
+    """Persistent tier in the database, shared by every worker"""
+
+    def __init__(self, db_service, ttl: float):
+        self.db_service = db_service
+        self.ttl = ttl
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self.db_service.get_cached_explanation(key)
+
+    async def put(self, key: str, explanation: str):
+        await self.db_service.store_cached_explanation(key, explanation, self.ttl)
+
+
+def create_explanation_store(db_service=None):
+    """Build the persistent tier selected by XAI_CACHE_STORE ("disk", "db" or "none")"""
+    kind = os.getenv("XAI_CACHE_STORE", "disk").lower()
+    ttl = float(os.getenv("XAI_CACHE_STORE_TTL_SECONDS", str(30 * 24 * 3600)))
+
+    if kind == "disk":
+        return SqliteExplanationStore(os.getenv("XAI_CACHE_PATH", ".cache/xai_explanations.sqlite3"), ttl)
+    if kind == "db" and db_service is not None:
+        return DBExplanationStore(db_service, ttl)
+    return None
+
+
+class ExplanationCache:
+    """LRU/TTL memory tier in front of an optional persistent tier
+
+    A precomputed catalog (see services.explanation_catalog) sits in front of
+    both; it is read-only, never evicted, and skipped for live requests.
+
+    Concurrent lookups of the same missing key share one load: the first
+    caller starts it and everyone else awaits the same task, so a burst of
+    viewers asking about one action costs a single upstream call. Loads that
+    raise (including ExplanationUnavailable) are not cached.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None, store=None):
+        self.max_entries = max_entries or int(os.getenv("XAI_CACHE_SIZE", "2048"))
+        self.ttl = ttl if ttl is not None else float(os.getenv("XAI_CACHE_TTL_SECONDS", "86400"))
+        self.store = store
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._batch_loads = set()  # Strong references to running batch loads
+        self.catalog: Dict[str, str] = {}
+
+    def set_catalog(self, explanations: Dict[str, str]):
+        """Serve these precomputed explanations without touching any other tier"""
+        self.catalog = dict(explanations)
+
+    def set_store(self, store):
+        """Attach (or replace) the persistent tier"""
+        self.store = store
+        if store is not None:
+            logger.info(f"💾 XAI cache persistent tier: {type(store).__name__}")
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, explanation = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return explanation
+
+    def _put_memory(self, key: str, explanation: str):
+        self._entries[key] = (time.monotonic() + self.ttl, explanation)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[str]]) -> Tuple[str, str]:
+        """Read through the persistent tier, then the loader"""
+        store = self.store
+        if store is not None:
+            try:
+                explanation = await store.get(key)
+            except Exception as e:
+                metrics_registry.inc("xai_cache_store_errors_total")
+                logger.error(f"Error reading XAI cache store: {str(e)}")
+                explanation = None
+
+            if explanation is not None:
+                self._put_memory(key, explanation)
+                return explanation, "store"
+
+        metrics_registry.inc("xai_cache_misses_total")
+        explanation = await loader()
+        self._put_memory(key, explanation)
+
+        if store is not None:
+            try:
+                await store.put(key, explanation)
+            except Exception as e:
+                metrics_registry.inc("xai_cache_store_errors_total")
+                logger.error(f"Error writing XAI cache store: {str(e)}")
+
+        return explanation, "upstream"
+
+    def _finish(self, key: str, future: asyncio.Future):
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if not future.cancelled():
+            future.exception()  # Marks a failure as retrieved even if every caller went away
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[str]],
+        use_catalog: bool = True
+    ) -> Tuple[str, str]:
+        """Get an explanation and where it came from: catalog, memory, store, shared or upstream"""
+        explanation = self.catalog.get(key) if use_catalog else None
+        if explanation is not None:
+            metrics_registry.inc("xai_cache_hits_total", (("tier", "catalog"),))
+            return explanation, "catalog"
+
+        explanation = self._get_memory(key)
+        if explanation is not None:
+            metrics_registry.inc("xai_cache_hits_total", (("tier", "memory"),))
+            return explanation, "memory"
+
+        task = self._inflight.get(key)
+        if task is not None:
+            metrics_registry.inc("xai_cache_hits_total", (("tier", "shared"),))
+            explanation, _ = await asyncio.shield(task)
+            return explanation, "shared"
+
+        task = asyncio.ensure_future(self._load(key, loader))
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._finish(key, done))
+
+        # Shielded so a disconnecting first caller does not cancel the load for the others
+        explanation, source = await asyncio.shield(task)
+        if source == "store":
+            metrics_registry.inc("xai_cache_hits_total", (("tier", "store"),))
+        return explanation, source
+
+    async def _load_many(
+        self,
+        futures: Dict[str, asyncio.Future],
+        loader: Callable[[List[str]], Awaitable[Dict[str, str]]]
+    ):
+        """Resolve each key's future from the persistent tier, then one loader call for the rest"""
+        store = self.store
+        try:
+            if store is not None:
+                keys = list(futures)
+                stored = await asyncio.gather(*(store.get(key) for key in keys), return_exceptions=True)
+                for key, explanation in zip(keys, stored):
+                    if isinstance(explanation, Exception):
+                        metrics_registry.inc("xai_cache_store_errors_total")
+                        logger.error(f"Error reading XAI cache store: {str(explanation)}")
+                    elif explanation is not None:
+                        metrics_registry.inc("xai_cache_hits_total", (("tier", "store"),))
+                        self._put_memory(key, explanation)
+                        futures[key].set_result((explanation, "store"))
+
+            missing = [key for key, future in futures.items() if not future.done()]
+            if not missing:
+                return
+
+            metrics_registry.inc("xai_cache_misses_total", amount=len(missing))
+            loaded = await loader(missing)
+
+            for key in missing:
+                explanation = loaded.get(key)
+                if explanation is None:
+                    futures[key].set_exception(ExplanationUnavailable("No explanation returned for this action"))
+                    continue
+                self._put_memory(key, explanation)
+                futures[key].set_result((explanation, "upstream"))
+
+            if store is not None:
+                writes = await asyncio.gather(
+                    *(store.put(key, loaded[key]) for key in missing if key in loaded),
+                    return_exceptions=True
+                )
+                for error in writes:
+                    if isinstance(error, Exception):
+                        metrics_registry.inc("xai_cache_store_errors_total")
+                        logger.error(f"Error writing XAI cache store: {str(error)}")
+
+        except Exception as e:
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            for future in futures.values():
+                if not future.done():
+                    future.cancel()
+
+    async def get_or_load_many(
+        self,
+        keys: List[str],
+        loader: Callable[[List[str]], Awaitable[Dict[str, str]]],
+        use_catalog: bool = True
+    ) -> Dict[str, Union[Tuple[str, str], Exception]]:
+        """Get explanations for many keys, loading every miss with a single loader call
+
+        `loader` receives the missing keys and returns a key -> explanation
+        dict; keys it leaves out fail with ExplanationUnavailable. Keys already
+        being loaded by another request are shared rather than reloaded.
+        Returns key -> (explanation, source), or the exception for that key.
+        """
+        results: Dict[str, Union[Tuple[str, str], Exception]] = {}
+        pending: Dict[str, asyncio.Future] = {}
+        futures: Dict[str, asyncio.Future] = {}
+        loop = asyncio.get_running_loop()
+
+        for key in dict.fromkeys(keys):
+            explanation = self.catalog.get(key) if use_catalog else None
+            if explanation is not None:
+                metrics_registry.inc("xai_cache_hits_total", (("tier", "catalog"),))
+                results[key] = (explanation, "catalog")
+                continue
+
+            explanation = self._get_memory(key)
+            if explanation is not None:
+                metrics_registry.inc("xai_cache_hits_total", (("tier", "memory"),))
+                results[key] = (explanation, "memory")
+            elif key in self._inflight:
+                metrics_registry.inc("xai_cache_hits_total", (("tier", "shared"),))
+                pending[key] = self._inflight[key]
+            else:
+                future = futures[key] = pending[key] = loop.create_future()
+                self._inflight[key] = future
+                future.add_done_callback(lambda done, key=key: self._finish(key, done))
+
+        if futures:
+            task = asyncio.ensure_future(self._load_many(futures, loader))
+            self._batch_loads.add(task)
+            task.add_done_callback(self._batch_loads.discard)
+
+        # Shielded so a disconnecting caller does not cancel loads other requests share
+        outcomes = await asyncio.gather(*(asyncio.shield(f) for f in pending.values()), return_exceptions=True)
+        for key, outcome in zip(pending, outcomes):
+            if isinstance(outcome, tuple) and key not in futures:
+                outcome = (outcome[0], "shared")
+            results[key] = outcome
+        return results
+
+    def get_stats(self) -> Dict:
+        """Get tier sizes and hit/miss counters"""
+        hits = metrics_registry.counter_total("xai_cache_hits_total")
+        misses = metrics_registry.counter_total("xai_cache_misses_total")
+        return {
+            "catalogEntries": len(self.catalog),
+            "entries": len(self._entries),
+            "maxEntries": self.max_entries,
+            "inflight": len(self._inflight),
+            "store": type(self.store).__name__ if self.store else None,
+            "hits": hits,
+            "misses": misses,
+            "hitRate": hits / (hits + misses) if (hits + misses) else 0.0
+        }
@@ -0,0 +1,113 @@
+"""
+Precomputed explanation catalog for the finite attacker/defender action space
+"""
+
+import os
+import json
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from services.action_catalog import catalog_entries, catalog_hash
+from services.explanation_cache import explanation_key
+
+logger = logging.getLogger(__name__)
+
+# Layout of the catalog file itself
+CATALOG_FORMAT_VERSION = 1
+
+
+def default_catalog_path() -> str:
+    """XAI_CATALOG_PATH, or xai_catalog.json next to main.py"""
+    return os.getenv(
+        "XAI_CATALOG_PATH",
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "xai_catalog.json")
+    )
+
+
+def catalog_keys() -> Dict[str, Dict]:
+    """Explanation key -> action item for every action in the catalog"""
+    return {
+        explanation_key(agent_type, action): {"agent_type": agent_type, "action": action}
+        for agent_type, action in catalog_entries()
+    }
+
+
+def read_catalog(path: Optional[str] = None) -> Optional[Dict]:
+    """Read a catalog file, or None if there is none"""
+    path = path or default_catalog_path()
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        catalog = json.load(f)
+    if catalog.get("formatVersion") != CATALOG_FORMAT_VERSION:
+        raise ValueError(f"Unsupported catalog format {catalog.get('formatVersion')} in {path}")
+    return catalog
+
+
+def write_catalog(explanations: Dict[str, str], model: str, prompt_version: int, path: Optional[str] = None):
+    """Atomically write a catalog file for the current action catalog"""
+    path = path or default_catalog_path()
+    catalog = {
+        "formatVersion": CATALOG_FORMAT_VERSION,
+        "catalogHash": catalog_hash(),
+        "model": model,
+        "promptVersion": prompt_version,
+        "generatedAt": datetime.utcnow().isoformat(),
+        "explanations": dict(sorted(explanations.items()))
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(catalog, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_catalog(path: Optional[str] = None) -> Dict[str, str]:
+    """Load the explanations that apply to the current action catalog
+
+    Entries for actions that no longer exist are dropped; a catalog built for
+    a different action set still serves the actions it covers.
+    """
+    path = path or default_catalog_path()
+    try:
+        catalog = read_catalog(path)
+    except Exception as e:
+        logger.error(f"❌ Error reading explanation catalog {path}: {str(e)}")
+        return {}
+
+    if catalog is None:
+        logger.info(f"ℹ️  No explanation catalog at {path}, explanations will be generated on demand")
+        return {}
+
+    keys = catalog_keys()
+    explanations = {key: text for key, text in catalog.get("explanations", {}).items() if key in keys}
+    if catalog.get("catalogHash") != catalog_hash():
+        logger.warning("⚠️ Explanation catalog was built for a different action set, rerun build_explanation_catalog.py")
+
+    logger.info(f"📚 Loaded {len(explanations)}/{len(keys)} precomputed explanations")
+    return explanations
+
+
+def plan_catalog_build(
+    catalog: Optional[Dict],
+    model: str,
+    prompt_version: int,
+    force: bool = False
+) -> Tuple[Dict[str, str], List[str]]:
+    """Split the catalog into reusable explanations and keys that must be generated
+
+    Existing explanations are reused unless the model or prompt changed (or
+    `force`), so a changed action set only costs the new actions.
+    """
+    keys = catalog_keys()
+    reusable = (
+        catalog is not None
+        and not force
+        and catalog.get("model") == model
+        and catalog.get("promptVersion") == prompt_version
+    )
+    existing = catalog.get("explanations", {}) if reusable else {}
+
+    kept = {key: existing[key] for key in keys if key in existing}
+    missing = [key for key in keys if key not in kept]
+    return kept, missing
@@ -0,0 +1,196 @@
+"""
+Gemini client for XAI action explanations
+"""
+
+import os
+import json
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+import httpx
+
+from services.explanation_cache import ExplanationUnavailable
+from services.upstream import UpstreamClient, UpstreamUnavailable
+
+logger = logging.getLogger(__name__)
+
+GEMINI_MODEL = "gemini-2.0-flash"
+GEMINI_PATH = f"/v1beta/models/{GEMINI_MODEL}:generateContent"
+
+# Bumped whenever the prompts change, so precomputed catalogs are rebuilt
+PROMPT_VERSION = 1
+
+
+def build_explanation_context(agent_type: str, target: Optional[str], description: Optional[str]) -> str:
+    """Describe an action's agent, target and situation for a prompt"""
+    context = f"Agent Type: {agent_type}"
+    if target:
+        context += f"\nTarget: {target}"
+    if description:
+        context += f"\nContext: {description}"
+    return context
+
+
+class GeminiService:
+    """Generates action explanations with Gemini through a resilient upstream client
+
+    Calls share one keep-alive pool, are hedged when slower than the recent
+    p95, and fail fast while the circuit breaker is open (GEMINI_* settings,
+    see UpstreamClient.from_env). GEMINI_BASE_URL points at the local stub
+    (gemini_stub.py) for offline benchmarks. Every failure raises
+    ExplanationUnavailable, so that failures are never cached.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None):
+        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
+        self.url = (base_url or os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com")).rstrip("/") + GEMINI_PATH
+        self.upstream = UpstreamClient.from_env("gemini", "GEMINI")
+
+    async def close(self):
+        """Close the pooled connections"""
+        await self.upstream.close()
+
+    async def generate(self, prompt: str, max_output_tokens: int, json_output: bool = False) -> str:
+        """Send one prompt to Gemini and return the generated text"""
+        if not self.api_key:
+            logger.warning("GEMINI_API_KEY not set, using fallback explanation")
+            raise ExplanationUnavailable("Explanation unavailable - API key not configured")
+
+        generation_config = {
+            "maxOutputTokens": max_output_tokens,
+            "temperature": 0.7
+        }
+        if json_output:
+            generation_config["responseMimeType"] = "application/json"
+
+        try:
+            response = await self.upstream.post(
+                self.url,
+                headers={"Content-Type": "application/json", "X-goog-api-key": self.api_key},
+                json={
+                    "contents": [
+                        {
+                            "parts": [
+                                {
+                                    "text": prompt
+                                }
+                            ]
+                        }
+                    ],
+                    "generationConfig": generation_config
+                }
+            )
+
+            logger.info(f"Gemini API response status: {response.status_code}")
+
+            if response.status_code == 200:
+                try:
+                    data = response.json()
+                    logger.debug(f"📦 Full Gemini API response: {json.dumps(data, indent=2)}")
+
+                    # Check for error in response
+                    if "error" in data:
+                        logger.error(f"Gemini API returned error: {data['error']}")
+                        raise ExplanationUnavailable(f"Gemini Error: {data['error'].get('message', 'Unknown error')}")
+
+                    # Try to extract text from various possible structures
+                    if "candidates" in data and len(data["candidates"]) > 0:
+                        candidate = data["candidates"][0]
+                        if "content" in candidate and "parts" in candidate["content"]:
+                            parts = candidate["content"]["parts"]
+                            if len(parts) > 0 and "text" in parts[0]:
+                                return parts[0]["text"]
+
+                    if "contents" in data and len(data["contents"]) > 0:
+                        if "parts" in data["contents"][0] and len(data["contents"][0]["parts"]) > 0:
+                            return data["contents"][0]["parts"][0]["text"]
+
+                    logger.error(f"❌ Unexpected response structure: {json.dumps(data)}")
+                    raise ExplanationUnavailable("Unable to generate explanation - unexpected response format")
+
+                except ExplanationUnavailable:
+                    raise
+                except Exception as parse_err:
+                    logger.error(f"❌ Error parsing response: {str(parse_err)}")
+                    logger.error(f"Raw response text: {response.text}")
+                    raise ExplanationUnavailable(f"Error parsing response: {str(parse_err)}")
+            else:
+                logger.error(f"❌ Gemini API error: {response.status_code} - {response.text}")
+                raise ExplanationUnavailable(f"API Error: {response.status_code}")
+        except ExplanationUnavailable:
+            raise
+        except UpstreamUnavailable:
+            raise ExplanationUnavailable("Explanation service temporarily unavailable")
+        except (asyncio.TimeoutError, httpx.TimeoutException):
+            logger.error("Gemini API request timeout")
+            raise ExplanationUnavailable("API request timeout")
+        except Exception as e:
+            logger.error(f"Error calling Gemini API: {str(e)}")
+            raise ExplanationUnavailable(f"Error: {str(e)}")
+
+    async def explain(
+        self,
+        action: str,
+        agent_type: str,
+        target: Optional[str] = None,
+        description: Optional[str] = None
+    ) -> str:
+        """Explain one action"""
+        context = build_explanation_context(agent_type, target, description)
+
+        prompt = f"""You are a cybersecurity expert explaining AI agent actions in a network security simulation.
+
+{context}
+Action Taken: {action}
+
+Provide a brief, clear explanation (1-2 sentences max) of why this action makes sense in the context of {'attacking/breaching' if agent_type == 'attacker' else 'defending'} a network.
+Be concise and technical. Focus on the strategic reasoning."""
+
+        explanation = await self.generate(prompt, max_output_tokens=100)
+        logger.info(f"✅ Successfully extracted explanation: {explanation[:100]}...")
+        return explanation
+
+    async def explain_many(self, items: List[Dict]) -> Dict[int, str]:
+        """Explain several actions with one structured prompt
+
+        `items` hold action, agent_type and optional target/description keys.
+        Returns explanations keyed by each item's position; items missing from
+        the model's answer are left out.
+        """
+        numbered = "\n\n".join(
+            f"[{index}]\n"
+            f"{build_explanation_context(item['agent_type'], item.get('target'), item.get('description'))}\n"
+            f"Action Taken: {item['action']}"
+            for index, item in enumerate(items)
+        )
+
+        prompt = f"""You are a cybersecurity expert explaining AI agent actions in a network security simulation.
+
+Explain each of the {len(items)} numbered actions below. For each, give a brief, clear explanation (1-2 sentences max) of why the action makes sense for its agent: attacking/breaching the network for an attacker, defending it for a defender.
+Be concise and technical. Focus on the strategic reasoning.
+
+{numbered}
+
+Respond with only a JSON array containing one object per action: [{{"id": <number>, "explanation": "<text>"}}]"""
+
+        text = await self.generate(prompt, max_output_tokens=min(8192, 120 * len(items) + 50), json_output=True)
+
+        try:
+            parsed = json.loads(text.strip().removeprefix("```json").removeprefix("```").removesuffix("```"))
+        except ValueError:
+            logger.error(f"❌ Batch explanation was not valid JSON: {text[:200]}")
+            raise ExplanationUnavailable("Unable to generate explanation - unexpected response format")
+
+        explanations = {}
+        for entry in parsed if isinstance(parsed, list) else []:
+            if isinstance(entry, dict) and isinstance(entry.get("explanation"), str):
+                try:
+                    index = int(entry.get("id"))
+                except (TypeError, ValueError):
+                    continue
+                if 0 <= index < len(items):
+                    explanations[index] = entry["explanation"].strip()
+
+        logger.info(f"✅ Batch explained {len(explanations)}/{len(items)} actions in one call")
+        return explanations
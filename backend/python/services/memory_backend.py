@@ -0,0 +1,418 @@
+"""
+In-memory storage backend for running the API without MongoDB
+"""
+
+import os
+import copy
+import heapq
+import bisect
+import logging
+import itertools
+from datetime import datetime, timedelta
+from typing import Optional, Dict, List, Any, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+from services.storage_backend import StorageBackend
+from services.db_service import (
+    ACTIVITY_BUCKET_MAX_EVENTS,
+    ACTIVITY_RETENTION_DAYS,
+    ACTIVITY_SCORE_FIELDS,
+    _day_key,
+    _counter_field,
+    _bucket_start
+)
+
+logger = logging.getLogger(__name__)
+
+# Fields with a unique index (the Mongo backend creates the same ones)
+UNIQUE_USER_FIELDS = ("email", "username")
+
+# How often expired activity buckets are purged (MongoDB's TTL monitor runs every 60s)
+TTL_SWEEP_SECONDS = 60
+
+
+def _project(doc: Dict, projection: Optional[Dict]) -> Dict:
+    """Copy a document, keeping _id and the included fields of an inclusion projection"""
+    if not projection:
+        return copy.deepcopy(doc)
+    return {
+        key: copy.deepcopy(value)
+        for key, value in doc.items()
+        if key == "_id" or projection.get(key)
+    }
+
+
+def _set_path(doc: Dict, path: str, value: Any):
+    """Apply a $set of a dotted field path"""
+    *parents, leaf = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[leaf] = value
+
+
+def _activity_score(user: Dict) -> int:
+    return sum(user.get(field) or 0 for field in ACTIVITY_SCORE_FIELDS)
+
+
+class MemoryBackend(StorageBackend):
+    """Storage backend keeping every collection in process memory
+
+    Mirrors the Mongo backend's semantics for the operations DBService uses:
+    unique email/username indexes, an activityScore index kept sorted for
+    top-N reads, capped hourly activity buckets with TTL retention, and
+    per-day counter documents. Each operation runs without awaiting, so it is
+    atomic with respect to other requests on the event loop. Data lives only
+    as long as the process and is not shared between workers.
+    """
+
+    name = "memory"
+
+    def __init__(self, seed_users: Optional[int] = None):
+        super().__init__()
+        self.seed_users = seed_users if seed_users is not None else int(os.getenv("MEMORY_SEED_USERS", "0"))
+        self.users: Dict[str, Dict] = {}
+        self._unique: Dict[str, Dict[Any, str]] = {field: {} for field in UNIQUE_USER_FIELDS}
+        # activityScore index: sorted (-score, user id) pairs, plus each user's indexed score
+        self._score_index: List[Tuple[float, str]] = []
+        self._scores: Dict[str, float] = {}
+
+        self.buckets: Dict[str, List[Dict]] = {}  # userId -> that user's activity buckets
+        self._open_buckets: Dict[Tuple[str, datetime], Dict] = {}  # (userId, bucketStart) -> newest bucket
+        self.daily_counts: Dict[str, Dict] = {}
+        self.activity_logs: List[Dict] = []  # Legacy collection, only filled by callers
+        self._migrated_logs = 0  # Migration checkpoint into activity_logs
+        self._next_sweep = datetime.min
+        self._sequence = itertools.count()  # Tie-breaker for heap ordering
+        self.explanations: Dict[str, Tuple[datetime, str]] = {}
+
+    async def connect(self) -> bool:
+        """Seed the store; there is nothing to connect to"""
+        if self.seed_users:
+            self._seed(self.seed_users)
+        logger.info(f"✅ Using in-memory storage ({len(self.users)} users)")
+        return True
+
+    async def disconnect(self):
+        """Nothing to release; the data is dropped with the process"""
+        pass
+
+    def _seed(self, count: int):
+        """Create users with predictable ids 000...1 to count for load tests"""
+        from bson.objectid import ObjectId
+
+        now = datetime.utcnow()
+        for i in range(1, count + 1):
+            role = "admin" if i % 100 == 0 else "premium" if i % 10 == 0 else "free"
+            self._insert({
+                "_id": ObjectId(f"{i:024x}"),
+                "username": f"user{i}",
+                "email": f"user{i}@example.com",
+                "role": role,
+                "usage": {"networks": 0, "trainings": 0, "simulations": 0},
+                "usageResetTime": now + timedelta(days=1),
+                "networksCount": 0,
+                "trainingsCount": 0,
+                "simulationsCount": 0,
+                "activityScore": 0,
+                "createdAt": now,
+                "updatedAt": now
+            })
+        logger.info(f"🌱 Seeded {count} users (ids {1:024x}..{count:024x})")
+
+    # ===== Indexes =====
+    def _index_score(self, user_id: str, user: Dict):
+        """Keep the activityScore index in step with a user document"""
+        old = self._scores.pop(user_id, None)
+        if old is not None:
+            del self._score_index[bisect.bisect_left(self._score_index, (-old, user_id))]
+
+        score = user.get("activityScore")
+        if score is not None:
+            bisect.insort(self._score_index, (-score, user_id))
+            self._scores[user_id] = score
+
+    def _check_unique(self, user_id: str, fields: Dict):
+        for field in UNIQUE_USER_FIELDS:
+            if field in fields:
+                owner = self._unique[field].get(fields[field])
+                if owner is not None and owner != user_id:
+                    raise DuplicateKeyError(f"E11000 duplicate key error: {field} {fields[field]!r}")
+
+    def _index_unique(self, user_id: str, old: Dict, new: Dict):
+        for field in UNIQUE_USER_FIELDS:
+            if old.get(field) != new.get(field):
+                self._unique[field].pop(old.get(field), None)
+            if field in new:
+                self._unique[field][new[field]] = user_id
+
+    # ===== Users =====
+    def _insert(self, user_data: Dict) -> str:
+        from bson.objectid import ObjectId
+
+        # Like insert_one, the caller's document gains its _id
+        user_data.setdefault("_id", ObjectId())
+        user_id = str(user_data["_id"])
+        if user_id in self.users:
+            raise DuplicateKeyError(f"E11000 duplicate key error: _id {user_id}")
+        self._check_unique(user_id, user_data)
+
+        user = copy.deepcopy(user_data)
+        self.users[user_id] = user
+        self._index_unique(user_id, {}, user)
+        self._index_score(user_id, user)
+        return user_id
+
+    async def get_user(self, user_id: str, projection: Optional[Dict] = None) -> Optional[Dict]:
+        user = self.users.get(user_id)
+        return _project(user, projection) if user else None
+
+    async def find_user(self, field: str, value: Any) -> Optional[Dict]:
+        if field in self._unique:
+            user_id = self._unique[field].get(value)
+            return _project(self.users[user_id], None) if user_id else None
+        for user in self.users.values():
+            if user.get(field) == value:
+                return _project(user, None)
+        return None
+
+    async def insert_user(self, user_data: Dict) -> str:
+        return self._insert(user_data)
+
+    async def update_user(self, user_id: str, fields: Dict) -> bool:
+        user = self.users.get(user_id)
+        if not user:
+            return False
+
+        updated = copy.deepcopy(user)
+        for path, value in fields.items():
+            _set_path(updated, path, copy.deepcopy(value))
+        self._check_unique(user_id, updated)
+
+        self.users[user_id] = updated
+        self._index_unique(user_id, user, updated)
+        self._index_score(user_id, updated)
+        return updated != user
+
+    async def increment_usage(
+        self,
+        user_id: str,
+        usage_key: str,
+        increment: int,
+        current_time: datetime
+    ) -> Optional[Tuple[Dict, bool]]:
+        """Same reset/limit/increment rules as the Mongo backend's single update"""
+        from models import QUOTA_LIMITS
+
+        user = self.users.get(user_id)
+        if not user:
+            return None
+
+        usage = user.get("usage") or {}
+        current_usage = usage.get(usage_key) or 0
+        reset_due = current_time >= (user.get("usageResetTime") or current_time)
+        limits = QUOTA_LIMITS.get(user.get("role"), QUOTA_LIMITS["free"])
+        projection = {"role": 1, "usage": 1, "usageResetTime": 1}
+
+        if not reset_due and current_usage + increment > limits.get(usage_key, 0):
+            return _project(user, projection), False
+
+        if reset_due:
+            user["usage"] = {"networks": 0, "trainings": 0, "simulations": 0, usage_key: increment}
+            user["usageResetTime"] = current_time + timedelta(days=1)
+        else:
+            user["usage"] = {**usage, usage_key: current_usage + increment}
+
+        count_field = f"{usage_key}Count"
+        user[count_field] = (user.get(count_field) or 0) + increment
+        score = user.get("activityScore")
+        user["activityScore"] = (_activity_score(user) if score is None else score + increment)
+        user["updatedAt"] = current_time
+        self._index_score(user_id, user)
+        return _project(user, projection), True
+
+    async def count_users(self) -> int:
+        return len(self.users)
+
+    async def count_users_by_role(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for user in self.users.values():
+            role = user.get("role")
+            counts[role] = counts.get(role, 0) + 1
+        return counts
+
+    async def backfill_activity_scores(self, recompute: bool = False) -> int:
+        modified = 0
+        for user_id, user in self.users.items():
+            if not recompute and "activityScore" in user:
+                continue
+            score = _activity_score(user)
+            if user.get("activityScore") != score:
+                user["activityScore"] = score
+                self._index_score(user_id, user)
+                modified += 1
+        return modified
+
+    async def get_top_users(self, limit: int) -> List[Dict]:
+        projection = {"username": 1, "email": 1, "role": 1, "activityScore": 1}
+        top = [self.users[user_id] for _, user_id in self._score_index[:limit]]
+
+        # Users without a score sort last, as missing fields do in MongoDB
+        if len(top) < limit:
+            unscored = (user for user_id, user in self.users.items() if user_id not in self._scores)
+            top.extend(itertools.islice(unscored, limit - len(top)))
+
+        return [_project(user, projection) for user in top]
+
+    # ===== Activities =====
+    def _sweep_expired(self, now: datetime):
+        """Drop buckets past the retention window, like the lastTimestamp TTL index"""
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + timedelta(seconds=TTL_SWEEP_SECONDS)
+
+        cutoff = now - timedelta(days=ACTIVITY_RETENTION_DAYS)
+        for user_id in list(self.buckets):
+            kept = [bucket for bucket in self.buckets[user_id] if bucket["lastTimestamp"] >= cutoff]
+            if kept:
+                self.buckets[user_id] = kept
+            else:
+                del self.buckets[user_id]
+        self._open_buckets = {
+            key: bucket for key, bucket in self._open_buckets.items() if bucket["lastTimestamp"] >= cutoff
+        }
+
+    def _write_buckets(self, activities: List[Dict]):
+        """Append activities to their per-user hourly buckets"""
+        from bson.objectid import ObjectId
+
+        grouped: Dict[tuple, List[Dict]] = {}
+        for activity in activities:
+            event = {key: copy.deepcopy(value) for key, value in activity.items() if key != "userId"}
+            event.setdefault("_id", ObjectId())
+            key = (activity["userId"], _bucket_start(activity["timestamp"]))
+            grouped.setdefault(key, []).append(event)
+
+        for (user_id, bucket_start), events in grouped.items():
+            bucket = self._open_buckets.get((user_id, bucket_start))
+            # A full bucket no longer takes events, so a new one is started
+            if bucket is None or bucket["count"] >= ACTIVITY_BUCKET_MAX_EVENTS:
+                bucket = {
+                    "userId": user_id,
+                    "bucketStart": bucket_start,
+                    "events": [],
+                    "types": set(),
+                    "count": 0,
+                    "firstTimestamp": min(e["timestamp"] for e in events),
+                    "lastTimestamp": max(e["timestamp"] for e in events)
+                }
+                self.buckets.setdefault(user_id, []).append(bucket)
+                self._open_buckets[(user_id, bucket_start)] = bucket
+
+            bucket["events"].extend(events)
+            bucket["types"].update(e["type"] for e in events)
+            bucket["count"] += len(events)
+            bucket["firstTimestamp"] = min(bucket["firstTimestamp"], *(e["timestamp"] for e in events))
+            bucket["lastTimestamp"] = max(bucket["lastTimestamp"], *(e["timestamp"] for e in events))
+
+    async def write_activities(self, activities: List[Dict]):
+        self._sweep_expired(datetime.utcnow())
+        self._write_buckets(activities)
+
+        for activity in activities:
+            day = _day_key(activity["timestamp"])
+            counter = self.daily_counts.setdefault(
+                day,
+                {"_id": day, "counts": {}, "total": 0, "date": datetime.strptime(day, "%Y-%m-%d")}
+            )
+            field = _counter_field(activity["type"])
+            counter["counts"][field] = counter["counts"].get(field, 0) + 1
+            counter["total"] += 1
+
+    async def get_activity_feed(
+        self,
+        limit: int,
+        cursor: Optional[Tuple[datetime, Any]],
+        user_id: Optional[str],
+        activity_type: Optional[str],
+        fields: List[str]
+    ) -> List[Dict]:
+        """Walk candidate buckets newest-lastTimestamp first, stopping once the page is settled"""
+        self._sweep_expired(datetime.utcnow())
+
+        if user_id:
+            candidates = self.buckets.get(user_id, [])
+        else:
+            candidates = itertools.chain.from_iterable(self.buckets.values())
+
+        heap = [
+            (-bucket["lastTimestamp"].timestamp(), next(self._sequence), bucket)
+            for bucket in candidates
+            if (not activity_type or activity_type in bucket["types"])
+            and (not cursor or bucket["firstTimestamp"] <= cursor[0])
+        ]
+        heapq.heapify(heap)
+
+        page: List[Dict] = []
+        while heap:
+            bucket = heapq.heappop(heap)[2]
+            if len(page) >= limit and bucket["lastTimestamp"] < page[limit - 1]["timestamp"]:
+                break
+
+            for event in bucket["events"]:
+                if activity_type and event["type"] != activity_type:
+                    continue
+                if cursor and (event["timestamp"], event["_id"]) >= cursor:
+                    continue
+                projected = {"_id": event["_id"], "timestamp": event["timestamp"]}
+                for field in fields:
+                    if field == "userId":
+                        projected["userId"] = bucket["userId"]
+                    elif field in event:
+                        projected[field] = copy.deepcopy(event[field])
+                page.append(projected)
+
+            page.sort(key=lambda e: (e["timestamp"], e["_id"]), reverse=True)
+            del page[limit:]
+        return page
+
+    async def get_daily_counts(self, days: List[str]) -> Dict[str, Dict[str, int]]:
+        return {day: dict(self.daily_counts[day]["counts"]) for day in days if day in self.daily_counts}
+
+    async def count_activities_by_type(self, start: datetime, end: datetime) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for bucket in itertools.chain.from_iterable(self.buckets.values()):
+            if bucket["lastTimestamp"] < start or bucket["firstTimestamp"] >= end:
+                continue
+            for event in bucket["events"]:
+                if start <= event["timestamp"] < end:
+                    field = _counter_field(str(event["type"]))
+                    counts[field] = counts.get(field, 0) + 1
+        return counts
+
+    async def migrate_activity_logs(self, batch_size: int, drop_source: bool) -> int:
+        """Move the legacy activity_logs list into buckets, resuming from the checkpoint"""
+        migrated = 0
+        while self._migrated_logs < len(self.activity_logs):
+            batch = self.activity_logs[self._migrated_logs:self._migrated_logs + batch_size]
+            self._write_buckets(batch)
+            self._migrated_logs += len(batch)
+            migrated += len(batch)
+
+        if drop_source:
+            self.activity_logs = []
+            self._migrated_logs = 0
+        return migrated
+
+    # ===== XAI explanations =====
+    async def get_cached_explanation(self, key: str, now: datetime) -> Optional[str]:
+        entry = self.explanations.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del self.explanations[key]
+            return None
+        return entry[1]
+
+    async def store_cached_explanation(self, key: str, explanation: str, expires_at: datetime):
+        self.explanations[key] = (expires_at, explanation)
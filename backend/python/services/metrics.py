@@ -0,0 +1,420 @@
+"""
+Lightweight in-process metrics primitives
+"""
+
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Label sets are stored as tuples of (name, value) pairs so they can be dict keys
+Labels = Tuple[Tuple[str, str], ...]
+
+# Upper bounds (in milliseconds) for latency histogram buckets
+DEFAULT_LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    """Fixed-bucket histogram of durations in milliseconds"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS_MS):
+        self.buckets = tuple(sorted(buckets))
+        self.reset()
+
+    def reset(self):
+        """Clear all recorded observations"""
+        # One extra slot for observations above the last bucket (+Inf)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def observe(self, value: float):
+        """Record a single observation"""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by interpolating inside the matching bucket"""
+        if self.count == 0:
+            return 0.0
+
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                estimate = lower + (upper - lower) * ((rank - seen) / bucket_count)
+                return min(max(estimate, self.min), self.max)
+            seen += bucket_count
+        return self.max
+
+    def snapshot(self) -> Dict:
+        """Summarize the histogram as a JSON-serializable dict"""
+        cumulative = 0
+        buckets = {}
+        for upper, bucket_count in zip(self.buckets, self.counts):
+            cumulative += bucket_count
+            buckets[str(upper)] = cumulative
+        buckets["+Inf"] = self.count
+
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 3),
+            "mean": round(self.sum / self.count, 3) if self.count else 0.0,
+            "min": round(self.min, 3) if self.min is not None else 0.0,
+            "max": round(self.max, 3) if self.max is not None else 0.0,
+            "p50": round(self.quantile(0.50), 3),
+            "p95": round(self.quantile(0.95), 3),
+            "p99": round(self.quantile(0.99), 3),
+            "buckets": buckets
+        }
+
+
+class PhaseTimer:
+    """Lap timer that attributes elapsed monotonic time to named phases"""
+
+    def __init__(self):
+        self._start = time.perf_counter()
+        self._last = self._start
+        self.phases: Dict[str, float] = {}
+
+    def lap(self, phase: str):
+        """Attribute the time since the previous lap to `phase`"""
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + (now - self._last) * 1000
+        self._last = now
+
+    def breakdown(self) -> Dict[str, float]:
+        """Get per-phase durations plus the total, in milliseconds"""
+        result = {phase: round(ms, 3) for phase, ms in self.phases.items()}
+        result["total"] = round((self._last - self._start) * 1000, 3)
+        return result
+
+
+class PhaseStats:
+    """Per-phase latency histograms aggregated over many timed operations"""
+
+    def __init__(self):
+        self.phases: Dict[str, Histogram] = {}
+        self.since = time.time()
+
+    def record(self, breakdown: Dict[str, float]):
+        """Record one phase breakdown as produced by PhaseTimer.breakdown()"""
+        for phase, ms in breakdown.items():
+            if phase not in self.phases:
+                self.phases[phase] = Histogram()
+            self.phases[phase].observe(ms)
+
+    def reset(self):
+        """Drop all recorded phases"""
+        self.phases = {}
+        self.since = time.time()
+
+    def snapshot(self) -> Dict:
+        """Summarize every phase histogram"""
+        total = self.phases.get("total")
+        return {
+            "steps": total.count if total else 0,
+            "since": self.since,
+            "phases": {phase: hist.snapshot() for phase, hist in self.phases.items()}
+        }
+
+
+class RateWindow:
+    """Event counts over a sliding window of one-second slots"""
+
+    def __init__(self, seconds: int = 60):
+        self.seconds = seconds
+        self._counts = [0] * seconds
+        self._stamps = [0] * seconds
+
+    def add(self, amount: int = 1):
+        """Count `amount` events in the current second"""
+        now = int(time.monotonic())
+        slot = now % self.seconds
+        if self._stamps[slot] != now:
+            self._stamps[slot] = now
+            self._counts[slot] = 0
+        self._counts[slot] += amount
+
+    def total(self) -> int:
+        """Get the number of events inside the window"""
+        now = int(time.monotonic())
+        return sum(count for count, stamp in zip(self._counts, self._stamps) if now - stamp < self.seconds)
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label(value)}"' for key, value in pairs) + "}"
+
+
+def format_histogram(name: str, labels: Labels, hist: Histogram) -> List[str]:
+    """Render one histogram series in the Prometheus text format"""
+    lines = []
+    cumulative = 0
+    for upper, bucket_count in zip(hist.buckets, hist.counts):
+        cumulative += bucket_count
+        lines.append(f"{name}_bucket{_format_labels(labels, (('le', str(upper)),))} {cumulative}")
+    lines.append(f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {hist.count}")
+    lines.append(f"{name}_sum{_format_labels(labels)} {hist.sum}")
+    lines.append(f"{name}_count{_format_labels(labels)} {hist.count}")
+    return lines
+
+
+def _add_label(series: str, key: str, value: str) -> str:
+    """Add one label to a rendered series name"""
+    label = f'{key}="{_escape_label(value)}"'
+    if series.endswith("}"):
+        return f"{series[:-1]},{label}}}"
+    return f"{series}{{{label}}}"
+
+
+def merge_prometheus(texts: Iterable[str], workers: Optional[Sequence[str]] = None) -> str:
+    """Merge expositions from several processes
+
+    Counters and histograms are summed into the true totals. Gauges describe
+    one process (model_loaded, db_pool_max_size, ...) and are not summed: each
+    sample keeps its own series with a `worker` label, named from `workers`
+    (default: the position of its text).
+    """
+    # family -> (HELP/TYPE lines, series -> value), both in first-seen order
+    families: Dict[str, Tuple[List[str], Dict[str, float]]] = {}
+    kinds: Dict[str, str] = {}
+
+    for index, text in enumerate(texts):
+        worker = workers[index] if workers else str(index)
+        family = ""
+        for line in text.splitlines():
+            if line.startswith("# HELP ") or line.startswith("# TYPE "):
+                parts = line.split(" ")
+                family = parts[2]
+                if parts[1] == "TYPE" and len(parts) > 3:
+                    kinds[family] = parts[3]
+                comments, _ = families.setdefault(family, ([], {}))
+                if line not in comments:
+                    comments.append(line)
+                continue
+            if not line or line.startswith("#"):
+                continue
+
+            series, _, value = line.rpartition(" ")
+            try:
+                number = float(value)
+            except ValueError:
+                continue
+            name = series.split("{", 1)[0]
+            if not name.startswith(family) or not family:
+                family = name
+            _, values = families.setdefault(family, ([], {}))
+            if kinds.get(family) == "gauge":
+                values[_add_label(series, "worker", worker)] = number
+            else:
+                values[series] = values.get(series, 0.0) + number
+
+    lines = []
+    for comments, values in families.values():
+        lines.extend(comments)
+        lines.extend(f"{series} {value}" for series, value in values.items())
+    return "\n".join(lines) + "\n"
+
+
+def _summary(uptime: float, requests: float, errors: float, last_minute: float,
+             latency_count: float, latency_sum: float, hits: float, misses: float) -> Dict:
+    return {
+        "uptimeSeconds": uptime,
+        "requests": requests,
+        "errors": errors,
+        "requestsLastMinute": last_minute,
+        "avgResponseTimeMs": latency_sum / latency_count if latency_count else 0.0,
+        "errorRate": errors / requests if requests else 0.0,
+        "cacheHitRate": hits / (hits + misses) if (hits + misses) else 0.0
+    }
+
+
+def summarize_prometheus(text: str, prefix: str = "autosentinel") -> Dict:
+    """The figures of MetricsRegistry.summary() computed from an exposition
+
+    Given the router's merged /metrics, they cover every worker instead of
+    the one process that happened to serve the request.
+    """
+    totals: Dict[str, float] = {}
+    uptime = 0.0
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        series, _, value = line.rpartition(" ")
+        try:
+            number = float(value)
+        except ValueError:
+            continue
+        name = series.split("{", 1)[0]
+        if name == f"{prefix}_uptime_seconds":
+            uptime = max(uptime, number)
+        else:
+            totals[name] = totals.get(name, 0.0) + number
+
+    def total(name: str) -> float:
+        return totals.get(f"{prefix}_{name}", 0.0)
+
+    return _summary(
+        uptime=uptime,
+        requests=total("http_requests_total"),
+        errors=total("http_request_errors_total"),
+        last_minute=total("http_requests_last_minute"),
+        latency_count=total("http_request_duration_ms_count"),
+        latency_sum=total("http_request_duration_ms_sum"),
+        hits=total("xai_cache_hits_total"),
+        misses=total("xai_cache_misses_total")
+    )
+
+
+def dashboard_figures(summary: Dict) -> Dict:
+    """Admin dashboard system metrics from a summary"""
+    # Availability is the share of requests served without a 5xx
+    uptime_percent = 100 - summary["errorRate"] * 100
+
+    return {
+        "uptime": f"{uptime_percent:.1f}%",
+        "uptimeSeconds": int(summary["uptimeSeconds"]),
+        "avgResponseTime": f"{int(summary['avgResponseTimeMs'])}ms",
+        "apiRequestsPerMin": int(summary["requestsLastMinute"]),
+        "errorRate": f"{summary['errorRate'] * 100:.1f}%",
+        "cacheHitRate": f"{summary['cacheHitRate'] * 100:.1f}%"
+    }
+
+
+class MetricsRegistry:
+    """Process-wide counters, histograms and scrape-time gauges
+
+    Updates happen on the event loop thread only, so plain dict and int
+    operations are enough and no locks sit on the request path.
+    """
+
+    def __init__(self, prefix: str = "autosentinel"):
+        self.prefix = prefix
+        self.started_at = time.time()
+        self.requests_window = RateWindow(60)
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._gauges: Dict[str, Callable[[], float]] = {}
+        self._collectors: List[Callable[[], Iterable[str]]] = []
+        self._help: Dict[str, str] = {}
+
+    def _name(self, name: str) -> str:
+        return f"{self.prefix}_{name}"
+
+    def describe(self, name: str, help_text: str):
+        """Attach a HELP string to a metric"""
+        self._help[self._name(name)] = help_text
+
+    def inc(self, name: str, labels: Labels = (), amount: float = 1):
+        """Increment a counter series"""
+        series = self._counters.setdefault(self._name(name), {})
+        series[labels] = series.get(labels, 0) + amount
+
+    def observe(self, name: str, value: float, labels: Labels = ()):
+        """Record an observation in a histogram series"""
+        series = self._histograms.setdefault(self._name(name), {})
+        hist = series.get(labels)
+        if hist is None:
+            hist = series[labels] = Histogram()
+        hist.observe(value)
+
+    def register_gauge(self, name: str, fn: Callable[[], float], help_text: str = ""):
+        """Register a gauge whose value is read at scrape time"""
+        self._gauges[self._name(name)] = fn
+        if help_text:
+            self.describe(name, help_text)
+
+    def register_collector(self, fn: Callable[[], Iterable[str]]):
+        """Register a callable returning extra exposition lines at scrape time"""
+        self._collectors.append(fn)
+
+    def counter_total(self, name: str) -> float:
+        """Sum a counter across all of its label sets"""
+        return sum(self._counters.get(self._name(name), {}).values())
+
+    def histogram_totals(self, name: str) -> Tuple[int, float]:
+        """Get (count, sum) of a histogram across all of its label sets"""
+        series = self._histograms.get(self._name(name), {}).values()
+        return sum(h.count for h in series), sum(h.sum for h in series)
+
+    def record_request(self, method: str, route: str, status_code: int, duration_ms: float):
+        """Record one HTTP request"""
+        labels = (("method", method), ("route", route))
+        self.inc("http_requests_total", labels + (("status", str(status_code)),))
+        self.observe("http_request_duration_ms", duration_ms, labels)
+        if status_code >= 500:
+            self.inc("http_request_errors_total", labels)
+        self.requests_window.add()
+
+    def summary(self) -> Dict:
+        """Headline request figures for dashboards (this process only, see summarize_prometheus)"""
+        latency_count, latency_sum = self.histogram_totals("http_request_duration_ms")
+        return _summary(
+            uptime=time.time() - self.started_at,
+            requests=self.counter_total("http_requests_total"),
+            errors=self.counter_total("http_request_errors_total"),
+            last_minute=self.requests_window.total(),
+            latency_count=latency_count,
+            latency_sum=latency_sum,
+            hits=self.counter_total("xai_cache_hits_total"),
+            misses=self.counter_total("xai_cache_misses_total")
+        )
+
+    def render_prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+
+        def header(name: str, kind: str):
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for name, series in self._counters.items():
+            header(name, "counter")
+            for labels, value in series.items():
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        for name, series in self._histograms.items():
+            header(name, "histogram")
+            for labels, hist in series.items():
+                lines.extend(format_histogram(name, labels, hist))
+
+        for name, fn in self._gauges.items():
+            try:
+                value = float(fn())
+            except Exception:
+                continue
+            header(name, "gauge")
+            lines.append(f"{name} {value}")
+
+        for collector in self._collectors:
+            try:
+                lines.extend(collector())
+            except Exception:
+                continue
+
+        return "\n".join(lines) + "\n"
+
+
+# Shared registry for the API process
+registry = MetricsRegistry()
+registry.describe("http_requests_total", "HTTP requests by method, route and status")
+registry.describe("http_request_duration_ms", "HTTP request latency in milliseconds")
+registry.describe("http_request_errors_total", "HTTP requests that ended with a 5xx status")
+registry.register_gauge("http_requests_last_minute", registry.requests_window.total, "HTTP requests in the last 60 seconds")
+registry.register_gauge("uptime_seconds", lambda: time.time() - registry.started_at, "Seconds since the process started")
@@ -1,9 +1,13 @@
 import os
 import yaml
+import asyncio
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, Optional
 
+from services.admission import inference_queue, Overloaded, DeadlineExceeded
+
 # === Optimize imports: disable TensorFlow, CUDA checks ===
 os.environ["CUDA_VISIBLE_DEVICES"] = "-1"
 os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"
@@ -21,6 +25,8 @@ class ModelService:
         self.algo = None
         self.env_config = None
         self._loaded = False
+        # One inference thread: the policy is not shared between threads
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
 
     async def initialize(self):
         """Initialize the model service - optimized for faster loading"""
@@ -194,8 +200,26 @@ class ModelService:
         """Check if model is loaded"""
         return self._loaded
 
-    async def predict(self, observations: Dict[str, Any]) -> Dict[str, int]:
-        """Get actions from the model for given observations"""
+    def _compute_actions(self, observations: Dict[str, Any]) -> Dict[str, int]:
+        actions = {}
+        logger.debug(f"🤖 Computing actions for {len(observations)} agents...")
+
+        for agent_id, obs in observations.items():
+            policy_id = str(agent_id).split("_")[0]
+            action = self.algo.compute_single_action(obs, policy_id=policy_id)
+            actions[agent_id] = action
+            logger.debug(f"  {agent_id} ({policy_id}) → action: {action}")
+
+        logger.debug(f"✅ Actions computed: {actions}")
+        return actions
+
+    async def predict(self, observations: Dict[str, Any], deadline: Optional[float] = None) -> Dict[str, int]:
+        """Get actions from the model for given observations
+
+        Inference goes through the bounded inference queue and runs on the
+        inference thread, so the event loop can keep shedding excess work;
+        raises Overloaded or DeadlineExceeded when the request is shed.
+        """
         if not self._loaded or self.algo is None:
             # Return random actions if model not loaded
             logger.debug("🎲 Using random actions (model not loaded)")
@@ -204,19 +228,14 @@ class ModelService:
                 "defender": 0   # do-nothing action
             }
 
-        try:
-            actions = {}
-            logger.debug(f"🤖 Computing actions for {len(observations)} agents...")
-
-            for agent_id, obs in observations.items():
-                policy_id = str(agent_id).split("_")[0]
-                action = self.algo.compute_single_action(obs, policy_id=policy_id)
-                actions[agent_id] = action
-                logger.debug(f"  {agent_id} ({policy_id}) → action: {action}")
-
-            logger.debug(f"✅ Actions computed: {actions}")
-            return actions
+        async def infer():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._compute_actions, observations)
 
+        try:
+            return await inference_queue.run(infer, deadline)
+        except (Overloaded, DeadlineExceeded):
+            raise
         except Exception as e:
             logger.error(f"❌ Error during prediction: {str(e)}")
             return {
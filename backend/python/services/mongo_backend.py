@@ -0,0 +1,423 @@
+"""
+MongoDB storage backend
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Optional, Dict, List, Any, Tuple
+from motor.motor_asyncio import AsyncClient, AsyncDatabase
+from pymongo import ASCENDING, DESCENDING, UpdateOne, monitoring
+
+from services.storage_backend import PoolStats, StorageBackend
+from services.db_service import (
+    ACTIVITY_BUCKET_MAX_EVENTS,
+    ACTIVITY_RETENTION_DAYS,
+    ACTIVITY_SCORE_FIELDS,
+    _day_key,
+    _counter_field,
+    _bucket_start
+)
+
+logger = logging.getLogger(__name__)
+
+# Aggregation expression computing activityScore from the lifetime counters
+ACTIVITY_SCORE_EXPR = {"$add": [{"$ifNull": [f"${field}", 0]} for field in ACTIVITY_SCORE_FIELDS]}
+
+
+def _daily_counter_update(day: str, activity_type: str, amount: int) -> Tuple[Dict, Dict]:
+    """Build the (filter, update) upsert pair for a per-day activity counter document"""
+    return (
+        {"_id": day},
+        {
+            "$inc": {f"counts.{_counter_field(activity_type)}": amount, "total": amount},
+            "$setOnInsert": {"date": datetime.strptime(day, "%Y-%m-%d")}
+        }
+    )
+
+
+class PoolStatsListener(PoolStats, monitoring.ConnectionPoolListener):
+    """Tracks connection pool usage from PyMongo CMAP events"""
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._add("open_connections", 1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._add("open_connections", -1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._add("checkout_failures", 1)
+
+    def connection_checked_out(self, event):
+        self._add("checked_out", 1)
+
+    def connection_checked_in(self, event):
+        self._add("checked_out", -1)
+
+
+class MongoBackend(StorageBackend):
+    """Storage backend for MongoDB operations"""
+
+    name = "mongo"
+
+    def __init__(self, connection_string: Optional[str]):
+        super().__init__(PoolStatsListener())
+        self.connection_string = connection_string
+        self.client: Optional[AsyncClient] = None
+        self.db: Optional[AsyncDatabase] = None
+
+    async def connect(self) -> bool:
+        """Connect to MongoDB"""
+        if not self.connection_string:
+            logger.warning("⚠️ MONGODB_URI not set, running in mock mode")
+            return False
+
+        self.client = AsyncClient(
+            self.connection_string,
+            serverSelectionTimeoutMS=5000,
+            event_listeners=[self.pool_stats]
+        )
+        self.db = self.client["autosentinel"]
+
+        # Test connection
+        await self.db.command("ping")
+        logger.info("✅ Connected to MongoDB")
+
+        # Create indexes
+        await self._create_indexes()
+        return True
+
+    async def disconnect(self):
+        """Disconnect from MongoDB"""
+        if self.client:
+            self.client.close()
+            logger.info("Disconnected from MongoDB")
+
+    async def _create_indexes(self):
+        """Create database indexes"""
+        try:
+            # User indexes
+            await self.db.users.create_index("email", unique=True)
+            await self.db.users.create_index("username", unique=True)
+            await self.db.users.create_index("googleId", sparse=True)
+            await self.db.users.create_index([("activityScore", DESCENDING)])
+
+            # Quota usage indexes
+            await self.db.quota_usage.create_index([("userId", ASCENDING), ("date", DESCENDING)])
+
+            # Legacy activity log indexes (kept until the bucket migration has run)
+            await self.db.activity_logs.create_index([("userId", ASCENDING), ("timestamp", DESCENDING)])
+            await self.db.activity_logs.create_index("type")
+            await self.db.activity_logs.create_index([("timestamp", DESCENDING)])
+
+            # Activity bucket indexes; lastTimestamp doubles as the retention TTL
+            await self.db.activity_buckets.create_index(
+                [("userId", ASCENDING), ("bucketStart", ASCENDING), ("count", ASCENDING)]
+            )
+            await self.db.activity_buckets.create_index([("userId", ASCENDING), ("lastTimestamp", DESCENDING)])
+            await self.db.activity_buckets.create_index(
+                "lastTimestamp",
+                expireAfterSeconds=ACTIVITY_RETENTION_DAYS * 24 * 3600
+            )
+
+            # Persistent XAI explanation cache, expired by TTL
+            await self.db.xai_explanations.create_index("expiresAt", expireAfterSeconds=0)
+
+            logger.info("✅ Database indexes created")
+        except Exception as e:
+            logger.error(f"❌ Error creating indexes: {str(e)}")
+
+    def get_pool_max_size(self) -> int:
+        """Get the configured maximum connection pool size"""
+        if not self.client:
+            return 0
+        return self.client.options.pool_options.max_pool_size
+
+    # ===== Users =====
+    async def get_user(self, user_id: str, projection: Optional[Dict] = None) -> Optional[Dict]:
+        from bson.objectid import ObjectId
+        return await self.db.users.find_one({"_id": ObjectId(user_id)}, projection)
+
+    async def find_user(self, field: str, value: Any) -> Optional[Dict]:
+        return await self.db.users.find_one({field: value})
+
+    async def insert_user(self, user_data: Dict) -> str:
+        result = await self.db.users.insert_one(user_data)
+        return str(result.inserted_id)
+
+    async def update_user(self, user_id: str, fields: Dict) -> bool:
+        from bson.objectid import ObjectId
+        result = await self.db.users.update_one({"_id": ObjectId(user_id)}, {"$set": fields})
+        return result.modified_count > 0
+
+    async def increment_usage(
+        self,
+        user_id: str,
+        usage_key: str,
+        increment: int,
+        current_time: datetime
+    ) -> Optional[Tuple[Dict, bool]]:
+        """Single find_one_and_update whose filter enforces the limit server-side"""
+        from bson.objectid import ObjectId
+        from pymongo import ReturnDocument
+        from models import QUOTA_LIMITS
+
+        usage_field = f"$usage.{usage_key}"
+        current_usage = {"$ifNull": [usage_field, 0]}
+        reset_due = {"$gte": [current_time, {"$ifNull": ["$usageResetTime", current_time]}]}
+        limit = {
+            "$switch": {
+                "branches": [
+                    {"case": {"$eq": ["$role", role]}, "then": limits.get(usage_key, 0)}
+                    for role, limits in QUOTA_LIMITS.items()
+                ],
+                "default": QUOTA_LIMITS["free"].get(usage_key, 0)
+            }
+        }
+
+        user = await self.db.users.find_one_and_update(
+            {
+                "_id": ObjectId(user_id),
+                # Either the daily window has expired or there is room left under the limit
+                "$expr": {"$or": [reset_due, {"$lte": [{"$add": [current_usage, increment]}, limit]}]}
+            },
+            [{
+                "$set": {
+                    "usage": {
+                        "$cond": [
+                            reset_due,
+                            {"networks": 0, "trainings": 0, "simulations": 0, usage_key: increment},
+                            {"$mergeObjects": [{"$ifNull": ["$usage", {}]}, {usage_key: {"$add": [current_usage, increment]}}]}
+                        ]
+                    },
+                    "usageResetTime": {
+                        "$cond": [reset_due, current_time + timedelta(days=1), "$usageResetTime"]
+                    },
+                    f"{usage_key}Count": {"$add": [{"$ifNull": [f"${usage_key}Count", 0]}, increment]},
+                    # Leaderboard score moves in the same atomic update as the counter
+                    "activityScore": {"$add": [{"$ifNull": ["$activityScore", ACTIVITY_SCORE_EXPR]}, increment]},
+                    "updatedAt": current_time
+                }
+            }],
+            projection={"role": 1, "usage": 1, "usageResetTime": 1},
+            return_document=ReturnDocument.AFTER
+        )
+
+        if user:
+            return user, True
+
+        # Nothing matched: the user is missing or over the limit (failure path only)
+        user = await self.db.users.find_one(
+            {"_id": ObjectId(user_id)},
+            {"role": 1, "usage": 1, "usageResetTime": 1}
+        )
+        if not user:
+            return None
+        return user, False
+
+    async def count_users(self) -> int:
+        return await self.db.users.count_documents({})
+
+    async def count_users_by_role(self) -> Dict[str, int]:
+        result = await self.db.users.aggregate([
+            {"$group": {"_id": "$role", "count": {"$sum": 1}}}
+        ]).to_list(None)
+        return {item["_id"]: item["count"] for item in result}
+
+    async def backfill_activity_scores(self, recompute: bool = False) -> int:
+        query = {} if recompute else {"activityScore": {"$exists": False}}
+        result = await self.db.users.update_many(query, [{"$set": {"activityScore": ACTIVITY_SCORE_EXPR}}])
+        return result.modified_count
+
+    async def get_top_users(self, limit: int) -> List[Dict]:
+        # Index-backed top-N read of only the displayed fields
+        return await self.db.users.find(
+            {},
+            {"username": 1, "email": 1, "role": 1, "activityScore": 1}
+        ).sort("activityScore", DESCENDING).limit(limit).to_list(limit)
+
+    # ===== Activities =====
+    async def _write_buckets(self, activities: List[Dict]):
+        """Append activities to their per-user hourly buckets, one upsert per bucket"""
+        from bson.objectid import ObjectId
+
+        grouped: Dict[tuple, List[Dict]] = {}
+        for activity in activities:
+            event = {key: value for key, value in activity.items() if key != "userId"}
+            event.setdefault("_id", ObjectId())
+            key = (activity["userId"], _bucket_start(activity["timestamp"]))
+            grouped.setdefault(key, []).append(event)
+
+        # A full bucket no longer matches the filter, so the upsert starts a new one
+        await self.db.activity_buckets.bulk_write(
+            [
+                UpdateOne(
+                    {"userId": user_id, "bucketStart": bucket_start, "count": {"$lt": ACTIVITY_BUCKET_MAX_EVENTS}},
+                    {
+                        "$push": {"events": {"$each": events}},
+                        "$addToSet": {"types": {"$each": sorted({e["type"] for e in events})}},
+                        "$inc": {"count": len(events)},
+                        "$min": {"firstTimestamp": min(e["timestamp"] for e in events)},
+                        "$max": {"lastTimestamp": max(e["timestamp"] for e in events)}
+                    },
+                    upsert=True
+                )
+                for (user_id, bucket_start), events in grouped.items()
+            ],
+            ordered=False
+        )
+
+    async def write_activities(self, activities: List[Dict]):
+        await self._write_buckets(activities)
+
+        # One counter update per (day, type) instead of one per activity
+        grouped: Dict[tuple, int] = {}
+        for activity in activities:
+            key = (_day_key(activity["timestamp"]), activity["type"])
+            grouped[key] = grouped.get(key, 0) + 1
+        await self.db.activity_daily_counts.bulk_write(
+            [
+                UpdateOne(*_daily_counter_update(day, activity_type, amount), upsert=True)
+                for (day, activity_type), amount in grouped.items()
+            ],
+            ordered=False
+        )
+
+    async def get_activity_feed(
+        self,
+        limit: int,
+        cursor: Optional[Tuple[datetime, Any]],
+        user_id: Optional[str],
+        activity_type: Optional[str],
+        fields: List[str]
+    ) -> List[Dict]:
+        """Read buckets newest-lastTimestamp first, filtering and projecting events server-side
+
+        Buckets come through the (userId, lastTimestamp) or lastTimestamp index,
+        and the scan stops as soon as no remaining bucket can hold an event
+        newer than the page.
+        """
+        match: Dict[str, Any] = {}
+        event_conditions: List[Dict] = []
+        if user_id:
+            match["userId"] = user_id
+        if activity_type:
+            match["types"] = activity_type
+            event_conditions.append({"$eq": ["$$e.type", activity_type]})
+        if cursor:
+            cursor_time, cursor_id = cursor
+            match["firstTimestamp"] = {"$lte": cursor_time}
+            event_conditions.append({"$or": [
+                {"$lt": ["$$e.timestamp", cursor_time]},
+                {"$and": [{"$eq": ["$$e.timestamp", cursor_time]}, {"$lt": ["$$e._id", cursor_id]}]}
+            ]})
+
+        event_projection = {"_id": "$$e._id", "timestamp": "$$e.timestamp"}
+        event_projection.update({f: f"$$e.{f}" for f in fields if f != "userId"})
+
+        pipeline = [
+            {"$match": match},
+            {"$sort": {"lastTimestamp": DESCENDING}},
+            {"$project": {
+                "_id": 0,
+                "userId": 1,
+                "lastTimestamp": 1,
+                "events": {"$map": {
+                    "input": {"$filter": {"input": "$events", "as": "e", "cond": {"$and": event_conditions}}},
+                    "as": "e",
+                    "in": event_projection
+                }}
+            }}
+        ]
+
+        page: List[Dict] = []
+        buckets = self.db.activity_buckets.aggregate(pipeline)
+        try:
+            async for bucket in buckets:
+                if len(page) >= limit and bucket["lastTimestamp"] < page[limit - 1]["timestamp"]:
+                    break
+                for event in bucket["events"]:
+                    if "userId" in fields:
+                        event["userId"] = bucket["userId"]
+                    page.append(event)
+                page.sort(key=lambda e: (e["timestamp"], e["_id"]), reverse=True)
+                del page[limit:]
+        finally:
+            await buckets.close()
+        return page
+
+    async def get_daily_counts(self, days: List[str]) -> Dict[str, Dict[str, int]]:
+        counters = await self.db.activity_daily_counts.find({"_id": {"$in": days}}).to_list(len(days))
+        return {counter["_id"]: counter.get("counts", {}) for counter in counters}
+
+    async def count_activities_by_type(self, start: datetime, end: datetime) -> Dict[str, int]:
+        """Group bucketed events by type server-side"""
+        result = await self.db.activity_buckets.aggregate([
+            {"$match": {"lastTimestamp": {"$gte": start}, "firstTimestamp": {"$lt": end}}},
+            {"$unwind": "$events"},
+            {"$match": {"events.timestamp": {"$gte": start, "$lt": end}}},
+            {"$group": {"_id": "$events.type", "count": {"$sum": 1}}}
+        ]).to_list(None)
+        return {_counter_field(str(item["_id"])): item["count"] for item in result}
+
+    async def migrate_activity_logs(self, batch_size: int, drop_source: bool) -> int:
+        """Copy the legacy activity_logs collection into hourly buckets
+
+        Progress is checkpointed by _id in the `migrations` collection, so an
+        interrupted run resumes where it stopped (re-applying at most one batch).
+        """
+        checkpoint = await self.db.migrations.find_one({"_id": "activity_buckets"}) or {}
+        query = {"_id": {"$gt": checkpoint["lastId"]}} if "lastId" in checkpoint else {}
+        migrated = 0
+
+        while True:
+            batch = await self.db.activity_logs.find(query).sort("_id", ASCENDING).limit(batch_size).to_list(batch_size)
+            if not batch:
+                break
+
+            await self._write_buckets(batch)
+            last_id = batch[-1]["_id"]
+            await self.db.migrations.update_one(
+                {"_id": "activity_buckets"},
+                {"$set": {"lastId": last_id, "updatedAt": datetime.utcnow()}, "$inc": {"migrated": len(batch)}},
+                upsert=True
+            )
+            query = {"_id": {"$gt": last_id}}
+            migrated += len(batch)
+            logger.info(f"📦 Migrated {migrated} activities into buckets")
+
+        if drop_source:
+            await self.db.activity_logs.drop()
+            logger.info("🗑️ Dropped legacy activity_logs collection")
+
+        return migrated
+
+    # ===== XAI explanations =====
+    async def get_cached_explanation(self, key: str, now: datetime) -> Optional[str]:
+        # The TTL monitor only sweeps every minute, so expiry is also checked here
+        doc = await self.db.xai_explanations.find_one({"_id": key, "expiresAt": {"$gt": now}}, {"explanation": 1})
+        return doc["explanation"] if doc else None
+
+    async def store_cached_explanation(self, key: str, explanation: str, expires_at: datetime):
+        await self.db.xai_explanations.update_one(
+            {"_id": key},
+            {"$set": {"explanation": explanation, "expiresAt": expires_at}},
+            upsert=True
+        )
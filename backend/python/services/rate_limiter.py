@@ -0,0 +1,103 @@
+"""
+In-process token-bucket rate limiter for expensive endpoints
+"""
+
+import os
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from services.metrics import registry as metrics_registry
+
+logger = logging.getLogger(__name__)
+
+metrics_registry.describe("rate_limited_total", "Requests rejected by the per-user rate limiter")
+
+# (requests per minute, burst), or None for unlimited
+Limit = Optional[Tuple[float, float]]
+
+
+class TokenBucket:
+    """Bucket refilled continuously at `rate` tokens per second up to `burst`"""
+
+    __slots__ = ("tokens", "updated_at")
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = burst
+        self.updated_at = now
+
+    def take(self, rate: float, burst: float, cost: float, now: float) -> float:
+        """Take `cost` tokens; return 0 on success or the seconds until they are available"""
+        self.tokens = min(burst, self.tokens + (now - self.updated_at) * rate)
+        self.updated_at = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        if rate <= 0:
+            return 60.0  # Limit configured as zero per minute
+        return (cost - self.tokens) / rate
+
+
+class RateLimiter:
+    """Token buckets keyed by caller and endpoint, with per-role limits
+
+    Buckets live in this process only, so admission costs no database round
+    trip; with several API workers each worker enforces the limits on the
+    requests it receives. The least recently used buckets are dropped past
+    `max_buckets`: an idle bucket has refilled to full, so dropping it
+    loses nothing.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Dict[str, Limit]]] = None, max_buckets: Optional[int] = None):
+        if limits is None:
+            from models import RATE_LIMITS
+            limits = RATE_LIMITS
+        self.limits = limits
+        self.max_buckets = max_buckets or int(os.getenv("RATE_LIMIT_MAX_BUCKETS", "50000"))
+        # The model host only sees worker traffic, already limited per user by the workers
+        self.enabled = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true" and os.getenv("API_ROLE") != "model"
+        self._buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+        self._overrides: Dict[Tuple[str, str], Limit] = {}
+
+    def limit_for(self, endpoint: str, role: str) -> Limit:
+        """The (per minute, burst) limit of a role on an endpoint, unknown roles counting as free"""
+        if role not in self.limits:
+            role = "free"
+
+        key = (endpoint, role)
+        if key not in self._overrides:
+            override = os.getenv(f"RATE_LIMIT_{endpoint.upper()}_{role.upper()}")
+            if override:
+                per_minute, _, burst = override.partition(":")
+                self._overrides[key] = (float(per_minute), float(burst or per_minute))
+            else:
+                self._overrides[key] = self.limits[role].get(endpoint)
+        return self._overrides[key]
+
+    def acquire(self, caller: str, endpoint: str, role: str, cost: float = 1.0) -> float:
+        """Admit a request: 0 if allowed, otherwise the seconds to wait before retrying"""
+        limit = self.limit_for(endpoint, role)
+        if not self.enabled or limit is None:
+            return 0.0
+
+        per_minute, burst = limit
+        # A request larger than the whole bucket is charged a full bucket
+        cost = min(cost, burst)
+        now = time.monotonic()
+        key = (caller, endpoint)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(burst, now)
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+
+        retry_after = bucket.take(per_minute / 60.0, burst, cost, now)
+        if retry_after > 0:
+            metrics_registry.inc("rate_limited_total", (("endpoint", endpoint), ("role", role)))
+        return retry_after
+
+    def __len__(self) -> int:
+        return len(self._buckets)
@@ -0,0 +1,128 @@
+"""
+Client for a model host process, so API workers share one copy of the model weights
+"""
+
+import os
+import asyncio
+import logging
+from typing import Dict, Any, Optional
+
+import httpx
+
+from services.admission import TIMEOUT_HEADER, DeadlineExceeded, Overloaded, remaining_ms
+
+logger = logging.getLogger(__name__)
+
+# Tag marking an encoded numpy array inside an observation
+NDARRAY_TAG = "__ndarray__"
+
+
+def encode_observation(value: Any) -> Any:
+    """Make an observation JSON-safe, tagging numpy arrays so they can be rebuilt"""
+    if isinstance(value, dict):
+        return {str(key): encode_observation(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode_observation(item) for item in value]
+    if hasattr(value, "tolist") and hasattr(value, "dtype"):
+        if getattr(value, "ndim", 0) == 0:
+            return value.item()
+        return {NDARRAY_TAG: value.tolist(), "dtype": str(value.dtype)}
+    return value
+
+
+def decode_observation(value: Any) -> Any:
+    """Inverse of encode_observation (plain JSON passes through unchanged)"""
+    if isinstance(value, dict):
+        if NDARRAY_TAG in value:
+            import numpy as np
+            return np.asarray(value[NDARRAY_TAG], dtype=value.get("dtype"))
+        return {key: decode_observation(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [decode_observation(item) for item in value]
+    return value
+
+
+class RemoteModelService:
+    """ModelService stand-in that forwards inference to the model host
+
+    Used by API workers when MODEL_SERVICE_URL is set: the model host is the
+    only process that imports Ray/torch and holds the weights.
+    """
+
+    def __init__(self, base_url: str, timeout: float = 10.0):
+        self.base_url = base_url.rstrip("/")
+        self.model_path = None
+        self._loaded = False
+        self._info: Dict[str, Any] = {}
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=20)
+        )
+
+    async def initialize(self):
+        """Wait for the model host to finish loading"""
+        wait_seconds = float(os.getenv("MODEL_HOST_WAIT_SECONDS", "600"))
+        deadline = asyncio.get_running_loop().time() + wait_seconds
+        logger.info(f"🔗 Waiting for model host at {self.base_url}...")
+
+        while asyncio.get_running_loop().time() < deadline:
+            try:
+                # The host only answers /model/info once loading has finished
+                response = await self._client.get("/model/info")
+                if response.status_code == 200:
+                    self._info = response.json()["info"]
+                    self._loaded = bool(self._info.get("loaded"))
+                    self.model_path = self._info.get("model_path")
+                    logger.info(f"✅ Model host ready (model {'loaded' if self._loaded else 'not loaded, mock mode'})")
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+
+        logger.warning(f"⚠️ Model host did not become ready within {wait_seconds:.0f}s, running in mock mode")
+
+    def is_loaded(self) -> bool:
+        return self._loaded
+
+    async def predict(self, observations: Dict[str, Any], deadline: Optional[float] = None) -> Dict[str, int]:
+        """Get actions for the observations from the model host
+
+        The deadline travels as the remaining budget, and the host's load
+        shedding surfaces here as Overloaded / DeadlineExceeded.
+        """
+        if not self._loaded:
+            return {
+                "attacker": 0,
+                "defender": 0
+            }
+
+        headers = {}
+        budget_ms = remaining_ms(deadline)
+        if budget_ms is not None:
+            if budget_ms <= 0:
+                raise DeadlineExceeded("Deadline passed before inference")
+            headers[TIMEOUT_HEADER] = str(int(budget_ms))
+
+        try:
+            response = await self._client.post("/model/predict", json=encode_observation(observations), headers=headers)
+            if response.status_code == 503:
+                raise Overloaded("Model host is overloaded", float(response.headers.get("Retry-After", "1")))
+            if response.status_code == 504:
+                raise DeadlineExceeded("Deadline passed while queued on the model host")
+            response.raise_for_status()
+            return response.json()["actions"]
+        except (Overloaded, DeadlineExceeded):
+            raise
+        except Exception as e:
+            logger.error(f"❌ Error during remote prediction: {str(e)}")
+            return {
+                "attacker": 0,
+                "defender": 0
+            }
+
+    def get_info(self) -> Dict[str, Any]:
+        return {**self._info, "remote": self.base_url}
+
+    async def close(self):
+        await self._client.aclose()
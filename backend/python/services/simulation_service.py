@@ -3,8 +3,15 @@ import logging
 from typing import Dict, Any, List, Optional
 import yaml
 
+from services.metrics import PhaseStats, PhaseTimer
+from services.admission import Overloaded, DeadlineExceeded
+from services.action_catalog import get_action_name
+
 logger = logging.getLogger(__name__)
 
+# Step phase timings aggregated across every simulation in this process
+global_step_timings = PhaseStats()
+
 # ANSI color codes for console output
 class Colors:
     RED = '\033[91m'
@@ -32,6 +39,9 @@ class SimulationService:
         self.last_action_ids = {"attacker": 0, "defender": 0}
         self._auto_step_task = None
         self.step_delay = 2.0  # Delay between automatic steps in seconds
+        self.session_timings = PhaseStats()  # Cleared on explicit reset
+        self.last_step_timings: Dict[str, float] = {}
+        self._step_lock = asyncio.Lock()  # Steps of one session never interleave
 
     async def initialize(self):
         """Initialize the simulation service"""
@@ -103,9 +113,16 @@ class SimulationService:
         logger.info(f"📊 Final state - Episode {self._episode_count}, Step {self._step_count}")
         logger.info(f"🏆 Final rewards - {Colors.RED}Attacker: {self.agent_rewards['attacker']:.2f}{Colors.RESET}, {Colors.BLUE}Defender: {self.agent_rewards['defender']:.2f}{Colors.RESET}")
 
-    async def reset(self):
-        """Reset simulation"""
+    async def reset(self, clear_timings: bool = True):
+        """Reset simulation (waits for a step in progress, which shares the env)"""
+        async with self._step_lock:
+            await self._reset(clear_timings)
+
+    async def _reset(self, clear_timings: bool = True):
+        """Reset with the step lock already held"""
         logger.info("🔄 Resetting simulation...")
+        if clear_timings:
+            self.session_timings.reset()
         self._running = False
         self._step_count = 0
         self._episode_count += 1
@@ -131,8 +148,11 @@ class SimulationService:
         logger.info("🔄 Auto-step loop running...")
         try:
             while self._running:
-                # Execute a step
-                await self.step()
+                # Execute a step (skipped, not fatal, when inference sheds it)
+                try:
+                    await self.step()
+                except (Overloaded, DeadlineExceeded) as e:
+                    logger.warning(f"⚠️ Auto-step skipped: {str(e)}")
 
                 # Wait before next step
                 await asyncio.sleep(self.step_delay)
@@ -142,8 +162,17 @@ class SimulationService:
             logger.error(f"❌ Error in auto-step loop: {str(e)}")
             self._running = False
 
-    async def step(self) -> Dict[str, Any]:
-        """Execute one simulation step"""
+    async def step(self, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Execute one simulation step
+
+        `deadline` (time.monotonic()) is passed on to inference; a shed
+        inference raises Overloaded / DeadlineExceeded without advancing
+        the simulation.
+        """
+        async with self._step_lock:
+            return await self._step(deadline)
+
+    async def _step(self, deadline: Optional[float]) -> Dict[str, Any]:
         self._step_count += 1
 
         logger.info("=" * 60)
@@ -152,13 +181,19 @@ class SimulationService:
 
         events = []
         node_states = {}
+        timer = PhaseTimer()
 
         if self.env and self.current_obs:
             try:
                 logger.info(f"📥 Getting actions from {'model' if self.model_service.is_loaded() else 'mock mode'}...")
 
                 # Get actions from model
-                actions = await self.model_service.predict(self.current_obs)
+                try:
+                    actions = await self.model_service.predict(self.current_obs, deadline)
+                except (Overloaded, DeadlineExceeded):
+                    self._step_count -= 1
+                    raise
+                timer.lap("inference")
                 logger.info(f"🎯 Actions: {actions}")
 
                 # Store and decode actions for each agent
@@ -180,9 +215,12 @@ class SimulationService:
 
                     logger.info(f"{color}  {agent_id} ({role}) → {action_name} (action {action_id_int}){Colors.RESET}")
 
+                timer.lap("decode")
+
                 # Step environment
                 logger.info("⚙️  Executing environment step...")
-                step_result = self.env.step(actions)
+                # Off the event loop, so requests can still be admitted or shed meanwhile
+                step_result = await self._run_in_executor(self.env.step, actions)
 
                 # Handle both gym and gymnasium formats
                 if len(step_result) == 4:
@@ -195,6 +233,7 @@ class SimulationService:
                     raise ValueError(f"Unexpected step result format")
 
                 self.current_obs = obs
+                timer.lap("env_step")
 
                 # Update rewards
                 logger.info("💰 Processing rewards:")
@@ -215,6 +254,7 @@ class SimulationService:
                             color = Colors.GREEN
 
                         logger.info(f"{color}  {agent_id}: {old_reward:.2f} + {reward_float:.2f} = {self.agent_rewards[role]:.2f}{Colors.RESET}")
+                timer.lap("rewards")
 
                 # Generate events from actions
                 logger.info("📋 Generating events:")
@@ -240,12 +280,14 @@ class SimulationService:
                         "severity": severity,
                         "description": f"{agent_id} executed {action_name}"
                     })
+                timer.lap("events")
 
                 # Check if episode ended
                 if dones.get("__all__", False):
                     logger.info("🏁 Episode ended!")
                     logger.info(f"📊 Final episode rewards - {Colors.RED}Attacker: {self.agent_rewards['attacker']:.2f}{Colors.RESET}, {Colors.BLUE}Defender: {self.agent_rewards['defender']:.2f}{Colors.RESET}")
-                    await self.reset()
+                    await self._reset(clear_timings=False)
+                    timer.lap("reset")
                     events.append({
                         "type": "system",
                         "agent": "system",
@@ -258,13 +300,15 @@ class SimulationService:
                 logger.info(f"🎯 Cumulative rewards - {Colors.RED}Attacker: {self.agent_rewards['attacker']:.2f}{Colors.RESET}, {Colors.BLUE}Defender: {self.agent_rewards['defender']:.2f}{Colors.RESET}")
                 logger.info("")
 
+            except (Overloaded, DeadlineExceeded):
+                raise
             except Exception as e:
                 logger.error(f"Error during step: {str(e)}")
                 # Fallback to mock step
-                return await self._mock_step()
+                return await self._mock_step(timer)
         else:
             # Mock step
-            return await self._mock_step()
+            return await self._mock_step(timer)
 
         return {
             "step": int(self._step_count),
@@ -279,15 +323,55 @@ class SimulationService:
                 }
             },
             "events": events,
-            "node_states": node_states
+            "node_states": node_states,
+            "timings": self._record_timings(timer)
+        }
+
+    @staticmethod
+    async def _run_in_executor(fn, *args):
+        """Run `fn` in a thread; a cancelled caller still waits for it to finish
+
+        The thread cannot be interrupted, so returning early would release the
+        step lock while it is still mutating the env (e.g. stop() cancelling
+        the auto-step loop mid-step).
+        """
+        future = asyncio.get_running_loop().run_in_executor(None, fn, *args)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            while not future.done():
+                try:
+                    await asyncio.wait([future])
+                except asyncio.CancelledError:
+                    pass
+            if not future.cancelled():
+                future.exception()  # Retrieved: the cancellation is what propagates
+            raise
+
+    def _record_timings(self, timer: PhaseTimer) -> Dict[str, float]:
+        """Aggregate a finished step's phase breakdown into session and global stats"""
+        breakdown = timer.breakdown()
+        self.last_step_timings = breakdown
+        self.session_timings.record(breakdown)
+        global_step_timings.record(breakdown)
+        return breakdown
+
+    def get_timings(self) -> Dict[str, Any]:
+        """Get the last step's phase breakdown and the aggregated histograms"""
+        return {
+            "last_step": self.last_step_timings,
+            "session": self.session_timings.snapshot(),
+            "global": global_step_timings.snapshot()
         }
 
-    async def _mock_step(self) -> Dict[str, Any]:
+    async def _mock_step(self, timer: Optional[PhaseTimer] = None) -> Dict[str, Any]:
         """Execute a mock simulation step for testing without Primaite"""
         import random
 
         logger.info("🎲 Running in MOCK MODE (Primaite not available)")
 
+        timer = timer or PhaseTimer()
+
         # Mock actions
         attacker_action = random.randint(0, 3)
         defender_action = random.randint(0, 5)
@@ -336,6 +420,7 @@ class SimulationService:
                 "description": f"Defender executed {defender_action_name}"
             }
         ]
+        timer.lap("mock")
 
         return {
             "step": int(self._step_count),
@@ -350,7 +435,8 @@ class SimulationService:
                 }
             },
             "events": events,
-            "node_states": {}
+            "node_states": {},
+            "timings": self._record_timings(timer)
         }
 
     def _generate_mock_obs(self) -> Dict[str, Any]:
@@ -363,115 +449,7 @@ class SimulationService:
 
     def _get_action_name(self, agent_type: str, action_id: int) -> str:
         """Get human-readable action name - extracted from v3.yaml"""
-        if agent_type == "attacker":
-            action_names = {
-                0: "do-nothing",
-                1: "data-manipulation-bot (client_1)",
-                2: "dos-bot (client_1)",
-                3: "ransomware-script (client_1)",
-                4: "data-manipulation-bot (client_2)",
-                5: "dos-bot (client_2)",
-                6: "ransomware-script (client_2)",
-                7: "remote-command [cat /etc/passwd]",
-                8: "configure-ransomware (client_1)",
-                9: "configure-c2-beacon (client_1)",
-                10: "configure-database-client (client_1)",
-                11: "configure-dos-bot (client_1)",
-                12: "c2-server-ransomware-launch",
-                13: "c2-server-terminal-command",
-                14: "c2-server-data-exfiltrate",
-                15: "c2-server-ransomware-configure",
-                16: "corrupt-file (database.db)",
-            }
-        else:  # defender - all 84 actions from v3.yaml
-            action_names = {
-                0: "do-nothing",
-                1: "scan-service (web_server)",
-                2: "stop-service (web_server)",
-                3: "start-service (web_server)",
-                4: "pause-service (web_server)",
-                5: "resume-service (web_server)",
-                6: "restart-service (web_server)",
-                7: "disable-service (web_server)",
-                8: "enable-service (web_server)",
-                9: "scan-file (database.db)",
-                10: "scan-file (database.db)",
-                11: "delete-file (database.db)",
-                12: "repair-file (database.db)",
-                13: "fix-service (database_server)",
-                14: "scan-folder (database)",
-                15: "scan-folder (database)",
-                16: "repair-folder (database)",
-                17: "restore-folder (database)",
-                18: "scan-os (domain_controller)",
-                19: "shutdown (domain_controller)",
-                20: "startup (domain_controller)",
-                21: "reset (domain_controller)",
-                22: "scan-os (web_server)",
-                23: "shutdown (web_server)",
-                24: "startup (web_server)",
-                25: "reset (web_server)",
-                26: "scan-os (database_server)",
-                27: "shutdown (database_server)",
-                28: "startup (database_server)",
-                29: "reset (database_server)",
-                30: "scan-os (backup_server)",
-                31: "shutdown (backup_server)",
-                32: "startup (backup_server)",
-                33: "reset (backup_server)",
-                34: "scan-os (security_suite)",
-                35: "shutdown (security_suite)",
-                36: "startup (security_suite)",
-                37: "reset (security_suite)",
-                38: "scan-os (client_1)",
-                39: "shutdown (client_1)",
-                40: "startup (client_1)",
-                41: "reset (client_1)",
-                42: "scan-os (client_2)",
-                43: "shutdown (client_2)",
-                44: "startup (client_2)",
-                45: "reset (client_2)",
-                46: "add-acl-rule [pos0]",
-                47: "add-acl-rule [pos1]",
-                48: "add-acl-rule [pos2]",
-                49: "add-acl-rule [pos3]",
-                50: "add-acl-rule [pos4]",
-                51: "add-acl-rule [pos5]",
-                52: "remove-acl-rule [pos0]",
-                53: "remove-acl-rule [pos1]",
-                54: "remove-acl-rule [pos2]",
-                55: "remove-acl-rule [pos3]",
-                56: "remove-acl-rule [pos4]",
-                57: "remove-acl-rule [pos5]",
-                58: "remove-acl-rule [pos6]",
-                59: "remove-acl-rule [pos7]",
-                60: "remove-acl-rule [pos8]",
-                61: "remove-acl-rule [pos9]",
-                62: "disable-nic (domain_controller)",
-                63: "enable-nic (domain_controller)",
-                64: "disable-nic (web_server)",
-                65: "enable-nic (web_server)",
-                66: "disable-nic (database_server)",
-                67: "enable-nic (database_server)",
-                68: "disable-nic (backup_server)",
-                69: "enable-nic (backup_server)",
-                70: "disable-nic (security_suite)",
-                71: "enable-nic (security_suite)",
-                72: "disable-nic2 (security_suite)",
-                73: "enable-nic2 (security_suite)",
-                74: "disable-nic (client_1)",
-                75: "enable-nic (client_1)",
-                76: "disable-nic (client_2)",
-                77: "enable-nic (client_2)",
-                78: "scan-app [web-browser] (client_1)",
-                79: "scan-app [web-browser] (client_2)",
-                80: "close-app [data-manip-bot] (client_1)",
-                81: "close-app [data-manip-bot] (client_2)",
-                82: "add-acl-rule [pos6]",
-                83: "add-acl-rule [pos7]",
-            }
-
-        return action_names.get(action_id, f"action-{action_id}")
+        return get_action_name(agent_type, action_id)
 
     def _determine_severity(self, action_name: str) -> str:
         """Determine severity level based on action"""
@@ -0,0 +1,147 @@
+"""
+Per-session simulations held by one API worker
+"""
+
+import os
+import asyncio
+import logging
+import jwt
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from services.simulation_service import SimulationService
+
+logger = logging.getLogger(__name__)
+
+# Session used by callers that do not send a session id
+DEFAULT_SESSION = "default"
+
+# Where requests carry their session id (the worker router reads the same ones)
+SESSION_HEADER = "X-Session-Id"
+SESSION_QUERY = "session_id"
+
+
+def session_id_from(headers, query_params) -> str:
+    """Session id of a request, from its header or query string"""
+    return headers.get(SESSION_HEADER) or query_params.get(SESSION_QUERY) or DEFAULT_SESSION
+
+
+def scoped_session_id(user_id: Optional[str], session_id: str) -> str:
+    """Session key namespaced by its owner, so callers cannot reach each other's sessions
+
+    Anonymous callers all share the default session.
+    """
+    if not user_id:
+        return DEFAULT_SESSION
+    return f"{user_id}/{session_id}"
+
+
+def token_subject(headers) -> Optional[str]:
+    """User id claimed by a request's JWT, without verifying it
+
+    Only for routing: the worker verifies the token before serving the
+    session, so a forged token merely lands on another worker. Mock
+    `user:` tokens count as anonymous.
+    """
+    auth_header = headers.get("Authorization", "")
+    if not auth_header.startswith("Bearer "):
+        return None
+    try:
+        payload = jwt.decode(auth_header.split("Bearer ")[1], options={"verify_signature": False})
+    except jwt.InvalidTokenError:
+        return None
+    user_id = payload.get("sub") or payload.get("user_id") or payload.get("id")
+    return str(user_id) if user_id else None
+
+
+def _owner(session_id: str) -> Optional[str]:
+    return session_id.split("/", 1)[0] if "/" in session_id else None
+
+
+class SessionLimitReached(Exception):
+    """Raised when every session slot holds a running simulation"""
+
+
+class SimulationSessions:
+    """Simulations keyed by session id, created on first use
+
+    The worker router pins each session id to one worker, so a session's
+    environment and state only ever live in one process. When the worker is
+    full, the least recently used stopped session is dropped; a user at their
+    own limit gives up one of their own stopped sessions instead.
+    """
+
+    def __init__(self, model_service, config_path: str, max_sessions: Optional[int] = None,
+                 max_sessions_per_user: Optional[int] = None):
+        self.model_service = model_service
+        self.config_path = config_path
+        self.max_sessions = max_sessions or int(os.getenv("SIMULATION_MAX_SESSIONS", "16"))
+        self.max_sessions_per_user = max_sessions_per_user or int(os.getenv("SIMULATION_MAX_SESSIONS_PER_USER", "4"))
+        self._sessions: "OrderedDict[str, SimulationService]" = OrderedDict()
+        self._creating: Dict[str, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def peek(self, session_id: str = DEFAULT_SESSION) -> Optional[SimulationService]:
+        """An existing session, without creating it"""
+        return self._sessions.get(session_id)
+
+    def running_count(self) -> int:
+        return sum(1 for simulation in self._sessions.values() if simulation.is_running())
+
+    def _evict_one(self, owner: Optional[str] = None):
+        for session_id, simulation in self._sessions.items():
+            if owner is not None and _owner(session_id) != owner:
+                continue
+            if session_id != DEFAULT_SESSION and not simulation.is_running():
+                del self._sessions[session_id]
+                logger.info(f"🧹 Dropped idle simulation session {session_id}")
+                return
+        if owner is not None:
+            raise SessionLimitReached(f"All {self.max_sessions_per_user} of your simulation sessions are running")
+        raise SessionLimitReached(f"All {self.max_sessions} simulation sessions are running")
+
+    async def get(self, session_id: str = DEFAULT_SESSION) -> SimulationService:
+        """The session's simulation, initializing it on first use"""
+        simulation = self._sessions.get(session_id)
+        if simulation is not None:
+            self._sessions.move_to_end(session_id)
+            return simulation
+
+        # Concurrent first requests for a session share one initialization
+        pending = self._creating.get(session_id)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._creating[session_id] = future
+        try:
+            owner = _owner(session_id)
+            if owner is not None and sum(1 for key in self._sessions if _owner(key) == owner) >= self.max_sessions_per_user:
+                self._evict_one(owner)
+            if len(self._sessions) >= self.max_sessions:
+                self._evict_one()
+
+            simulation = SimulationService(self.model_service, self.config_path)
+            await simulation.initialize()
+            self._sessions[session_id] = simulation
+            logger.info(f"🎮 Created simulation session {session_id} ({len(self._sessions)}/{self.max_sessions})")
+            future.set_result(simulation)
+            return simulation
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception retrieved when nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            del self._creating[session_id]
+
+    async def stop_all(self):
+        """Stop every running simulation loop"""
+        for simulation in self._sessions.values():
+            if simulation.is_running():
+                await simulation.stop()
@@ -0,0 +1,149 @@
+"""
+Storage backend interface behind DBService
+"""
+
+import os
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Optional, Dict, List, Any, Tuple
+
+
+class PoolStats:
+    """Connection pool usage counters (always zero for backends without a pool)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()  # Driver events may arrive on other threads
+        self.open_connections = 0
+        self.checked_out = 0
+        self.checkout_failures = 0
+
+    def _add(self, field: str, amount: int):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + amount)
+
+
+class StorageBackend(ABC):
+    """Storage operations DBService needs, implemented once per database
+
+    Backends raise on failure; DBService owns logging, fallbacks and caching.
+    Activities are stored as per-user hourly buckets and counted in per-day
+    counter documents (see services.db_service for the shared helpers).
+    A backend missing any abstract method fails when it is instantiated.
+    """
+
+    name = "base"
+
+    def __init__(self, pool_stats: Optional[PoolStats] = None):
+        self.pool_stats = pool_stats or PoolStats()
+
+    @abstractmethod
+    async def connect(self) -> bool:
+        """Open the backend and create its indexes; returns whether it is usable"""
+
+    @abstractmethod
+    async def disconnect(self):
+        """Release the backend's resources"""
+
+    def get_pool_max_size(self) -> int:
+        """Get the configured maximum connection pool size"""
+        return 0
+
+    # ===== Users =====
+    @abstractmethod
+    async def get_user(self, user_id: str, projection: Optional[Dict] = None) -> Optional[Dict]:
+        """Get a user by id, optionally loading only the projected fields"""
+
+    @abstractmethod
+    async def find_user(self, field: str, value: Any) -> Optional[Dict]:
+        """Get a user by a uniquely indexed field (email or username)"""
+
+    @abstractmethod
+    async def insert_user(self, user_data: Dict) -> str:
+        """Insert a user document; returns its id"""
+
+    @abstractmethod
+    async def update_user(self, user_id: str, fields: Dict) -> bool:
+        """Set fields on a user; returns whether anything changed"""
+
+    @abstractmethod
+    async def increment_usage(
+        self,
+        user_id: str,
+        usage_key: str,
+        increment: int,
+        current_time: datetime
+    ) -> Optional[Tuple[Dict, bool]]:
+        """Atomically apply the daily reset, enforce the limit and increment usage
+
+        Returns (user, allowed) with the role/usage/usageResetTime fields, or
+        None if the user does not exist.
+        """
+
+    @abstractmethod
+    async def count_users(self) -> int:
+        """Count all users"""
+
+    @abstractmethod
+    async def count_users_by_role(self) -> Dict[str, int]:
+        """Count users per role"""
+
+    @abstractmethod
+    async def backfill_activity_scores(self, recompute: bool = False) -> int:
+        """Set activityScore on users missing it (or on all users); returns the number updated"""
+
+    @abstractmethod
+    async def get_top_users(self, limit: int) -> List[Dict]:
+        """Get the `limit` users with the highest activityScore, projected for display"""
+
+    # ===== Activities =====
+    @abstractmethod
+    async def write_activities(self, activities: List[Dict]):
+        """Append activities to their buckets and bump the per-day counters"""
+
+    @abstractmethod
+    async def get_activity_feed(
+        self,
+        limit: int,
+        cursor: Optional[Tuple[datetime, Any]],
+        user_id: Optional[str],
+        activity_type: Optional[str],
+        fields: List[str]
+    ) -> List[Dict]:
+        """Get up to `limit` events, newest first, strictly after the keyset cursor"""
+
+    @abstractmethod
+    async def get_daily_counts(self, days: List[str]) -> Dict[str, Dict[str, int]]:
+        """Get the per-type counts of the given day counter documents that exist"""
+
+    @abstractmethod
+    async def count_activities_by_type(self, start: datetime, end: datetime) -> Dict[str, int]:
+        """Count activities per type in [start, end)"""
+
+    @abstractmethod
+    async def migrate_activity_logs(self, batch_size: int, drop_source: bool) -> int:
+        """Copy the legacy per-event activity logs into buckets; returns the number migrated"""
+
+    # ===== XAI explanations =====
+    @abstractmethod
+    async def get_cached_explanation(self, key: str, now: datetime) -> Optional[str]:
+        """Get a stored explanation that has not expired"""
+
+    @abstractmethod
+    async def store_cached_explanation(self, key: str, explanation: str, expires_at: datetime):
+        """Store an explanation until `expires_at`"""
+
+
+def create_backend(connection_string: Optional[str] = None) -> StorageBackend:
+    """Build the backend selected by STORAGE_BACKEND ("mongo" or "memory")"""
+    kind = os.getenv("STORAGE_BACKEND", "mongo").lower()
+
+    if kind == "memory":
+        from services.memory_backend import MemoryBackend
+        return MemoryBackend()
+
+    if kind != "mongo":
+        raise ValueError(f"Unknown STORAGE_BACKEND: {kind}")
+
+    from services.mongo_backend import MongoBackend
+    return MongoBackend(connection_string or os.getenv("MONGODB_URI"))
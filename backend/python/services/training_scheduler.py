@@ -0,0 +1,487 @@
+"""
+Training job scheduler: a persistent priority queue that runs train_network.py within the machine's cores
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import signal
+import asyncio
+import logging
+import subprocess
+from typing import Any, Dict, List, Optional
+
+from models import TRAINING_PRIORITIES
+from services.metrics import registry as metrics_registry
+from training_metrics import MetricsReader, summarize
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRAIN_SCRIPT = os.path.join(APP_DIR, "train_network.py")
+UPLOADS_DIR = os.path.join(os.path.dirname(APP_DIR), "express", "uploads")
+
+# Training ids name the job's output directory under TRAINING_OUTPUT_ROOT
+TRAINING_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+
+QUEUED = "queued"
+RUNNING = "running"
+CANCELLING = "cancelling"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE_STATUSES = (QUEUED, RUNNING, CANCELLING)
+
+ALGORITHMS = ("PPO", "DQN")
+
+# Progress fields copied from the run's metrics summary into the job record
+PROGRESS_FIELDS = ("episode", "target_episodes", "iteration", "last_reward", "mean_length", "policies", "last_checkpoint", "updated_at")
+
+metrics_registry.describe("training_jobs_submitted_total", "Training jobs submitted, by user role")
+metrics_registry.describe("training_jobs_finished_total", "Training jobs finished, by final status")
+metrics_registry.describe("training_job_queue_wait_ms", "Time training jobs waited in the queue before starting")
+
+
+class TrainingQueueFull(Exception):
+    """The user already has the maximum number of queued or running jobs"""
+
+
+class JobNotFound(Exception):
+    pass
+
+
+def available_cores() -> int:
+    """Cores training may use: TRAINING_CORES, else the CPU count minus TRAINING_RESERVED_CORES"""
+    configured = os.getenv("TRAINING_CORES")
+    if configured:
+        return max(1, int(configured))
+    reserved = int(os.getenv("TRAINING_RESERVED_CORES", "1"))
+    return max(1, (os.cpu_count() or 1) - reserved)
+
+
+def _is_within(path: str, root: str) -> bool:
+    return os.path.commonpath([path, root]) == root
+
+
+def _write_json_atomic(path: str, data: Any):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class TrainingScheduler:
+    """Runs queued training jobs as train_network.py processes without oversubscribing the CPU
+
+    A job needs one core per rollout worker plus one for its driver. Jobs
+    start in priority order (by role, see TRAINING_PRIORITIES) while their
+    cores are free; a smaller job may start ahead of a bigger one that does
+    not fit yet, unless the bigger one has waited TRAINING_AGING_SECONDS, in
+    which case cores are held for it. Waiting also raises a job's priority,
+    so free-tier jobs cannot starve.
+
+    The queue is saved to TRAINING_JOBS_FILE after every change. Jobs that
+    were running when the API stopped are queued again and resume from
+    their latest checkpoint.
+    """
+
+    def __init__(
+        self,
+        store_path: Optional[str] = None,
+        total_cores: Optional[int] = None,
+        poll_interval: Optional[float] = None
+    ):
+        self.store_path = store_path or os.getenv(
+            "TRAINING_JOBS_FILE", os.path.join(APP_DIR, ".cache", "training_jobs.json")
+        )
+        # Jobs only read configurations from the uploads and only write under the output root
+        self.uploads_root = os.path.realpath(os.getenv("TRAINING_UPLOADS_ROOT", UPLOADS_DIR))
+        self.output_root = os.path.realpath(os.getenv("TRAINING_OUTPUT_ROOT", os.path.join(UPLOADS_DIR, "training")))
+        self.total_cores = total_cores or available_cores()
+        self.poll_interval = poll_interval or float(os.getenv("TRAINING_POLL_SECONDS", "2.0"))
+        self.aging_seconds = float(os.getenv("TRAINING_AGING_SECONDS", "900"))
+        self.cancel_grace = float(os.getenv("TRAINING_CANCEL_GRACE_SECONDS", "60"))
+        self.max_active_per_user = int(os.getenv("TRAINING_MAX_ACTIVE_PER_USER", "3"))
+        self.default_workers = int(os.getenv("TRAINING_DEFAULT_WORKERS", str(min(4, self.total_cores - 1))))
+        self.keep_finished = int(os.getenv("TRAINING_KEEP_FINISHED", "200"))
+        self.python = os.getenv("TRAINING_PYTHON") or sys.executable
+        self.pythonpath = os.getenv("TRAINING_PYTHONPATH")
+
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._processes: Dict[str, subprocess.Popen] = {}
+        self._readers: Dict[str, MetricsReader] = {}
+        self._progress: Dict[str, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        metrics_registry.register_gauge("training_jobs_queued", lambda: self._count(QUEUED), "Training jobs waiting for cores")
+        metrics_registry.register_gauge("training_jobs_running", lambda: self._count(RUNNING, CANCELLING), "Training jobs running")
+        metrics_registry.register_gauge("training_cores_in_use", self.cores_in_use, "Cores held by running training jobs")
+
+    # ---- Lifecycle ----
+
+    async def start(self):
+        """Load the saved queue and start the monitor loop"""
+        self._load()
+        self._dispatch()
+        self._save()
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"🏋️ Training scheduler started ({self.total_cores} cores, "
+            f"{self._count(QUEUED)} queued, {self._count(RUNNING)} running)"
+        )
+
+    async def stop(self):
+        """Stop the monitor loop and interrupt running jobs; they resume on the next start"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        running = list(self._processes.items())
+        for _, process in running:
+            self._interrupt(process)
+        # Give jobs a moment to write their metadata and release Ray before the API exits
+        deadline = time.monotonic() + float(os.getenv("TRAINING_SHUTDOWN_GRACE_SECONDS", "10"))
+        loop = asyncio.get_running_loop()
+        for job_id, process in running:
+            try:
+                await loop.run_in_executor(None, process.wait, max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                process.kill()
+            if self.jobs[job_id]["status"] == CANCELLING:
+                self._finish(self.jobs[job_id], CANCELLED, process.returncode)
+        self._processes.clear()
+        self._save()
+        if running:
+            logger.info(f"🏋️ Training scheduler stopped, {len(running)} job(s) will resume on restart")
+
+    # ---- Public API ----
+
+    def submit(self, user_id: str, role: Optional[str], request: Dict[str, Any]) -> Dict[str, Any]:
+        """Queue a training job; raises ValueError for a bad request and TrainingQueueFull past the per-user limit"""
+        role = role if role in TRAINING_PRIORITIES else "free"
+        algorithm = (request.get("algorithm") or "PPO").upper()
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown algorithm: {request.get('algorithm')}")
+        config_path = os.path.realpath(request["config_path"])
+        if not _is_within(config_path, self.uploads_root) or not os.path.isfile(config_path):
+            raise ValueError(f"Configuration file not found: {request['config_path']}")
+        training_id = request["training_id"]
+        if not TRAINING_ID_PATTERN.match(training_id):
+            raise ValueError(f"Invalid training id: {training_id}")
+        output_dir = os.path.join(self.output_root, training_id)
+        # A finished job's id may be submitted again, e.g. to retry a failed training
+        if any(job["output_dir"] == output_dir and job["status"] in ACTIVE_STATUSES for job in self.jobs.values()):
+            raise ValueError(f"Training {training_id} already has an active job")
+
+        active = sum(1 for job in self.jobs.values() if job["user_id"] == user_id and job["status"] in ACTIVE_STATUSES)
+        if role != "admin" and active >= self.max_active_per_user:
+            raise TrainingQueueFull(f"At most {self.max_active_per_user} training jobs can be queued or running per user")
+
+        workers = request.get("num_rollout_workers")
+        workers = self.default_workers if workers is None else workers
+        # A job bigger than the machine would never start
+        workers = max(0, min(int(workers), self.total_cores - 1))
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "user_id": user_id,
+            "role": role,
+            "priority": TRAINING_PRIORITIES[role],
+            "status": QUEUED,
+            "network_id": request.get("network_id"),
+            "network_name": request.get("network_name"),
+            "training_id": training_id,
+            "config_path": config_path,
+            "output_dir": output_dir,
+            "episodes": int(request.get("episodes") or 1000),
+            "save_frequency": int(request.get("save_frequency") or 10),
+            "algorithm": algorithm,
+            "num_rollout_workers": workers,
+            "num_envs_per_worker": int(request.get("num_envs_per_worker") or 1),
+            "cpu_only": bool(request.get("cpu_only")),
+            "cores": workers + 1,
+            "resume": False,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "pid": None,
+            "exit_code": None,
+            "error": None,
+            "attempts": 0,
+            "progress": None,
+        }
+        self.jobs[job["id"]] = job
+        metrics_registry.inc("training_jobs_submitted_total", (("role", role),))
+        logger.info(f"📥 Training job {job['id']} queued for {user_id} ({role}, {job['cores']} cores)")
+
+        self._dispatch()
+        self._save()
+        return self.describe(job)
+
+    def cancel(self, job_id: str) -> Dict[str, Any]:
+        """Cancel a queued job, or interrupt a running one (killed after TRAINING_CANCEL_GRACE_SECONDS)"""
+        job = self._get(job_id)
+        if job["status"] == QUEUED:
+            self._finish(job, CANCELLED)
+            self._save()
+        elif job["status"] == RUNNING:
+            job["status"] = CANCELLING
+            job["cancel_requested_at"] = time.time()
+            process = self._processes.get(job_id)
+            if process:
+                self._interrupt(process)
+            self._save()
+            logger.info(f"🛑 Cancelling training job {job_id}")
+        return self.describe(job)
+
+    def get(self, job_id: str) -> Dict[str, Any]:
+        return self.describe(self._get(job_id))
+
+    def list_jobs(self, user_id: Optional[str] = None, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Jobs newest first, optionally for one user and/or status"""
+        jobs = [
+            job for job in self.jobs.values()
+            if (user_id is None or job["user_id"] == user_id) and (status is None or job["status"] == status)
+        ]
+        return [self.describe(job) for job in sorted(jobs, key=lambda j: j["created_at"], reverse=True)]
+
+    def capacity(self) -> Dict[str, int]:
+        in_use = self.cores_in_use()
+        return {
+            "total_cores": self.total_cores,
+            "cores_in_use": in_use,
+            "cores_free": self.total_cores - in_use,
+            "queued": self._count(QUEUED),
+            "running": self._count(RUNNING, CANCELLING),
+        }
+
+    def describe(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Job record with its place in the queue"""
+        result = dict(job)
+        if job["status"] == QUEUED:
+            order = self._queue_order(time.time())
+            result["queue_position"] = next(i for i, queued in enumerate(order) if queued["id"] == job["id"]) + 1
+        return result
+
+    def cores_in_use(self) -> int:
+        return sum(job["cores"] for job in self.jobs.values() if job["status"] in (RUNNING, CANCELLING))
+
+    # ---- Scheduling ----
+
+    def _count(self, *statuses: str) -> int:
+        return sum(1 for job in self.jobs.values() if job["status"] in statuses)
+
+    def _get(self, job_id: str) -> Dict[str, Any]:
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise JobNotFound(job_id)
+        return job
+
+    def _effective_priority(self, job: Dict[str, Any], now: float) -> int:
+        """Role priority, raised one level per TRAINING_AGING_SECONDS waited"""
+        if self.aging_seconds <= 0:
+            return job["priority"]
+        return max(0, job["priority"] - int((now - job["created_at"]) / self.aging_seconds))
+
+    def _queue_order(self, now: float) -> List[Dict[str, Any]]:
+        queued = [job for job in self.jobs.values() if job["status"] == QUEUED]
+        return sorted(queued, key=lambda job: (self._effective_priority(job, now), job["created_at"]))
+
+    def _dispatch(self):
+        """Start queued jobs in order while their cores are free"""
+        now = time.time()
+        free = self.total_cores - self.cores_in_use()
+        for job in self._queue_order(now):
+            if job["cores"] <= free:
+                if self._launch(job):
+                    free -= job["cores"]
+            elif self.aging_seconds > 0 and now - job["created_at"] >= self.aging_seconds:
+                # Hold the free cores for a job that has waited long enough instead of backfilling
+                break
+
+    def _command(self, job: Dict[str, Any]) -> List[str]:
+        command = [
+            self.python, TRAIN_SCRIPT,
+            "--config", job["config_path"],
+            "--output", job["output_dir"],
+            "--episodes", str(job["episodes"]),
+            "--save-frequency", str(job["save_frequency"]),
+            "--algorithm", job["algorithm"],
+            "--num-rollout-workers", str(job["num_rollout_workers"]),
+            "--num-envs-per-worker", str(job["num_envs_per_worker"]),
+            "--num-cpus", str(job["cores"]),
+            "--metrics-file", self._metrics_path(job),
+        ]
+        if job["cpu_only"]:
+            command.append("--cpu-only")
+        if job["resume"]:
+            command.append("--resume")
+        return command
+
+    @staticmethod
+    def _metrics_path(job: Dict[str, Any]) -> str:
+        return os.path.join(job["output_dir"], "metrics.jsonl")
+
+    def _launch(self, job: Dict[str, Any]) -> bool:
+        env = dict(os.environ)
+        env["PYTHONUNBUFFERED"] = "1"
+        if self.pythonpath:
+            env["PYTHONPATH"] = os.pathsep.join(filter(None, [self.pythonpath, env.get("PYTHONPATH")]))
+
+        try:
+            os.makedirs(job["output_dir"], exist_ok=True)
+            with open(os.path.join(job["output_dir"], "train.log"), "ab") as log_file:
+                kwargs = {}
+                if os.name == "nt":
+                    kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+                else:
+                    # Ctrl+C on the API must not interrupt jobs; stop() does that itself
+                    kwargs["start_new_session"] = True
+                process = subprocess.Popen(
+                    self._command(job),
+                    cwd=APP_DIR,
+                    env=env,
+                    stdout=log_file,
+                    stderr=subprocess.STDOUT,
+                    **kwargs
+                )
+        except OSError as e:
+            logger.error(f"❌ Could not start training job {job['id']}: {str(e)}")
+            self._finish(job, FAILED, error=str(e))
+            return False
+
+        now = time.time()
+        if job["started_at"] is None:
+            metrics_registry.observe("training_job_queue_wait_ms", (now - job["created_at"]) * 1000)
+        job.update({"status": RUNNING, "started_at": job["started_at"] or now, "pid": process.pid})
+        job["attempts"] += 1
+        self._processes[job["id"]] = process
+        # Resumed runs append to the same file: only read what this attempt writes
+        reader = MetricsReader(self._metrics_path(job))
+        reader.offset = os.path.getsize(reader.path) if os.path.exists(reader.path) else 0
+        self._readers[job["id"]] = reader
+        logger.info(f"🚀 Training job {job['id']} started (pid {process.pid}, {job['cores']} cores)")
+        return True
+
+    @staticmethod
+    def _interrupt(process: subprocess.Popen):
+        """Ask train_network.py to stop: SIGINT raises KeyboardInterrupt so it records its status
+
+        Windows has no SIGINT for other process groups; Ctrl+Break ends the job there.
+        """
+        if process.poll() is not None:
+            return
+        try:
+            if os.name == "nt":
+                process.send_signal(signal.CTRL_BREAK_EVENT)
+            else:
+                process.send_signal(signal.SIGINT)
+        except OSError:
+            pass
+
+    def _finish(self, job: Dict[str, Any], status: str, exit_code: Optional[int] = None, error: Optional[str] = None):
+        job.update({"status": status, "finished_at": time.time(), "exit_code": exit_code, "error": error})
+        self._processes.pop(job["id"], None)
+        self._readers.pop(job["id"], None)
+        self._progress.pop(job["id"], None)
+        metrics_registry.inc("training_jobs_finished_total", (("status", status),))
+        logger.info(f"🏁 Training job {job['id']} {status}" + (f" ({error})" if error else ""))
+
+    # ---- Monitoring ----
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                self._poll()
+            except Exception as e:
+                logger.error(f"❌ Training scheduler poll failed: {str(e)}")
+
+    def _poll(self):
+        changed = False
+        for job_id, process in list(self._processes.items()):
+            job = self.jobs[job_id]
+            progress = self._update_progress(job)
+            exit_code = process.poll()
+
+            if exit_code is None:
+                if job["status"] == CANCELLING and time.time() - job["cancel_requested_at"] > self.cancel_grace:
+                    logger.warning(f"⚠️ Training job {job_id} ignored the interrupt, killing it")
+                    process.kill()
+                continue
+
+            run_status = progress.get("status") if progress else None
+            if job["status"] == CANCELLING:
+                self._finish(job, CANCELLED, exit_code)
+            elif exit_code == 0 and run_status in (None, COMPLETED):
+                self._finish(job, COMPLETED, exit_code)
+            else:
+                error = (progress or {}).get("error") or (
+                    f"run ended with status {run_status}" if exit_code == 0 else f"exit code {exit_code}"
+                )
+                self._finish(job, FAILED, exit_code, error)
+            changed = True
+
+        if changed:
+            self._prune()
+            self._dispatch()
+            self._save()
+
+    def _update_progress(self, job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        reader = self._readers.get(job["id"])
+        if reader is None:
+            return None
+        records = reader.poll()
+        if not records:
+            return self._progress.get(job["id"])
+
+        progress = summarize(records, self._progress.get(job["id"]))
+        self._progress[job["id"]] = progress
+        for record in records:
+            if record.get("kind") == "run_end" and record.get("error"):
+                progress["error"] = record["error"]
+        job["progress"] = {field: progress.get(field) for field in PROGRESS_FIELDS}
+        return progress
+
+    def _prune(self):
+        """Forget the oldest finished jobs past TRAINING_KEEP_FINISHED"""
+        finished = sorted(
+            (job for job in self.jobs.values() if job["status"] not in ACTIVE_STATUSES),
+            key=lambda job: job["finished_at"] or 0
+        )
+        for job in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self.jobs[job["id"]]
+
+    # ---- Persistence ----
+
+    def _load(self):
+        try:
+            with open(self.store_path) as f:
+                jobs = json.load(f).get("jobs", [])
+        except FileNotFoundError:
+            return
+        except ValueError as e:
+            logger.warning(f"⚠️ Unreadable training job store {self.store_path}: {e}")
+            return
+
+        for job in jobs:
+            if job["status"] == RUNNING:
+                # Interrupted by an API restart: run again from the latest checkpoint
+                job.update({"status": QUEUED, "resume": True, "pid": None})
+            elif job["status"] == CANCELLING:
+                job.update({"status": CANCELLED, "finished_at": time.time(), "pid": None})
+            self.jobs[job["id"]] = job
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.store_path)), exist_ok=True)
+            _write_json_atomic(self.store_path, {"jobs": list(self.jobs.values())})
+        except OSError as e:
+            logger.error(f"❌ Failed to save training jobs: {str(e)}")
@@ -0,0 +1,276 @@
+"""
+Resilient client layer for upstream HTTP APIs: pooling, hedging and circuit breaking
+"""
+
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Optional
+
+import httpx
+
+from services.metrics import registry as metrics_registry
+
+logger = logging.getLogger(__name__)
+
+metrics_registry.describe("upstream_request_duration_ms", "Latency of each upstream HTTP attempt, by outcome")
+metrics_registry.describe("upstream_call_duration_ms", "Latency of each upstream call including hedging")
+metrics_registry.describe("upstream_hedges_total", "Hedge requests sent after the primary attempt was slow")
+metrics_registry.describe("upstream_hedge_wins_total", "Calls answered by the hedge rather than the primary attempt")
+metrics_registry.describe("upstream_short_circuits_total", "Calls refused without contacting the upstream (breaker open)")
+metrics_registry.describe("upstream_breaker_transitions_total", "Circuit breaker state changes")
+
+
+class UpstreamUnavailable(Exception):
+    """Raised when the circuit breaker refuses a call"""
+
+
+def _is_failure(response: httpx.Response) -> bool:
+    """Responses that count against upstream health (overload and server errors)"""
+    return response.status_code == 429 or response.status_code >= 500
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open probe
+
+    After `failure_threshold` consecutive failures the breaker opens and calls
+    fail fast for `cooldown` seconds; then one probe call is let through and
+    its outcome closes or re-opens the breaker.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, cooldown: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def _transition(self, state: str):
+        if state != self.state:
+            logger.warning(f"⚡ {self.name} circuit breaker {self.state} -> {state}")
+            metrics_registry.inc("upstream_breaker_transitions_total", (("upstream", self.name), ("to", state)))
+            self.state = state
+
+    def allow(self) -> bool:
+        """Whether a call may go to the upstream now"""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.cooldown:
+                return False
+            self._transition(self.HALF_OPEN)
+        # Half-open: exactly one probe at a time
+        if self._probe_in_flight:
+            return False
+        self._probe_in_flight = True
+        return True
+
+    def record_success(self):
+        self._probe_in_flight = False
+        self.consecutive_failures = 0
+        self._transition(self.CLOSED)
+
+    def record_failure(self):
+        self._probe_in_flight = False
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+            self._transition(self.OPEN)
+
+    def release(self):
+        """Give back a probe slot whose call ended without an outcome (e.g. cancelled)"""
+        self._probe_in_flight = False
+
+
+class RetryBudget:
+    """Caps extra attempts at a fraction of calls (token bucket refilled per call)"""
+
+    def __init__(self, ratio: float = 0.1, max_tokens: float = 10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+
+    def deposit(self):
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+class UpstreamClient:
+    """Shared keep-alive pool for one upstream, with hedging, a breaker and latency metrics
+
+    A call that has not answered after the recent p95 latency gets one
+    hedge request (if the retry budget allows) and whichever succeeds first
+    wins; the other is cancelled. Until enough latencies are recorded, the
+    configured `hedge_delay_ms` is used instead.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        timeout: float = 10.0,
+        max_connections: int = 20,
+        hedge_delay_ms: float = 2000.0,
+        hedge_min_delay_ms: float = 100.0,
+        breaker: Optional[CircuitBreaker] = None,
+        budget: Optional[RetryBudget] = None
+    ):
+        self.name = name
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.hedge_delay_ms = hedge_delay_ms
+        self.hedge_min_delay_ms = hedge_min_delay_ms
+        self.breaker = breaker or CircuitBreaker(name)
+        self.budget = budget or RetryBudget()
+        self._latencies = deque(maxlen=256)  # Recent successful attempt latencies (ms)
+        self._client: Optional[httpx.AsyncClient] = None
+
+        metrics_registry.register_gauge(
+            f"upstream_{name}_breaker_open",
+            lambda: 0 if self.breaker.state == CircuitBreaker.CLOSED else 1,
+            f"Whether the {name} circuit breaker is open or half-open"
+        )
+
+    @classmethod
+    def from_env(cls, name: str, prefix: str) -> "UpstreamClient":
+        """Build a client configured by {prefix}_TIMEOUT_SECONDS, _MAX_CONNECTIONS, _HEDGE_DELAY_MS, ..."""
+        def env(key: str, default: str) -> str:
+            return os.getenv(f"{prefix}_{key}", default)
+
+        return cls(
+            name,
+            timeout=float(env("TIMEOUT_SECONDS", "10")),
+            max_connections=int(env("MAX_CONNECTIONS", "20")),
+            hedge_delay_ms=float(env("HEDGE_DELAY_MS", "2000")),
+            breaker=CircuitBreaker(
+                name,
+                failure_threshold=int(env("BREAKER_FAILURES", "5")),
+                cooldown=float(env("BREAKER_COOLDOWN_SECONDS", "30"))
+            ),
+            budget=RetryBudget(ratio=float(env("HEDGE_BUDGET_RATIO", "0.1")))
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared HTTP client (created on first use)"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=60.0
+                )
+            )
+        return self._client
+
+    async def close(self):
+        """Close the pooled connections"""
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait before hedging: the recent p95 latency"""
+        if len(self._latencies) < 20:
+            delay_ms = self.hedge_delay_ms
+        else:
+            ordered = sorted(self._latencies)
+            delay_ms = ordered[int(0.95 * (len(ordered) - 1))]
+        return min(max(delay_ms, self.hedge_min_delay_ms), self.timeout * 1000) / 1000
+
+    async def _attempt(self, method: str, url: str, role: str, **kwargs) -> httpx.Response:
+        """One HTTP attempt, timed by outcome"""
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            outcome = "failure" if _is_failure(response) else "ok"
+            return response
+        except httpx.TimeoutException:
+            outcome = "timeout"
+            raise
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            metrics_registry.observe(
+                "upstream_request_duration_ms",
+                elapsed_ms,
+                (("upstream", self.name), ("attempt", role), ("outcome", outcome))
+            )
+            if outcome == "ok":
+                self._latencies.append(elapsed_ms)
+
+    async def _hedged(self, method: str, url: str, **kwargs) -> httpx.Response:
+        primary = asyncio.ensure_future(self._attempt(method, url, "primary", **kwargs))
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=self.hedge_delay())
+            if not done and self.budget.try_spend():
+                metrics_registry.inc("upstream_hedges_total", (("upstream", self.name),))
+                pending.add(asyncio.ensure_future(self._attempt(method, url, "hedge", **kwargs)))
+
+            # First healthy answer wins; a failed attempt waits for the other one
+            last = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    last = task
+                    if task.exception() is None and not _is_failure(task.result()):
+                        if task is not primary:
+                            metrics_registry.inc("upstream_hedge_wins_total", (("upstream", self.name),))
+                        return task.result()
+            return last.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send a request through the breaker, hedging it when it is slow
+
+        Raises UpstreamUnavailable without contacting the upstream while the
+        breaker is open; transport errors propagate after being recorded.
+        """
+        if not self.breaker.allow():
+            metrics_registry.inc("upstream_short_circuits_total", (("upstream", self.name),))
+            raise UpstreamUnavailable(f"{self.name} circuit breaker is open")
+
+        self.budget.deposit()
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            response = await self._hedged(method, url, **kwargs)
+            outcome = "failure" if _is_failure(response) else "ok"
+            return response
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            if outcome == "ok":
+                self.breaker.record_success()
+            elif outcome == "cancelled":
+                self.breaker.release()
+            else:
+                self.breaker.record_failure()
+            metrics_registry.observe(
+                "upstream_call_duration_ms",
+                (time.perf_counter() - start) * 1000,
+                (("upstream", self.name), ("outcome", outcome))
+            )
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
@@ -0,0 +1,134 @@
+"""
+In-process user and quota cache for the quota hot path
+"""
+
+import os
+import time
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from services.metrics import registry as metrics_registry
+
+logger = logging.getLogger(__name__)
+
+# Fields needed by the profile and quota endpoints (never the password hash or tokens)
+USER_CACHE_PROJECTION = {
+    "username": 1,
+    "email": 1,
+    "role": 1,
+    "usage": 1,
+    "usageResetTime": 1,
+    "networksCount": 1,
+    "trainingsCount": 1,
+    "simulationsCount": 1,
+    "createdAt": 1,
+    "lastLogin": 1
+}
+
+metrics_registry.describe("user_cache_hits_total", "User cache lookups answered from memory")
+metrics_registry.describe("user_cache_misses_total", "User cache lookups that went to MongoDB")
+metrics_registry.describe("user_cache_strict_bypass_total", "Quota checks that skipped the cache near the limit")
+
+
+class UserCache:
+    """Short-TTL LRU cache of projected user documents"""
+
+    def __init__(
+        self,
+        db_service,
+        ttl: Optional[float] = None,
+        max_entries: int = 10000,
+        strict: Optional[bool] = None,
+        strict_margin: Optional[int] = None
+    ):
+        self.db_service = db_service
+        self.ttl = ttl if ttl is not None else float(os.getenv("USER_CACHE_TTL_SECONDS", "5"))
+        self.max_entries = max_entries
+        # Strict mode re-reads from MongoDB when a cached quota is within `strict_margin` of the limit
+        self.strict = strict if strict is not None else os.getenv("QUOTA_CACHE_STRICT", "true").lower() == "true"
+        self.strict_margin = strict_margin if strict_margin is not None else int(os.getenv("QUOTA_CACHE_STRICT_MARGIN", "2"))
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+
+    def _get_cached(self, user_id: str) -> Optional[Dict]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+
+        expires_at, user = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[user_id]
+            return None
+
+        self._entries.move_to_end(user_id)
+        return user
+
+    def _store(self, user_id: str, user: Dict):
+        self._entries[user_id] = (time.monotonic() + self.ttl, user)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _load(self, user_id: str) -> Optional[Dict]:
+        metrics_registry.inc("user_cache_misses_total")
+        user = await self.db_service.get_user(user_id, projection=USER_CACHE_PROJECTION)
+        if user:
+            self._store(user_id, user)
+        return user
+
+    async def get_user(self, user_id: str) -> Optional[Dict]:
+        """Get a projected user document, from memory when fresh"""
+        user = self._get_cached(user_id)
+        if user is not None:
+            metrics_registry.inc("user_cache_hits_total")
+            return user
+        return await self._load(user_id)
+
+    async def get_quota_status(self, user_id: str, resource: str) -> Optional[Dict]:
+        """Get a user's quota status for a resource, from memory when safe"""
+        from models import get_usage_key
+        from services.db_service import compute_quota_status
+
+        usage_key = get_usage_key(resource)
+        user = self._get_cached(user_id)
+
+        if user is not None:
+            status = compute_quota_status(user, usage_key, datetime.utcnow())
+            if self.strict and status["remaining"] <= self.strict_margin:
+                # Too close to the limit to trust a possibly stale count
+                metrics_registry.inc("user_cache_strict_bypass_total")
+                user = None
+            else:
+                metrics_registry.inc("user_cache_hits_total")
+                return status
+
+        user = await self._load(user_id)
+        if not user:
+            return None
+        return compute_quota_status(user, usage_key, datetime.utcnow())
+
+    def apply_update(self, user_id: str, fields: Dict):
+        """Write fields returned by an update through to a cached entry"""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return
+        self._store(user_id, {**entry[1], **fields})
+
+    def invalidate(self, user_id: str):
+        """Drop a user from the cache"""
+        self._entries.pop(user_id, None)
+
+    def get_stats(self) -> Dict:
+        """Get cache size and hit/miss counters"""
+        hits = metrics_registry.counter_total("user_cache_hits_total")
+        misses = metrics_registry.counter_total("user_cache_misses_total")
+        return {
+            "entries": len(self._entries),
+            "ttlSeconds": self.ttl,
+            "strict": self.strict,
+            "hits": hits,
+            "misses": misses,
+            "strictBypasses": metrics_registry.counter_total("user_cache_strict_bypass_total"),
+            "hitRate": hits / (hits + misses) if (hits + misses) else 0.0
+        }
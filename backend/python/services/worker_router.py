@@ -0,0 +1,209 @@
+"""
+Multi-worker front end: supervises API worker processes and routes requests to them
+"""
+
+import os
+import sys
+import json
+import asyncio
+import hashlib
+import logging
+import subprocess
+from typing import Dict, List, Optional
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+
+from services.metrics import dashboard_figures, merge_prometheus, summarize_prometheus
+from services.simulation_sessions import scoped_session_id, session_id_from, token_subject
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Worker that runs the training job scheduler; /training requests are routed to it
+TRAINING_WORKER = 0
+
+# Hop-by-hop and re-encoded headers that must not be copied between connections
+REQUEST_SKIP_HEADERS = {"host", "content-length", "connection", "keep-alive", "transfer-encoding"}
+RESPONSE_SKIP_HEADERS = {"content-length", "connection", "keep-alive", "transfer-encoding", "content-encoding"}
+
+
+class WorkerPool:
+    """API worker processes (uvicorn main:app) on local ports, plus an optional model host
+
+    The model host is one main:app process with API_ROLE=model that loads the
+    model once; workers reach it through MODEL_SERVICE_URL, so the weights
+    are held in memory once however many workers run. Workers that exit are
+    restarted (their simulation sessions are lost).
+    """
+
+    def __init__(self, workers: int, base_port: int, model_host: bool = True, log_level: str = "info"):
+        self.workers = workers
+        self.base_port = base_port
+        self.model_host = model_host
+        self.log_level = log_level
+        self.model_port = base_port
+        self.worker_ports = [base_port + 1 + i for i in range(workers)]
+        self.urls = [f"http://127.0.0.1:{port}" for port in self.worker_ports]
+        self.model_url = f"http://127.0.0.1:{self.model_port}" if model_host else None
+        self._processes: Dict[str, subprocess.Popen] = {}
+
+    def _spawn(self, name: str, port: int, env_overrides: Dict[str, str]) -> subprocess.Popen:
+        env = dict(os.environ)
+        env.update(env_overrides)
+        process = subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn", "main:app",
+                "--host", "127.0.0.1", "--port", str(port), "--log-level", self.log_level
+            ],
+            cwd=APP_DIR,
+            env=env
+        )
+        logger.info(f"🚀 Started {name} (pid {process.pid}) on port {port}")
+        return process
+
+    def _start_one(self, name: str):
+        if name == "model":
+            self._processes[name] = self._spawn(name, self.model_port, {"API_ROLE": "model", "TRAINING_SCHEDULER": "0"})
+            return
+
+        index = int(name.split("-")[1])
+        overrides = {"API_ROLE": "api", "API_WORKER_ID": str(index)}
+        if index != TRAINING_WORKER:
+            # One scheduler owns the training queue and the cores it hands out
+            overrides["TRAINING_SCHEDULER"] = "0"
+        if self.model_url:
+            overrides["MODEL_SERVICE_URL"] = self.model_url
+        self._processes[name] = self._spawn(name, self.worker_ports[index], overrides)
+
+    def start(self):
+        if self.model_host:
+            self._start_one("model")
+        for index in range(self.workers):
+            self._start_one(f"worker-{index}")
+
+    async def supervise(self, interval: float = 2.0):
+        """Restart processes that exit"""
+        while True:
+            await asyncio.sleep(interval)
+            for name, process in list(self._processes.items()):
+                if process.poll() is not None:
+                    logger.warning(f"⚠️ {name} exited with code {process.returncode}, restarting")
+                    self._start_one(name)
+
+    def stop(self):
+        for process in self._processes.values():
+            process.terminate()
+        for process in self._processes.values():
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    def worker_for_session(self, session_id: str) -> int:
+        """Stable worker index for a simulation session"""
+        digest = hashlib.sha1(session_id.encode()).digest()
+        return int.from_bytes(digest[:8], "big") % self.workers
+
+
+def create_router_app(pool: WorkerPool, timeout: Optional[float] = None) -> FastAPI:
+    """Reverse proxy in front of the pool
+
+    Simulation requests go to the worker that owns their session and
+    training requests to the worker running the scheduler; everything else
+    goes to the worker with the fewest requests in flight. /metrics is the
+    merged exposition of every process, and the request figures of
+    /api/admin/metrics are computed from it.
+    """
+    app = FastAPI(title="AutoSentinel API router")
+    timeout = timeout or float(os.getenv("ROUTER_TIMEOUT_SECONDS", "60"))
+    client = httpx.AsyncClient(
+        timeout=timeout,
+        limits=httpx.Limits(max_connections=None, max_keepalive_connections=50 * pool.workers)
+    )
+    inflight: List[int] = [0] * pool.workers
+    state = {"next": 0, "supervisor": None}
+
+    def pick_worker() -> int:
+        # Rotate the starting point so idle workers share the load evenly
+        start = state["next"]
+        state["next"] = (start + 1) % pool.workers
+        order = [(start + i) % pool.workers for i in range(pool.workers)]
+        return min(order, key=lambda index: inflight[index])
+
+    @app.on_event("startup")
+    async def startup():
+        pool.start()
+        state["supervisor"] = asyncio.create_task(pool.supervise())
+
+    @app.on_event("shutdown")
+    async def shutdown():
+        if state["supervisor"]:
+            state["supervisor"].cancel()
+        await client.aclose()
+        pool.stop()
+
+    async def scrape_merged() -> str:
+        names = [str(index) for index in range(pool.workers)]
+        urls = pool.urls + ([pool.model_url] if pool.model_url else [])
+        if pool.model_url:
+            names.append("model")
+        responses = await asyncio.gather(
+            *(client.get(f"{url}/metrics") for url in urls),
+            return_exceptions=True
+        )
+        scraped = [
+            (name, r.text) for name, r in zip(names, responses)
+            if isinstance(r, httpx.Response) and r.status_code == 200
+        ]
+        return merge_prometheus([text for _, text in scraped], [name for name, _ in scraped])
+
+    @app.get("/metrics")
+    async def metrics():
+        return PlainTextResponse(await scrape_merged(), media_type="text/plain; version=0.0.4")
+
+    @app.get("/api/admin/metrics")
+    async def admin_metrics(request: Request):
+        """A worker answers (auth, database figures); request figures are replaced by every worker's"""
+        response = await proxy("api/admin/metrics", request)
+        if response.status_code != 200:
+            return response
+        data = json.loads(response.body)
+        data.update(dashboard_figures(summarize_prometheus(await scrape_merged())))
+        return JSONResponse(data)
+
+    @app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "HEAD"])
+    async def proxy(path: str, request: Request):
+        if path.startswith("simulation/"):
+            session_id = session_id_from(request.headers, request.query_params)
+            index = pool.worker_for_session(scoped_session_id(token_subject(request.headers), session_id))
+        elif path.startswith("training/"):
+            index = TRAINING_WORKER
+        else:
+            index = pick_worker()
+
+        headers = {k: v for k, v in request.headers.items() if k.lower() not in REQUEST_SKIP_HEADERS}
+        inflight[index] += 1
+        try:
+            upstream = await client.request(
+                request.method,
+                f"{pool.urls[index]}/{path}",
+                params=request.query_params,
+                headers=headers,
+                content=await request.body()
+            )
+        except httpx.TransportError as e:
+            logger.error(f"❌ Worker {index} unavailable: {str(e)}")
+            return JSONResponse(status_code=503, content={"detail": "Worker unavailable"})
+        finally:
+            inflight[index] -= 1
+
+        response = Response(content=upstream.content, status_code=upstream.status_code)
+        for key, value in upstream.headers.multi_items():
+            if key.lower() not in RESPONSE_SKIP_HEADERS:
+                response.headers.append(key, value)
+        return response
+
+    return app
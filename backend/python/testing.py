@@ -29,9 +29,13 @@ def load_pretrained_checkpoint():
     with open(YAML_PATH, "r") as f:
         env_cfg = yaml.safe_load(f)
 
-    print(f"🔁 Restoring from checkpoint: {CHECKPOINT_DIR}")
+    # Use the manifest's best checkpoint when CHECKPOINT_DIR is a training output directory
+    from checkpoint_manager import resolve_checkpoint
+    checkpoint_path = resolve_checkpoint(CHECKPOINT_DIR) or CHECKPOINT_DIR
+
+    print(f"🔁 Restoring from checkpoint: {checkpoint_path}")
     from ray.rllib.algorithms.algorithm import Algorithm
-    algo = Algorithm.from_checkpoint(CHECKPOINT_DIR)
+    algo = Algorithm.from_checkpoint(checkpoint_path)
     print("✅ Successfully restored pretrained model.")
 
     return algo, env_cfg
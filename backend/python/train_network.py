@@ -16,20 +16,24 @@ from pathlib import Path
 sys.stdout.reconfigure(line_buffering=True) if hasattr(sys.stdout, 'reconfigure') else None
 sys.stderr.reconfigure(line_buffering=True) if hasattr(sys.stderr, 'reconfigure') else None
 
-# === Configure environment for GPU training ===
+# === Configure environment (GPU use is auto-detected, see rollout_resources) ===
 os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"
 os.environ["RLLIB_FRAMEWORK"] = "torch"
 os.environ["RLLIB_TEST_NO_TF_IMPORT"] = "1"
 os.environ["PYTHONWARNINGS"] = "ignore"
 os.environ["PYTHONUNBUFFERED"] = "1"  # Force unbuffered output
-# Enable CUDA for GPU training (comment out to use CPU only)
-# os.environ["CUDA_VISIBLE_DEVICES"] = "-1"  # Uncomment this line to force CPU
+# Use --cpu-only (or CUDA_VISIBLE_DEVICES=-1) to keep training off the GPU
 
 import ray
 from ray.rllib.algorithms.ppo import PPOConfig
 from ray.rllib.algorithms.dqn import DQNConfig
 from ray.rllib.algorithms.callbacks import DefaultCallbacks
 
+from checkpoint_manager import CheckpointManager
+from training_metrics import MetricsWriter
+from training_stats import PolicyStats, StreamingStats
+from rollout_resources import add_rollout_arguments, apply_rollout_settings, describe_rollout_settings, resolve_rollout_settings
+
 # Logging setup - suppress all warnings
 logging.basicConfig(level=logging.ERROR, force=True)
 logging.getLogger().setLevel(logging.ERROR)
@@ -70,24 +74,61 @@ except ImportError:
 
 
 # Global callback instance to track episodes across iterations
+# (with rollout workers, episodes end in the worker processes and this stays unused)
 _global_callbacks = None
 
+# Structured metrics channel (metrics.jsonl in the output directory), set up in train()
+_metrics_writer = None
+_print_episode_metrics = False
+
+# Episodes kept for windowed reward statistics, and the recent rewards averaged per iteration
+STATS_WINDOW = 100
+RECENT_REWARDS = 10
+
+
+def report_episode(episode, episode_length, total_reward, policy_means):
+    """Record one finished episode in the metrics file (and on stdout if requested)"""
+    if _metrics_writer:
+        _metrics_writer.emit(
+            "episode",
+            episode=episode,
+            length=episode_length,
+            reward=round(total_reward, 3),
+            policies={p: round(r, 3) for p, r in policy_means.items()}
+        )
+
+    if _print_episode_metrics:
+        # Format: METRIC|episode=X|length=Y|reward=Z|attacker=A|defender=D
+        policy_str = "|".join([f"{p}={r:.3f}" for p, r in sorted(policy_means.items())])
+        metric_line = f"METRIC|episode={episode}|length={episode_length}|reward={total_reward:.3f}"
+        if policy_str:
+            metric_line += f"|{policy_str}"
+        print(metric_line, flush=True)
+
+
 class TrainingCallbacks(DefaultCallbacks):
     """Callbacks for tracking training progress and logging"""
 
     def __init__(self):
         super().__init__()
         self.episode_counter = 0
-        self.episode_rewards = []
         self.last_reported_episode = 0
         self.iteration_counter = 0
-        self.policy_rewards = {}  # Track per-policy rewards: {policy_name: [rewards]}
+        # Constant-memory reward statistics, overall and per policy
+        self.reward_stats = StreamingStats(window=STATS_WINDOW)
+        self.length_stats = StreamingStats(window=STATS_WINDOW)
+        self.policy_stats = PolicyStats(window=STATS_WINDOW)
 
         # Store globally so we can access from main loop
         global _global_callbacks
         _global_callbacks = self
 
     def on_episode_end(self, *, worker, base_env, policies, episode, **kwargs):
+        # Rollout worker processes cannot reach the driver's counters; the
+        # driver reports their episodes from the iteration results instead
+        if getattr(worker, "worker_index", 0) > 0:
+            return
+
         self.episode_counter += 1
 
         # Get episode info
@@ -102,8 +143,9 @@ class TrainingCallbacks(DefaultCallbacks):
         except Exception:
             pass
 
-        # Track reward history
-        self.episode_rewards.append(total_reward)
+        # Track reward statistics
+        self.reward_stats.update(total_reward)
+        self.length_stats.update(episode_length)
 
         # Extract per-agent rewards to track by policy
         policy_rewards_this_episode = {}
@@ -124,10 +166,8 @@ class TrainingCallbacks(DefaultCallbacks):
                         policy_rewards_this_episode[policy_name] = []
                     policy_rewards_this_episode[policy_name].append(float(agent_reward))
 
-                    # Also track in history for training loop
-                    if policy_name not in self.policy_rewards:
-                        self.policy_rewards[policy_name] = []
-                    self.policy_rewards[policy_name].append(float(agent_reward))
+                    # Also track in statistics for training loop
+                    self.policy_stats.update(policy_name, float(agent_reward))
         except Exception as e:
             pass
 
@@ -137,15 +177,45 @@ class TrainingCallbacks(DefaultCallbacks):
             if rewards:
                 policy_means[policy_name] = sum(rewards) / len(rewards)
 
-        # Print structured metric (parseable by frontend)
-        # Format: METRIC|episode=X|length=Y|reward=Z|attacker=A|defender=D
-        policy_str = "|".join([f"{p}={r:.3f}" for p, r in sorted(policy_means.items())])
-        metric_line = f"METRIC|episode={self.episode_counter}|length={episode_length}|reward={total_reward:.3f}"
-        if policy_str:
-            metric_line += f"|{policy_str}"
-        print(metric_line, flush=True)
+        report_episode(self.episode_counter, episode_length, total_reward, policy_means)
+
 
 
+def report_worker_episodes(results, first_episode):
+    """Report the episodes sampled by rollout workers this iteration
+
+    Uses RLlib's per-episode hist_stats, which keep the most recent episodes.
+    """
+    count = int(results.get("episodes_this_iter", 0) or 0)
+    hist = results.get("hist_stats", {}) or {}
+    if count <= 0:
+        return
+
+    rewards = list(hist.get("episode_reward", []))[-count:]
+    lengths = list(hist.get("episode_lengths", []))[-count:]
+    policy_hist = {
+        key[len("policy_"):-len("_reward")]: list(values)[-count:]
+        for key, values in hist.items()
+        if key.startswith("policy_") and key.endswith("_reward")
+    }
+
+    for i, total_reward in enumerate(rewards):
+        episode_length = lengths[i] if i < len(lengths) else 0
+        policy_means = {p: float(values[i]) for p, values in policy_hist.items() if i < len(values)}
+        report_episode(first_episode + i + 1, episode_length, float(total_reward), policy_means)
+
+        if _global_callbacks:
+            _global_callbacks.reward_stats.update(float(total_reward))
+            _global_callbacks.length_stats.update(episode_length)
+            _global_callbacks.policy_stats.update_many(policy_means.items())
+
+
+def checkpoint_score(results):
+    """Score used to rank checkpoints: recent mean episode reward"""
+    if _global_callbacks and _global_callbacks.reward_stats.count:
+        return _global_callbacks.reward_stats.window.mean()
+    return results.get("episode_reward_mean")
+
 
 def load_yaml_config(yaml_path):
     """Load and parse YAML configuration"""
@@ -216,10 +286,32 @@ def train(args):
     print(f"Output directory: {output_dir}")
     print(f"Checkpoint directory: {checkpoint_dir}")
 
+    num_rollout_workers = args.num_rollout_workers
+    if num_rollout_workers is None and args.num_cpus:
+        # Fill the cores this run was given, leaving one for the driver
+        num_rollout_workers = max(0, args.num_cpus - 1)
+    rollout_settings = resolve_rollout_settings(
+        num_rollout_workers=num_rollout_workers,
+        num_envs_per_worker=args.num_envs_per_worker,
+        rollout_fragment_length=args.rollout_fragment_length,
+        num_gpus=args.num_gpus,
+        cpu_only=args.cpu_only,
+        local_mode=args.local_mode
+    )
+    print(f"Rollouts: {describe_rollout_settings(rollout_settings)}")
+
+    # Progress goes to metrics.jsonl in batches rather than one stdout line per episode
+    global _metrics_writer, _print_episode_metrics
+    metrics_path = Path(args.metrics_file) if args.metrics_file else output_dir / "metrics.jsonl"
+    _metrics_writer = MetricsWriter(str(metrics_path), socket_address=args.metrics_socket)
+    _print_episode_metrics = args.print_episode_metrics
+    print(f"Metrics file: {metrics_path}")
+
     # Initialize Ray
     print("\nInitializing Ray...")
     ray.shutdown()
-    ray.init(local_mode=args.local_mode, include_dashboard=False)
+    # --num-cpus caps what Ray schedules, so concurrent runs do not oversubscribe the machine
+    ray.init(local_mode=args.local_mode, include_dashboard=False, num_cpus=args.num_cpus)
 
     # Select algorithm
     print(f"Algorithm: {args.algorithm}")
@@ -243,12 +335,11 @@ def train(args):
             policy_mapping_fn=policy_mapping_fn # Auto-create policies from environment
         )
         .training(train_batch_size=4000)
-        .rollouts(num_rollout_workers=0)
         .callbacks(TrainingCallbacks)
         .reporting(min_time_s_per_iteration=0.0)
-        .resources(num_gpus=1)  # Use 1 GPU for training
         .debugging(log_level="WARNING")
     )
+    config = apply_rollout_settings(config, rollout_settings)
 
     # Disable preprocessor for all policies to avoid shape inference errors
     # Must be set BEFORE build()
@@ -259,6 +350,40 @@ def train(args):
     print("Building algorithm...")
     algo = config.build()
 
+    # Checkpoints are written in the background and indexed in checkpoints/manifest.json
+    def on_checkpoint_saved(entry):
+        _metrics_writer.emit(
+            "checkpoint",
+            iteration=entry["iteration"],
+            path=entry["path"],
+            score=entry["score"],
+            size_bytes=entry["size_bytes"],
+            sha256=entry["sha256"]
+        )
+        print(f"[OK] Checkpoint saved: {entry['path']}", flush=True)
+
+    checkpoints = CheckpointManager(
+        str(checkpoint_dir),
+        keep_last=args.keep_last,
+        keep_best=args.keep_best,
+        on_saved=on_checkpoint_saved
+    )
+
+    start_iteration = 0
+    start_episodes = 0
+    if args.resume:
+        resume_from = checkpoints.latest()
+        if resume_from:
+            print(f"Resuming from checkpoint: {resume_from['path']}")
+            algo.restore(resume_from['path'])
+            start_iteration = resume_from['iteration']
+            # Episodes count on from the checkpoint however they are sampled (older manifests lack the count)
+            start_episodes = int(resume_from.get('episodes') or 0)
+            if _global_callbacks:
+                _global_callbacks.episode_counter = start_episodes
+        else:
+            print("No checkpoint in the manifest, starting from scratch")
+
     # Training metadata
     training_metadata = {
         'start_time': datetime.now().isoformat(),
@@ -267,6 +392,7 @@ def train(args):
         'episodes': args.episodes,
         'save_frequency': args.save_frequency,
         'policies': list(policies.keys()),
+        'rollouts': rollout_settings,
     }
 
     # Save metadata
@@ -274,14 +400,23 @@ def train(args):
     with open(metadata_path, 'w') as f:
         json.dump(training_metadata, f, indent=2)
 
+    _metrics_writer.emit(
+        "run_start",
+        algorithm=args.algorithm,
+        target_episodes=args.episodes,
+        config=args.config,
+        policies=list(policies.keys()),
+        rollouts=rollout_settings
+    )
+
     # Training loop
     print(f"\n{'='*60}")
     print(f"Starting Training - {args.episodes} episodes")
     print(f"{'='*60}\n")
 
     try:
-        iteration = 0
-        total_episodes = 0
+        iteration = start_iteration
+        total_episodes = start_episodes
 
         while total_episodes < args.episodes:
             iteration += 1
@@ -290,39 +425,53 @@ def train(args):
             results = algo.train()
 
             # Use the global callback counter for accurate episode tracking
-            if _global_callbacks:
+            if _global_callbacks and rollout_settings["num_rollout_workers"] == 0:
                 total_episodes = _global_callbacks.episode_counter
             else:
-                # Fallback to RLlib metrics if callback not available
-                total_episodes = results.get("episodes_this_iter", 0)
+                # Episodes ended in rollout workers: add this iteration's to our own count,
+                # since RLlib's episodes_total may or may not include the restored ones
+                report_worker_episodes(results, total_episodes)
+                total_episodes += int(results.get("episodes_this_iter", 0) or 0)
 
             train_time = results.get("time_this_iter_s", 0.0)
             mean_ep_len = results.get("episode_len_mean", 0)
 
-            # Get policy rewards from callback
+            # Get policy rewards from callback statistics (mean of the most recent rewards)
             policy_rewards = {}
-            if _global_callbacks and _global_callbacks.policy_rewards:
-                # Calculate average reward for each policy in this iteration
-                # Get the number of episodes from this iteration
-                episodes_this_iter = total_episodes - (iteration - 1) * (total_episodes // max(1, iteration))
-
-                for policy_id, rewards in _global_callbacks.policy_rewards.items():
-                    if rewards:
-                        # Use mean of recent rewards (last N from this iteration)
-                        recent_rewards = rewards[-10:] if len(rewards) > 10 else rewards
-                        policy_rewards[policy_id] = sum(recent_rewards) / len(recent_rewards)
+            reward_stats = None
+            if _global_callbacks and _global_callbacks.policy_stats:
+                for policy_id, stats in _global_callbacks.policy_stats.items():
+                    policy_rewards[policy_id] = stats.window.mean(last=RECENT_REWARDS)
+                reward_stats = {
+                    "episode_reward": _global_callbacks.reward_stats.snapshot(),
+                    "episode_length": _global_callbacks.length_stats.snapshot(),
+                    "policies": _global_callbacks.policy_stats.snapshot()
+                }
+            else:
+                policy_rewards = dict(results.get("policy_reward_mean", {}) or {})
 
             # Extract individual policy rewards for printing
             attacker_reward = policy_rewards.get('attacker', 0.0)
             defender_reward = policy_rewards.get('defender', 0.0)
 
+            _metrics_writer.emit(
+                "iteration",
+                iteration=iteration,
+                episodes=total_episodes,
+                target_episodes=args.episodes,
+                time_s=round(train_time, 3),
+                mean_length=mean_ep_len,
+                policies={p: round(r, 3) for p, r in policy_rewards.items()},
+                stats=reward_stats
+            )
             print(f"ITERATION|iter={iteration}|episodes={total_episodes}/{args.episodes}|time={train_time:.2f}s|mean_len={mean_ep_len}|RED_attacker={attacker_reward:.3f}|BLUE_defender={defender_reward:.3f}", flush=True)
 
-            # Save checkpoint periodically
+            # Save checkpoint periodically (written in the background while training continues)
             if iteration % args.save_frequency == 0:
                 try:
-                    checkpoint_path = algo.save(checkpoint_dir=str(checkpoint_dir))
-                    print(f"[OK] Checkpoint saved: {checkpoint_path}")
+                    checkpoints.save_async(
+                        algo, iteration, rewards=policy_rewards, score=checkpoint_score(results), episodes=total_episodes
+                    )
                 except Exception as e:
                     print(f"[FAILED] Failed to save checkpoint: {e}")
 
@@ -332,13 +481,21 @@ def train(args):
         print("="*60)
 
         try:
-            final_checkpoint = algo.save(checkpoint_dir=str(checkpoint_dir))
+            checkpoints.wait()
+            latest = checkpoints.latest()
+            if latest is None or latest['iteration'] != iteration:
+                latest = checkpoints.save(
+                    algo, iteration, rewards=policy_rewards, score=checkpoint_score(results), episodes=total_episodes
+                )
+            final_checkpoint = latest['path']
             print(f"[OK] Final checkpoint saved: {final_checkpoint}")
 
             # Update metadata
             training_metadata['end_time'] = datetime.now().isoformat()
             training_metadata['status'] = 'completed'
             training_metadata['final_checkpoint'] = str(final_checkpoint)
+            best = checkpoints.best()
+            training_metadata['best_checkpoint'] = best['path'] if best else None
             training_metadata['total_iterations'] = iteration
             training_metadata['total_episodes'] = total_episodes
 
@@ -367,6 +524,16 @@ def train(args):
     finally:
         # Cleanup
         print("\nCleaning up...")
+        # Let a background checkpoint finish (and report) before the run ends
+        checkpoints.close()
+        _metrics_writer.emit(
+            "run_end",
+            status=training_metadata.get('status', 'error'),
+            iterations=iteration,
+            episodes=total_episodes,
+            **({'error': training_metadata['error']} if 'error' in training_metadata else {})
+        )
+        _metrics_writer.close()
         algo.stop()
         ray.shutdown()
         print("Done!")
@@ -378,9 +545,23 @@ def main():
     parser.add_argument('--output', required=True, help='Output directory for checkpoints and logs')
     parser.add_argument('--episodes', type=int, default=1000, help='Number of training episodes')
     parser.add_argument('--save-frequency', type=int, default=10, help='Save checkpoint every N iterations')
+    parser.add_argument('--keep-last', type=int, default=None,
+                        help='Most recent checkpoints to keep (default: CHECKPOINT_KEEP_LAST or 3)')
+    parser.add_argument('--keep-best', type=int, default=None,
+                        help='Best-scoring checkpoints to keep (default: CHECKPOINT_KEEP_BEST or 2)')
+    parser.add_argument('--resume', action='store_true', help='Resume from the latest checkpoint in the output directory')
     parser.add_argument('--algorithm', default='PPO', choices=['PPO', 'DQN'], help='RL algorithm')
     parser.add_argument('--verbose', action='store_true', help='Verbose logging')
     parser.add_argument('--local-mode', action='store_true', help='Run Ray in local mode (for debugging)')
+    parser.add_argument('--metrics-file', default=None,
+                        help='Structured metrics JSONL file (default: <output>/metrics.jsonl)')
+    parser.add_argument('--metrics-socket', default=None,
+                        help='Also send metric batches as UDP datagrams to host:port')
+    parser.add_argument('--print-episode-metrics', action='store_true',
+                        help='Also print a METRIC line per episode on stdout')
+    parser.add_argument('--num-cpus', type=int, default=None,
+                        help='CPUs Ray may use for this run (default: all; set by the training scheduler)')
+    add_rollout_arguments(parser)
 
     args = parser.parse_args()
 
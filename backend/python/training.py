@@ -1,11 +1,9 @@
 # train_primaite_marl_full_quiet.py
 import os
-import glob
 import yaml
 import time
-import math
 import logging
-from collections import defaultdict, deque
+from collections import defaultdict
 
 # === Optimize imports: disable TensorFlow, CUDA checks ===
 os.environ["CUDA_VISIBLE_DEVICES"] = "-1"
@@ -49,17 +47,27 @@ for name in noisy_loggers:
 # Primaite import - after we've set logging
 from primaite.session.ray_envs import PrimaiteRayMARLEnv
 
+from checkpoint_manager import CheckpointManager
+from training_stats import PolicyStats, StreamingStats
+from rollout_resources import apply_rollout_settings, describe_rollout_settings, resolve_rollout_settings
+
 # ----------------------------
 # USER CONFIG
 # ----------------------------
 YAML_PATH = "v3.yaml"                                     # path to your primaite YAML
 NUM_TRAIN_ITERS = 100                                     # total training iterations
-LOCAL_MODE = True                                         # True for debugging / single-process
+LOCAL_MODE = False                                        # True for debugging / single-process (forces 0 rollout workers)
+NUM_ROLLOUT_WORKERS = None                                # parallel env-sampling processes; None = CPU count - 1
+NUM_ENVS_PER_WORKER = 1                                   # envs stepped as one vectorized batch per worker
+ROLLOUT_FRAGMENT_LENGTH = "auto"                          # steps per worker sample call; "auto" derives it from TRAIN_BATCH_SIZE
+NUM_GPUS = None                                           # None = 1 if a GPU is detected, else 0
 PRINT_AGG_EVERY = 10                                      # print aggregated stats every N episodes
 TRAIN_BATCH_SIZE = 4000
 LOCAL_DIR = "./ray_results"
 CHECKPOINT_DIR = os.path.join(LOCAL_DIR, "checkpoints/policies")  # Model checkpoint directory
 CKPT_EVERY = 10                                           # save checkpoint every N iterations
+KEEP_LAST = 3                                             # most recent checkpoints kept
+KEEP_BEST = 2                                             # best checkpoints (by mean episode reward) kept
 RESUME_FROM = None                                        # set to a specific checkpoint path to force resume
 # ----------------------------
 
@@ -69,9 +77,10 @@ RESUME_FROM = None                                        # set to a specific ch
 class EpisodeSummaryCallbacks(DefaultCallbacks):
     def __init__(self):
         super().__init__()
-        self.recent_episode_rewards = deque(maxlen=1000)
-        self.recent_episode_lengths = deque(maxlen=1000)
-        self.per_policy_rewards = defaultdict(list)
+        # Constant-memory statistics: aggregates cover the last 1000 episodes (100 per policy)
+        self.reward_stats = StreamingStats(window=1000)
+        self.length_stats = StreamingStats(window=1000)
+        self.policy_stats = PolicyStats(window=100)
         self.episode_counter = 0
         self.print_agg_every = PRINT_AGG_EVERY
 
@@ -146,10 +155,9 @@ class EpisodeSummaryCallbacks(DefaultCallbacks):
 
         policy_means = {p: (sum(vals) / len(vals) if vals else 0.0) for p, vals in policy_rewards.items()}
 
-        self.recent_episode_rewards.append(total_episode_reward)
-        self.recent_episode_lengths.append(episode_length)
-        for p, vals in policy_means.items():
-            self.per_policy_rewards[p].append(vals)
+        self.reward_stats.update(total_episode_reward)
+        self.length_stats.update(episode_length)
+        self.policy_stats.update_many(policy_means.items())
 
         policy_str = " ".join([f"{p}={policy_means[p]:.3f}" for p in sorted(policy_means.keys())])
         # Single-line episode summary (this is the only frequent print)
@@ -157,41 +165,15 @@ class EpisodeSummaryCallbacks(DefaultCallbacks):
 
         # Periodic aggregate print
         if (self.episode_counter % self.print_agg_every) == 0:
-            window_rewards = list(self.recent_episode_rewards)
-            n = len(window_rewards)
-            if n:
-                mean_r = sum(window_rewards) / n
-                std_r = math.sqrt(sum((x - mean_r) ** 2 for x in window_rewards) / n)
-            else:
-                mean_r = std_r = 0.0
+            window = self.reward_stats.window
+            mean_r = window.mean() or 0.0
+            std_r = window.std()
+            ema_r = self.reward_stats.ema.value or 0.0
 
-            per_policy_agg = {}
-            for p, arr in self.per_policy_rewards.items():
-                if arr:
-                    mean_p = sum(arr[-100:]) / min(len(arr), 100)
-                else:
-                    mean_p = 0.0
-                per_policy_agg[p] = mean_p
-
-            per_policy_str = " ".join([f"{p}_mean={per_policy_agg[p]:.3f}" for p in sorted(per_policy_agg.keys())])
-            print(f"--- AGG Ep {self.episode_counter} over last {len(window_rewards)} eps: total_mean={mean_r:.3f} total_std={std_r:.3f} | {per_policy_str} ---")
-
-# ----------------------------
-# Utility: latest checkpoint finder
-# ----------------------------
-def find_latest_checkpoint(ckpt_dir):
-    if not os.path.isdir(ckpt_dir):
-        return None
-    candidates = glob.glob(os.path.join(ckpt_dir, "checkpoint_*"))
-    if candidates:
-        return max(candidates, key=os.path.getmtime)
-    all_files = []
-    for root, _, files in os.walk(ckpt_dir):
-        for f in files:
-            all_files.append(os.path.join(root, f))
-    if not all_files:
-        return None
-    return max(all_files, key=os.path.getmtime)
+            per_policy_str = " ".join(
+                [f"{p}_mean={stats.window.mean():.3f}" for p, stats in sorted(self.policy_stats.items())]
+            )
+            print(f"--- AGG Ep {self.episode_counter} over last {len(window)} eps: total_mean={mean_r:.3f} total_std={std_r:.3f} ema={ema_r:.3f} | {per_policy_str} ---")
 
 # ----------------------------
 # Main training
@@ -201,6 +183,15 @@ def main():
     with open(YAML_PATH, "r") as fh:
         env_cfg = yaml.safe_load(fh)
 
+    rollout_settings = resolve_rollout_settings(
+        num_rollout_workers=NUM_ROLLOUT_WORKERS,
+        num_envs_per_worker=NUM_ENVS_PER_WORKER,
+        rollout_fragment_length=ROLLOUT_FRAGMENT_LENGTH,
+        num_gpus=NUM_GPUS,
+        local_mode=LOCAL_MODE
+    )
+    print(f"Rollouts: {describe_rollout_settings(rollout_settings)}")
+
     # Ray init
     ray.shutdown()
     ray.init(local_mode=LOCAL_MODE, include_dashboard=False)
@@ -218,19 +209,19 @@ def main():
             policy_mapping_fn=lambda agent_id, episode, worker, **kw: str(agent_id).split("_")[0],
         )
         .training(train_batch_size=TRAIN_BATCH_SIZE)
-        .rollouts(num_rollout_workers=0)
         .callbacks(EpisodeSummaryCallbacks)
         .reporting(min_time_s_per_iteration=0.0)
-        .resources(num_gpus=0)
     )
+    config = apply_rollout_settings(config, rollout_settings)
 
     algo = config.build()
 
-    # Ensure checkpoint dir
-    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    # Checkpoints are saved in the background and indexed by CHECKPOINT_DIR/manifest.json
+    checkpoints = CheckpointManager(CHECKPOINT_DIR, keep_last=KEEP_LAST, keep_best=KEEP_BEST)
 
     # Attempt resume
     restored_ckpt = None
+    start_iter = 0
     try:
         if RESUME_FROM:
             if os.path.exists(RESUME_FROM):
@@ -240,14 +231,15 @@ def main():
             else:
                 print(f"RESUME_FROM path set but not found: {RESUME_FROM}")
         else:
-            latest = find_latest_checkpoint(CHECKPOINT_DIR)
+            latest = checkpoints.latest()
             if latest:
                 try:
-                    print(f"Auto-restoring from latest checkpoint: {latest}")
-                    algo.restore(latest)
-                    restored_ckpt = latest
+                    print(f"Auto-restoring from latest checkpoint: {latest['path']}")
+                    algo.restore(latest["path"])
+                    restored_ckpt = latest["path"]
+                    start_iter = latest["iteration"]
                 except Exception as e:
-                    print(f"Warning: failed to restore from {latest} ({e}). Continuing from scratch.")
+                    print(f"Warning: failed to restore from {latest['path']} ({e}). Continuing from scratch.")
             else:
                 print("No checkpoint found. Starting training from scratch.")
     except Exception as e:
@@ -257,18 +249,19 @@ def main():
 
     # Training loop
     print("--- Starting Training ---")
-    for it in range(1, NUM_TRAIN_ITERS + 1):
+    for it in range(start_iter + 1, start_iter + NUM_TRAIN_ITERS + 1):
         results = algo.train()
 
         train_time = results.get("time_this_iter_s", 0.0)
         episodes_this_iter = results.get("episodes_this_iter", None) or results.get("num_episodes_sampler", None) or results.get("episodes_total", None)
         mean_ep_len = results.get("episode_len_mean", None)
         policy_reward_mean = results.get("policy_reward_mean", {})
+        if not isinstance(policy_reward_mean, dict):
+            policy_reward_mean = {}
 
         policy_parts = []
-        if isinstance(policy_reward_mean, dict):
-            for pid, val in policy_reward_mean.items():
-                policy_parts.append(f"{pid}={val:.3f}")
+        for pid, val in policy_reward_mean.items():
+            policy_parts.append(f"{pid}={val:.3f}")
         policy_str = " ".join(policy_parts) if policy_parts else "no-policy-rewards"
 
         print(f"Iter {it:3d} | it_s={train_time:.2f} | eps={episodes_this_iter} | ep_len_mean={mean_ep_len} | {policy_str}")
@@ -276,15 +269,18 @@ def main():
         # periodic checkpoint
         if (it % CKPT_EVERY) == 0:
             try:
-                ckpt = algo.save(checkpoint_dir=CHECKPOINT_DIR)
-                print(f"Saved checkpoint at iter {it} -> {ckpt}")
+                checkpoints.save_async(algo, it, rewards=policy_reward_mean, score=results.get("episode_reward_mean"))
+                print(f"Saving checkpoint at iter {it} in the background")
             except Exception as e:
                 print(f"Warning: failed to save checkpoint at iter {it}: {e}")
 
     # final checkpoint
     try:
-        final_ckpt = algo.save(checkpoint_dir=CHECKPOINT_DIR)
-        print(f"Training finished. Final checkpoint: {final_ckpt}")
+        checkpoints.wait()
+        final_ckpt = checkpoints.latest()
+        if final_ckpt is None or final_ckpt["iteration"] != it:
+            final_ckpt = checkpoints.save(algo, it, rewards=policy_reward_mean, score=results.get("episode_reward_mean"))
+        print(f"Training finished. Final checkpoint: {final_ckpt['path']}")
     except Exception as e:
         print(f"Warning: failed to save final checkpoint: {e}")
 
@@ -296,6 +292,7 @@ def main():
         print(f"Warning: evaluation failed: {e}")
 
     # Cleanup
+    checkpoints.close()
     algo.stop()
     ray.shutdown()
 
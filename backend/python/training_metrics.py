@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Structured training metrics: a batched JSONL channel written by training runs
+
+Each record is one JSON object per line with a stable envelope:
+
+    {"v": 1, "seq": 42, "ts": 1700000000.123, "run": "<run id>", "kind": "episode", ...}
+
+Kinds and their fields:
+
+    run_start   algorithm, target_episodes, config, policies, rollouts
+    episode     episode, length, reward, policies {policy: reward}
+    iteration   iteration, episodes, target_episodes, time_s, mean_length, policies {policy: reward},
+                stats {episode_reward, episode_length, policies {policy: ...}} (StreamingStats snapshots)
+    checkpoint  iteration, path
+    run_end     status, iterations, episodes, error (optional)
+
+Records are buffered and appended in batches (every TRAINING_METRICS_FLUSH_SECONDS
+or TRAINING_METRICS_BATCH_SIZE records), so reporting cost does not grow with
+the episode rate. The file is append-only: a restarted run keeps appending and
+`seq` continues, so readers never see earlier metrics disappear. Batches can
+also be mirrored as UDP datagrams to TRAINING_METRICS_SOCKET ("host:port").
+
+Tail a metrics file from the command line:
+
+    python training_metrics.py uploads/training/<id>/metrics.jsonl --follow
+"""
+import os
+import sys
+import json
+import time
+import socket
+import logging
+import argparse
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+KINDS = ("run_start", "episode", "iteration", "checkpoint", "run_end")
+
+# Keep UDP datagrams below the usual 64 KB limit
+MAX_DATAGRAM_BYTES = 60000
+
+
+def parse_address(address: Optional[str]) -> Optional[Tuple[str, int]]:
+    """"host:port" (or ":port" for localhost) as a socket address"""
+    if not address:
+        return None
+    host, _, port = address.rpartition(":")
+    return (host or "127.0.0.1", int(port))
+
+
+def _last_seq(path: str) -> Tuple[int, bool]:
+    """The highest seq in an existing file, and whether it ends mid-line"""
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(0, size - 65536))
+            tail = f.read()
+    except FileNotFoundError:
+        return 0, False
+
+    for line in reversed(tail.splitlines()):
+        try:
+            return int(json.loads(line)["seq"]), not tail.endswith(b"\n")
+        except (ValueError, KeyError, TypeError):
+            continue
+    return 0, bool(tail) and not tail.endswith(b"\n")
+
+
+class MetricsWriter:
+    """Buffers metric records and appends them to a JSONL file from a background thread
+
+    `emit` never touches the disk: a batch is written when it reaches
+    `batch_size` records or `flush_interval` seconds after its first record.
+    Past `max_queue` unwritten records new ones are dropped and counted
+    rather than stalling training.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        run_id: Optional[str] = None,
+        flush_interval: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        socket_address: Optional[str] = None
+    ):
+        self.path = path
+        self.run_id = run_id or f"{os.getpid()}-{int(time.time())}"
+        self.flush_interval = flush_interval or float(os.getenv("TRAINING_METRICS_FLUSH_SECONDS", "1.0"))
+        self.batch_size = batch_size or int(os.getenv("TRAINING_METRICS_BATCH_SIZE", "500"))
+        self.max_queue = max_queue or int(os.getenv("TRAINING_METRICS_QUEUE_SIZE", "100000"))
+        self.dropped = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._seq, partial_line = _last_seq(path)
+        self._file = open(path, "a", encoding="utf-8")
+        if partial_line:
+            # A previous run died mid-write: start on a fresh line
+            self._file.write("\n")
+
+        self._address = parse_address(socket_address or os.getenv("TRAINING_METRICS_SOCKET"))
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM) if self._address else None
+
+        self._pending: List[str] = []
+        self._first_pending_at = 0.0
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+        self._thread.start()
+
+    def emit(self, kind: str, **fields) -> bool:
+        """Queue a record; returns False if it was dropped"""
+        with self._lock:
+            if self._closed or len(self._pending) >= self.max_queue:
+                self.dropped += 1
+                return False
+
+            self._seq += 1
+            record = {"v": SCHEMA_VERSION, "seq": self._seq, "ts": round(time.time(), 3), "run": self.run_id, "kind": kind}
+            record.update(fields)
+            self._pending.append(json.dumps(record, default=str, separators=(",", ":")))
+            if len(self._pending) == 1:
+                # Start the flush timer for this batch
+                self._first_pending_at = time.monotonic()
+                self._wake.notify()
+            elif len(self._pending) >= self.batch_size:
+                self._wake.notify()
+        return True
+
+    def flush(self):
+        """Write everything queued so far"""
+        with self._lock:
+            batch, self._pending = self._pending, []
+        self._write(batch)
+
+    def close(self):
+        """Flush and stop the background thread"""
+        with self._lock:
+            self._closed = True
+            self._wake.notify()
+        self._thread.join(timeout=10)
+        self.flush()
+        self._file.close()
+        if self._socket:
+            self._socket.close()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._closed:
+                    if len(self._pending) >= self.batch_size:
+                        break
+                    if self._pending:
+                        timeout = self._first_pending_at + self.flush_interval - time.monotonic()
+                        if timeout <= 0:
+                            break
+                    else:
+                        timeout = None
+                    self._wake.wait(timeout)
+                if self._closed:
+                    return
+                batch, self._pending = self._pending, []
+            self._write(batch)
+
+    def _write(self, batch: List[str]):
+        if not batch:
+            return
+        data = "\n".join(batch) + "\n"
+        try:
+            self._file.write(data)
+            self._file.flush()
+        except (OSError, ValueError) as e:
+            logger.error(f"❌ Failed to write training metrics: {str(e)}")
+
+        if self._socket:
+            self._send(data.encode("utf-8"))
+
+    def _send(self, payload: bytes):
+        """Best-effort UDP mirror, split on line boundaries to fit a datagram"""
+        while payload:
+            if len(payload) <= MAX_DATAGRAM_BYTES:
+                chunk, payload = payload, b""
+            else:
+                cut = payload.rfind(b"\n", 0, MAX_DATAGRAM_BYTES) + 1 or MAX_DATAGRAM_BYTES
+                chunk, payload = payload[:cut], payload[cut:]
+            try:
+                self._socket.sendto(chunk, self._address)
+            except OSError:
+                return
+
+
+class MetricsReader:
+    """Incremental reader for a metrics file
+
+    Each `poll` returns the complete records appended since the previous
+    one; a trailing partial line is kept until its batch is finished.
+    Unparseable lines (a crash mid-write) are skipped.
+    """
+
+    def __init__(self, path: str, kinds: Optional[Iterable[str]] = None, offset: int = 0):
+        self.path = path
+        self.kinds = set(kinds) if kinds else None
+        self.offset = offset
+        self._partial = b""
+
+    def poll(self) -> List[Dict[str, Any]]:
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() < self.offset:
+                    # File was replaced or truncated: start over
+                    self.offset, self._partial = 0, b""
+                f.seek(self.offset)
+                data = f.read()
+        except FileNotFoundError:
+            return []
+
+        self.offset += len(data)
+        lines = (self._partial + data).split(b"\n")
+        self._partial = lines.pop()
+
+        records = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if self.kinds is None or record.get("kind") in self.kinds:
+                records.append(record)
+        return records
+
+    def follow(self, interval: float = 1.0, stop_at_end: bool = True) -> Iterator[Dict[str, Any]]:
+        """Yield records as they are written; stops after run_end when `stop_at_end`"""
+        while True:
+            for record in self.poll():
+                yield record
+                if stop_at_end and record.get("kind") == "run_end":
+                    return
+            time.sleep(interval)
+
+
+def read_metrics(path: str, kinds: Optional[Iterable[str]] = None, run: Optional[str] = None) -> List[Dict[str, Any]]:
+    """All records in a metrics file, optionally filtered by kind and run id"""
+    records = MetricsReader(path, kinds).poll()
+    if run is not None:
+        records = [r for r in records if r.get("run") == run]
+    return records
+
+
+def summarize(records: Iterable[Dict[str, Any]], progress: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Fold records into a progress summary (pass the previous summary to update it)"""
+    progress = progress if progress is not None else {
+        "status": None, "run": None, "episode": 0, "target_episodes": None, "iteration": 0,
+        "last_reward": None, "mean_length": None, "policies": {}, "stats": None, "last_checkpoint": None,
+        "updated_at": None
+    }
+    for record in records:
+        kind = record.get("kind")
+        progress["run"] = record.get("run", progress["run"])
+        progress["updated_at"] = record.get("ts", progress["updated_at"])
+        if kind == "run_start":
+            progress["status"] = "running"
+            progress["target_episodes"] = record.get("target_episodes")
+        elif kind == "episode":
+            progress["episode"] = max(progress["episode"], record.get("episode", 0))
+            progress["last_reward"] = record.get("reward")
+        elif kind == "iteration":
+            progress["iteration"] = record.get("iteration", progress["iteration"])
+            progress["episode"] = record.get("episodes", progress["episode"])
+            progress["mean_length"] = record.get("mean_length")
+            progress["policies"] = record.get("policies") or progress["policies"]
+            progress["stats"] = record.get("stats") or progress["stats"]
+        elif kind == "checkpoint":
+            progress["last_checkpoint"] = record.get("path")
+        elif kind == "run_end":
+            progress["status"] = record.get("status")
+    return progress
+
+
+def listen(address: str, timeout: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+    """Yield records mirrored to a UDP socket (see TRAINING_METRICS_SOCKET)"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(parse_address(address))
+    sock.settimeout(timeout)
+    try:
+        while True:
+            try:
+                payload, _ = sock.recvfrom(65536)
+            except socket.timeout:
+                return
+            for line in payload.splitlines():
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+    finally:
+        sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Print records from a training metrics file')
+    parser.add_argument('path', help='metrics.jsonl written by train_network.py')
+    parser.add_argument('--follow', action='store_true', help='Keep printing new records until the run ends')
+    parser.add_argument('--kind', nargs='+', choices=KINDS, default=None, help='Only these record kinds')
+    parser.add_argument('--summary', action='store_true', help='Print the progress summary instead of records')
+
+    args = parser.parse_args()
+
+    reader = MetricsReader(args.path, args.kind)
+    records = reader.follow() if args.follow else reader.poll()
+    if args.summary:
+        print(json.dumps(summarize(records), indent=2))
+        return 0
+    for record in records:
+        print(json.dumps(record), flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+"""
+Constant-memory streaming statistics for training progress
+
+Every structure here has a fixed size however many episodes are recorded,
+so a million-episode run holds no more than a ten-episode one:
+
+    RunningStats    mean / variance / min / max over everything seen (Welford)
+    RingBuffer      the last `capacity` values, with O(1) window mean and std
+    EMA             exponential moving average
+    StreamingStats  all three for one series, plus windowed quantiles
+    PolicyStats     one StreamingStats per policy
+"""
+import math
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Quantiles reported by StreamingStats.snapshot()
+DEFAULT_QUANTILES = (0.05, 0.5, 0.95)
+
+
+class RunningStats:
+    """Welford's online mean and variance"""
+
+    __slots__ = ("count", "mean", "_m2", "min", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def update(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    @property
+    def variance(self) -> float:
+        """Population variance (0 until two values are seen)"""
+        return self._m2 / self.count if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+
+class RingBuffer:
+    """The most recent `capacity` values
+
+    A running sum and sum of squares give the window mean and std in O(1);
+    they are recomputed from the buffer once per full rotation so float
+    error cannot accumulate.
+    """
+
+    __slots__ = ("capacity", "_data", "_next", "_size", "_sum", "_sum_sq", "_writes")
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self._data = [0.0] * capacity
+        self._next = 0
+        self._size = 0
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._writes = 0
+
+    def append(self, value: float):
+        if self._size == self.capacity:
+            old = self._data[self._next]
+            self._sum -= old
+            self._sum_sq -= old * old
+        else:
+            self._size += 1
+        self._data[self._next] = value
+        self._sum += value
+        self._sum_sq += value * value
+        self._next = (self._next + 1) % self.capacity
+
+        self._writes += 1
+        if self._writes >= self.capacity:
+            self._writes = 0
+            values = self.values()
+            self._sum = math.fsum(values)
+            self._sum_sq = math.fsum(v * v for v in values)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[float]:
+        return iter(self.values())
+
+    def values(self, last: Optional[int] = None) -> List[float]:
+        """Values oldest first, or only the `last` most recent"""
+        if self._size < self.capacity:
+            values = self._data[:self._size]
+        else:
+            values = self._data[self._next:] + self._data[:self._next]
+        return values[-last:] if last else values
+
+    def mean(self, last: Optional[int] = None) -> Optional[float]:
+        """Mean of the window (or of its `last` most recent values)"""
+        if self._size == 0:
+            return None
+        if last and last < self._size:
+            values = self.values(last)
+            return sum(values) / len(values)
+        return self._sum / self._size
+
+    def std(self) -> float:
+        """Population std of the window"""
+        if self._size < 2:
+            return 0.0
+        mean = self._sum / self._size
+        return math.sqrt(max(0.0, self._sum_sq / self._size - mean * mean))
+
+    def quantiles(self, qs: Sequence[float] = DEFAULT_QUANTILES) -> Dict[float, Optional[float]]:
+        """Linearly interpolated quantiles of the window (one sort of at most `capacity` values)"""
+        ordered = sorted(self.values())
+        result: Dict[float, Optional[float]] = {}
+        for q in qs:
+            if not ordered:
+                result[q] = None
+                continue
+            position = q * (len(ordered) - 1)
+            low = int(position)
+            high = min(low + 1, len(ordered) - 1)
+            result[q] = ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+        return result
+
+
+class EMA:
+    """Exponential moving average, seeded with the first value"""
+
+    __slots__ = ("alpha", "value")
+
+    def __init__(self, alpha: Optional[float] = None, span: Optional[int] = None):
+        # span N gives the usual alpha = 2 / (N + 1)
+        self.alpha = alpha if alpha is not None else 2.0 / ((span or 19) + 1)
+        self.value: Optional[float] = None
+
+    def update(self, value: float) -> float:
+        self.value = value if self.value is None else self.value + self.alpha * (value - self.value)
+        return self.value
+
+
+class StreamingStats:
+    """Whole-run, windowed and smoothed statistics of one series"""
+
+    def __init__(self, window: int = 100, ema_alpha: Optional[float] = None):
+        self.total = RunningStats()
+        self.window = RingBuffer(window)
+        self.ema = EMA(alpha=ema_alpha)
+
+    def update(self, value: float):
+        value = float(value)
+        self.total.update(value)
+        self.window.append(value)
+        self.ema.update(value)
+
+    @property
+    def count(self) -> int:
+        return self.total.count
+
+    def snapshot(self, qs: Sequence[float] = DEFAULT_QUANTILES) -> Dict[str, Optional[float]]:
+        """JSON-friendly summary: totals, window mean/std, EMA and window quantiles (p5, p50, ...)"""
+        summary = {
+            "count": self.total.count,
+            "mean": self.total.mean,
+            "std": self.total.std,
+            "min": self.total.min,
+            "max": self.total.max,
+            "window_mean": self.window.mean(),
+            "window_std": self.window.std(),
+            "ema": self.ema.value,
+        }
+        for q, value in self.window.quantiles(qs).items():
+            summary[f"p{q * 100:g}"] = value
+        return summary
+
+
+class PolicyStats:
+    """StreamingStats per policy, created on first use"""
+
+    def __init__(self, window: int = 100, ema_alpha: Optional[float] = None):
+        self.window = window
+        self.ema_alpha = ema_alpha
+        self._stats: Dict[str, StreamingStats] = {}
+
+    def update(self, policy: str, value: float):
+        self[policy].update(value)
+
+    def update_many(self, values: Iterable[Tuple[str, float]]):
+        for policy, value in values:
+            self[policy].update(value)
+
+    def __getitem__(self, policy: str) -> StreamingStats:
+        stats = self._stats.get(policy)
+        if stats is None:
+            stats = self._stats[policy] = StreamingStats(self.window, self.ema_alpha)
+        return stats
+
+    def __contains__(self, policy: str) -> bool:
+        return policy in self._stats
+
+    def __bool__(self) -> bool:
+        return bool(self._stats)
+
+    def items(self):
+        return self._stats.items()
+
+    def snapshot(self, qs: Sequence[float] = DEFAULT_QUANTILES) -> Dict[str, Dict[str, Optional[float]]]:
+        return {policy: stats.snapshot(qs) for policy, stats in sorted(self._stats.items())}
@@ -327,6 +327,13 @@ export const xaiAPI = {
       description
     })
     return response.data
+  },
+
+  // Get explanations for many actions in one request
+  // items: [{ action, agent_type, target, description }]
+  explainActions: async (items) => {
+    const response = await api.post('/api/xai/explain-actions', { items })
+    return response.data
   }
 }
 
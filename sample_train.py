@@ -48,7 +48,11 @@ from primaite.session.ray_envs import PrimaiteRayMARLEnv
 # ----------------------------
 YAML_PATH = "/content/v3.yaml"        # path to your primaite YAML
 NUM_TRAIN_ITERS = 100                 # total training iterations
-LOCAL_MODE = True                     # True for debugging / single-process
+LOCAL_MODE = False                    # True for debugging / single-process (forces 0 rollout workers)
+NUM_ROLLOUT_WORKERS = None            # parallel env-sampling processes; None = CPU count - 1
+NUM_ENVS_PER_WORKER = 1               # envs stepped as one vectorized batch per worker
+ROLLOUT_FRAGMENT_LENGTH = "auto"      # steps per worker sample call; "auto" derives it from TRAIN_BATCH_SIZE
+NUM_GPUS = None                       # None = 1 if a GPU is detected, else 0
 PRINT_AGG_EVERY = 10                  # print aggregated stats every N episodes
 TRAIN_BATCH_SIZE = 4000
 LOCAL_DIR = "./ray_results"
@@ -65,7 +69,8 @@ class EpisodeSummaryCallbacks(DefaultCallbacks):
         super().__init__()
         self.recent_episode_rewards = deque(maxlen=1000)
         self.recent_episode_lengths = deque(maxlen=1000)
-        self.per_policy_rewards = defaultdict(list)
+        # Only the last 100 rewards per policy are aggregated, so keep no more
+        self.per_policy_rewards = defaultdict(lambda: deque(maxlen=100))
         self.episode_counter = 0
         self.print_agg_every = PRINT_AGG_EVERY
 
@@ -162,7 +167,7 @@ class EpisodeSummaryCallbacks(DefaultCallbacks):
             per_policy_agg = {}
             for p, arr in self.per_policy_rewards.items():
                 if arr:
-                    mean_p = sum(arr[-100:]) / min(len(arr), 100)
+                    mean_p = sum(arr) / len(arr)
                 else:
                     mean_p = 0.0
                 per_policy_agg[p] = mean_p
@@ -195,6 +200,20 @@ def main():
     with open(YAML_PATH, "r") as fh:
         env_cfg = yaml.safe_load(fh)
 
+    # Rollout parallelism: one worker per spare core (local mode is single-process)
+    if LOCAL_MODE:
+        num_rollout_workers = 0
+    elif NUM_ROLLOUT_WORKERS is None:
+        num_rollout_workers = max(0, (os.cpu_count() or 1) - 1)
+    else:
+        num_rollout_workers = NUM_ROLLOUT_WORKERS
+    if NUM_GPUS is None:
+        import torch
+        num_gpus = 1 if torch.cuda.is_available() else 0
+    else:
+        num_gpus = NUM_GPUS
+    print(f"Rollouts: {num_rollout_workers} workers x {NUM_ENVS_PER_WORKER} envs, {num_gpus} GPU")
+
     # Ray init
     ray.shutdown()
     ray.init(local_mode=LOCAL_MODE, include_dashboard=False)
@@ -212,10 +231,14 @@ def main():
             policy_mapping_fn=lambda agent_id, episode, worker, **kw: str(agent_id).split("_")[0],
         )
         .training(train_batch_size=TRAIN_BATCH_SIZE)
-        .rollouts(num_rollout_workers=0)
+        .rollouts(
+            num_rollout_workers=num_rollout_workers,
+            num_envs_per_worker=NUM_ENVS_PER_WORKER,
+            rollout_fragment_length=ROLLOUT_FRAGMENT_LENGTH,
+        )
         .callbacks(EpisodeSummaryCallbacks)
         .reporting(min_time_s_per_iteration=0.0)
-        .resources(num_gpus=0)
+        .resources(num_gpus=num_gpus)
     )
 
     algo = config.build()